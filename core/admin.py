@@ -3,8 +3,9 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 from .models import (
     User, Client, Product, ProductVariant,
-    Cart, CartItem, PurchaseOrder, OrderItem
+    Cart, CartItem, StockReservation, PurchaseOrder, OrderItem, KpiRollup, OutboxMessage
 )
+from .outbox import requeue
 
 
 @admin.register(User)
@@ -46,6 +47,12 @@ class CartItemAdmin(admin.ModelAdmin):
     list_display = ('cart', 'variant', 'quantity')
 
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('variant', 'quantity', 'cart_item', 'expires_at')
+    list_select_related = ('variant__product', 'cart_item')
+
+
 @admin.register(PurchaseOrder)
 class PurchaseOrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'client', 'status', 'total_amount', 'created_at')
@@ -56,3 +63,23 @@ class PurchaseOrderAdmin(admin.ModelAdmin):
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'variant', 'quantity', 'unit_price', 'subtotal')
+
+
+@admin.register(KpiRollup)
+class KpiRollupAdmin(admin.ModelAdmin):
+    list_display = ('metric', 'key', 'value', 'updated_at')
+    list_filter = ('metric',)
+    readonly_fields = ('metric', 'key', 'value', 'updated_at')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['requeue_messages']
+
+    @admin.action(description="Reenviar los mensajes seleccionados")
+    def requeue_messages(self, request, queryset):
+        self.message_user(request, f"{requeue(queryset)} mensajes en cola")
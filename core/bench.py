@@ -0,0 +1,391 @@
+"""
+End-to-end benchmark of the main shop flows.
+
+Each flow is a request (plus untimed setup, such as filling the cart before a
+checkout) driven in-process through Django's test client, which also counts
+queries, in-process through the WSGI handler, which opens and reuses database
+connections the way a deployed worker does, or over HTTP against a running
+server. Results are plain dicts so ``manage.py bench`` can save them as JSON
+and compare runs across commits.
+"""
+import http.cookiejar
+import io
+import json
+import math
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from wsgiref.util import setup_testing_defaults
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, transaction
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .models import Client, ProductVariant
+
+PERCENTILES = (50, 95, 99)
+
+
+class BenchError(Exception):
+    pass
+
+
+class TestClientDriver:
+    """
+    Requests through the test client in this process; each iteration runs in
+    a transaction that is rolled back unless ``commit`` is set, so repeated
+    runs see the same data.
+    """
+
+    def __init__(self, commit=False):
+        self.commit = commit
+
+    def login(self, user, password=None):
+        browser = TestClient()
+        browser.force_login(user)
+        return browser
+
+    def request(self, browser, method, url, data=None, json_body=None):
+        """Return (status, parsed JSON or None, queries)."""
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'get':
+                response = browser.get(url)
+            elif json_body is not None:
+                response = browser.post(url, json.dumps(json_body), content_type='application/json')
+            else:
+                response = browser.post(url, data or {})
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        payload = response.json() if response.get('Content-Type', '').startswith('application/json') else None
+        return response.status_code, payload, len(queries)
+
+    def iteration(self):
+        return _Iteration(self.commit)
+
+
+class _Iteration:
+    def __init__(self, commit):
+        self.commit = commit
+        self.atomic = transaction.atomic()
+
+    def __enter__(self):
+        self.atomic.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.commit:
+            transaction.set_rollback(True)
+        return self.atomic.__exit__(exc_type, exc, tb)
+
+
+class WsgiDriver:
+    """
+    Requests through a ``WSGIHandler`` in this process, without the test
+    client, which keeps one connection open for the whole run. Each request
+    fires request_started/request_finished, so connections are opened, reused,
+    health-checked or returned to the pool according to ``DB_CONNECTION_MODE``
+    as in a deployed worker. Writes are kept; queries are counted.
+    """
+
+    def __init__(self):
+        self.handler = WSGIHandler()
+
+    def login(self, user, password=None):
+        browser = TestClient()
+        browser.force_login(user)
+        cookies = SimpleCookie()
+        cookies.update(browser.cookies)
+        # A 32-character token is accepted both as the cookie and the header
+        cookies['csrftoken'] = get_random_string(32)
+        return cookies
+
+    def request(self, cookies, method, url, data=None, json_body=None):
+        path, _, query = url.partition('?')
+        body = b''
+        environ = {
+            'REQUEST_METHOD': method.upper(),
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'HTTP_COOKIE': '; '.join(f'{key}={morsel.value}' for key, morsel in cookies.items()),
+            'HTTP_X_CSRFTOKEN': cookies['csrftoken'].value,
+        }
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            environ['CONTENT_TYPE'] = 'application/json'
+        elif method == 'post':
+            body = urllib.parse.urlencode(data or {}).encode()
+            environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+        environ.update({'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body)})
+        setup_testing_defaults(environ)
+
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = headers
+
+        # Connections are per thread and the handler runs in this one
+        with connection.execute_wrapper(count):
+            response = self.handler(environ, start_response)
+            try:
+                content = b''.join(response)
+            finally:
+                # Fires request_finished, which closes or returns the connection
+                response.close()
+        content_type = ''
+        for name, value in started['headers']:
+            if name.lower() == 'set-cookie':
+                cookies.load(value)
+            elif name.lower() == 'content-type':
+                content_type = value
+        payload = json.loads(content) if content_type.startswith('application/json') else None
+        return started['status'], payload, queries[0]
+
+    def iteration(self):
+        return _NoIteration()
+
+
+class HttpDriver:
+    """Requests over HTTP against ``base_url``; writes are kept and queries are not counted."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def login(self, user, password=None):
+        if password is None:
+            raise BenchError("--password is required to log in over HTTP")
+        jar = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+        opener.jar = jar
+        page = opener.open(self.base_url + reverse('landing:login'), timeout=self.timeout).read().decode()
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page)
+        self.request(opener, 'post', reverse('landing:login'), data={
+            'username': user.username, 'password': password,
+            'csrfmiddlewaretoken': token.group(1) if token else '',
+        })
+        if not any(cookie.name == 'sessionid' for cookie in jar):
+            raise BenchError(f"Could not log in as {user.username}")
+        return opener
+
+    def request(self, opener, method, url, data=None, json_body=None):
+        csrf = next((cookie.value for cookie in opener.jar if cookie.name == 'csrftoken'), '')
+        headers = {'X-CSRFToken': csrf, 'Referer': self.base_url + '/'}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif method == 'post':
+            body = urllib.parse.urlencode({'csrfmiddlewaretoken': csrf, **(data or {})}).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = urllib.request.Request(self.base_url + url, data=body, headers=headers, method=method.upper())
+        try:
+            with opener.open(request, timeout=self.timeout) as response:
+                status, content, content_type = response.status, response.read(), response.headers.get('Content-Type', '')
+        except urllib.error.HTTPError as exc:
+            status, content, content_type = exc.code, exc.read(), exc.headers.get('Content-Type', '')
+        payload = json.loads(content) if content_type.startswith('application/json') else None
+        return status, payload, None
+
+    def iteration(self):
+        return _NoIteration()
+
+
+class _NoIteration:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class Flows:
+    """
+    The benchmarked flows. Each ``<name>`` method takes a logged-in session
+    and performs the timed request via ``timed``; anything before it is setup.
+    """
+
+    NAMES = ('catalog', 'catalog_api', 'add_to_cart', 'checkout', 'my_orders', 'dashboard_home')
+    ADMIN_FLOWS = ('dashboard_home',)
+
+    def __init__(self, driver, client_user, seed=None):
+        self.driver = driver
+        self.client = Client.objects.get(user=client_user)
+        self.variant_ids = list(
+            ProductVariant.objects.filter(stock__gte=10, product__is_active=True)
+            .order_by('?').values_list('id', flat=True)[:500]
+        )
+        if not self.variant_ids:
+            raise BenchError("No active variants with stock; run generate_load_data first")
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _variants(self, count=1):
+        with self.lock:
+            return self.rng.sample(self.variant_ids, min(count, len(self.variant_ids)))
+
+    def catalog(self, session, timed):
+        return timed('get', reverse('landing:catalog'))
+
+    def catalog_api(self, session, timed):
+        return timed('get', reverse('landing:catalog_api'))
+
+    def add_to_cart(self, session, timed):
+        return timed('post', reverse('landing:add_to_cart'), json_body={'variant_id': self._variants()[0], 'quantity': 1})
+
+    def checkout(self, session, timed):
+        self.driver.request(session, 'post', reverse('landing:cart_batch'), json_body={'operations': [
+            {'op': 'add', 'variant_id': variant_id, 'quantity': 1} for variant_id in self._variants(3)
+        ]})
+        return timed('post', reverse('landing:process_checkout'), data={
+            'company_name': self.client.company_name, 'tax_id': self.client.tax_id,
+            'address': self.client.address, 'phone': self.client.phone, 'email': self.client.email,
+            'notes': 'Pedido de benchmark',
+        })
+
+    def my_orders(self, session, timed):
+        return timed('get', reverse('landing:my_orders'))
+
+    def dashboard_home(self, session, timed):
+        return timed('get', reverse('admin_home'))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, queries, errors, wall_time):
+    latencies = sorted(latencies)
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall_time, 2) if wall_time else None,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+    for pct in PERCENTILES:
+        value = percentile(latencies, pct)
+        result[f'p{pct}_ms'] = round(value * 1000, 2) if value is not None else None
+    return result
+
+
+def run_flow(driver, flows, name, user, password=None, requests=100, warmup=5, concurrency=1):
+    """Run one flow ``warmup + requests`` times and return its summary."""
+    flow = getattr(flows, name)
+    latencies, queries, errors = [], [], [0]
+    sessions = threading.local()
+
+    def once(record):
+        if not hasattr(sessions, 'session'):
+            sessions.session = driver.login(user, password)
+        session = sessions.session
+
+        def timed(method, url, data=None, json_body=None):
+            started = time.perf_counter()
+            status, payload, query_count = driver.request(session, method, url, data=data, json_body=json_body)
+            elapsed = time.perf_counter() - started
+            failed = status >= 400 or (isinstance(payload, dict) and payload.get('success') is False)
+            if record:
+                with flows.lock:
+                    latencies.append(elapsed)
+                    if query_count is not None:
+                        queries.append(query_count)
+                    errors[0] += failed
+
+        with driver.iteration():
+            flow(session, timed)
+
+    for _ in range(warmup):
+        once(record=False)
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: once(record=True), range(requests)))
+    else:
+        for _ in range(requests):
+            once(record=True)
+    return summarize(latencies, queries, errors[0], time.perf_counter() - started)
+
+
+def run_bench(driver, client_user, admin_user, flow_names=Flows.NAMES, password=None,
+              requests=100, warmup=5, concurrency=1, seed=None, log=None):
+    log = log or (lambda message: None)
+    flows = Flows(driver, client_user, seed=seed)
+    results = {}
+    # The test client's host must be allowed; harmless for HTTP runs
+    with override_settings(ALLOWED_HOSTS=['*']):
+        for name in flow_names:
+            user = admin_user if name in Flows.ADMIN_FLOWS else client_user
+            if user is None:
+                log(f"{name}: skipped, no {'admin' if name in Flows.ADMIN_FLOWS else 'client'} user")
+                continue
+            results[name] = run_flow(driver, flows, name, user, password, requests, warmup, concurrency)
+            log(format_result(name, results[name]))
+    return results
+
+
+def environment():
+    """Metadata stored with the results, to tell runs apart."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': timezone.now().isoformat(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'connection_mode': getattr(settings, 'DB_CONNECTION_MODE', None),
+    }
+
+
+def format_result(name, result):
+    queries = '-' if result['queries_per_request'] is None else result['queries_per_request']
+    return (
+        f"{name:<16} p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+        f"{result['throughput_rps']} req/s  {queries} queries/req  {result['errors']} errors"
+    )
+
+
+def compare(previous, current):
+    """Lines describing the change of each flow's p50/p95/queries against ``previous``."""
+    lines = []
+    for name, result in current.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request'):
+            old, new = before.get(key), result.get(key)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.1f}%" if old else f"{new - old:+}"
+            changes.append(f"{key} {old} -> {new} ({change})")
+        lines.append(f"{name}: " + ', '.join(changes))
+    return lines
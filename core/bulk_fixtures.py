@@ -0,0 +1,443 @@
+"""
+Streaming fixture load and dump for seeding large datasets.
+
+``loaddata`` parses each fixture file whole and saves objects one at a time,
+sending signals. ``FixtureLoader`` reads the same ``dumpdata`` records (a JSON
+array or JSON Lines, optionally gzipped) incrementally, so memory is bounded
+by the batch size, not by the file size. Rows are inserted without model
+instances or signals, in per-model batches flushed in foreign key order,
+using ``COPY`` on PostgreSQL and ``executemany`` elsewhere. ``bulk_create``
+is not used because it would overwrite the fixtures' ``auto_now`` timestamps.
+The whole load is one transaction. Sequences are reset afterwards, and the
+state that signals would have kept up to date (search index, rollups, catalog
+snapshot, cached client identities) is rebuilt once at the end.
+
+``iter_dump`` is the reverse. It reads each model in pk order with
+``values_list().iterator()`` (a server-side cursor on PostgreSQL) and yields
+``dumpdata``-compatible records, so ``loaddata`` can still read the output.
+Natural keys are not supported in either direction, and unlike ``loaddata``
+rows are only inserted, never updated: load into empty tables.
+"""
+import gzip
+import json
+import re
+import time
+from collections import defaultdict
+from itertools import islice
+from pathlib import Path
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .catalog import invalidate_catalog_snapshot
+from .identity import IDENTITY_KEY
+from .models import Cart, CartItem, Client, OrderItem, Product, ProductVariant, PurchaseOrder, StockReservation
+from .reservations import holds_changed
+from .rollups import rebuild_rollups
+from .search import refresh_search_index
+
+DEFAULT_BATCH_SIZE = 10000
+READ_CHUNK_SIZE = 1024 * 1024
+FORMATS = ('json', 'jsonl')
+SUFFIXES = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+# Loading any of these makes the derived state stale
+SEARCH_MODELS = (Product, ProductVariant)
+ROLLUP_MODELS = (Client, Product, ProductVariant, PurchaseOrder, OrderItem)
+IDENTITY_MODELS = (Client, Cart)
+HOLD_MODELS = (CartItem, StockReservation)
+
+_SPACE = re.compile(r'\s*')
+
+
+class FixtureError(Exception):
+    pass
+
+
+def fixture_format(path, fmt=None):
+    """``json`` or ``jsonl``, from ``fmt`` or the extension (``.gz`` ignored)."""
+    if fmt:
+        return fmt
+    suffixes = Path(path).suffixes
+    if suffixes and suffixes[-1] == '.gz':
+        suffixes = suffixes[:-1]
+    if suffixes and suffixes[-1].lower() in SUFFIXES:
+        return SUFFIXES[suffixes[-1].lower()]
+    raise FixtureError(f'Formato no soportado para {path}; use --format')
+
+
+def open_fixture(path, mode='rt'):
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8', newline='' if 'w' in mode else None)
+
+
+def iter_json_array(stream, chunk_size=READ_CHUNK_SIZE):
+    """Yield the objects of the JSON array in ``stream``, reading ``chunk_size`` characters at a time."""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def next_char():
+        # Next non-space character ('' at the end of the input), reading as needed
+        nonlocal pos
+        while True:
+            pos = _SPACE.match(buffer, pos).end()
+            if pos < len(buffer) or eof:
+                return buffer[pos:pos + 1]
+            read_more()
+
+    if next_char() != '[':
+        raise FixtureError('El fixture debe ser un arreglo JSON')
+    pos += 1
+    if next_char() == ']':
+        pos += 1
+    else:
+        number = 0
+        while True:
+            number += 1
+            # raw_decode() does not skip leading whitespace
+            next_char()
+            while True:
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as exc:
+                    if eof:
+                        raise FixtureError(f'Objeto {number}: JSON inválido ({exc.msg})') from exc
+                    # The object continues past the buffer
+                    read_more()
+                    continue
+                break
+            if not isinstance(record, dict):
+                # Only objects are self-delimiting; a number could have been cut at the buffer end
+                raise FixtureError(f'Objeto {number}: se esperaba un objeto JSON')
+            pos = end
+            yield record
+            char = next_char()
+            pos += 1
+            if char == ']':
+                break
+            if char != ',':
+                raise FixtureError(f'Objeto {number}: se esperaba "," o "]"')
+    if next_char():
+        raise FixtureError('Datos inesperados después del arreglo JSON')
+
+
+def iter_json_lines(stream):
+    """Yield one object per non-blank line of ``stream``."""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise FixtureError(f'Línea {number}: JSON inválido ({exc})') from exc
+        if not isinstance(record, dict):
+            raise FixtureError(f'Línea {number}: se esperaba un objeto JSON')
+        yield record
+
+
+def iter_fixture(path, fmt=None):
+    """Yield the records of the fixture file at ``path``."""
+    fmt = fixture_format(path, fmt)
+    with open_fixture(path) as stream:
+        if fmt == 'jsonl':
+            yield from iter_json_lines(stream)
+        else:
+            yield from iter_json_array(stream)
+
+
+def dependency_order(models):
+    """``models`` ordered so each one follows the models its foreign keys point to."""
+    models = list(dict.fromkeys(models))
+    wanted = set(models)
+    ordered, done, visiting = [], set(), set()
+
+    def visit(model):
+        if model in done or model in visiting:
+            # Already placed, or a cycle; deferred constraints cover the rest
+            return
+        visiting.add(model)
+        for field in model._meta.concrete_fields:
+            related = field.related_model if field.is_relation else None
+            if related is not None and related is not model and related in wanted:
+                visit(related)
+        visiting.discard(model)
+        done.add(model)
+        ordered.append(model)
+
+    for model in models:
+        visit(model)
+    return ordered
+
+
+class _ModelPlan:
+    """How the fixture fields of one model map to table columns."""
+
+    def __init__(self, model):
+        meta = model._meta
+        self.model = model
+        self.pk = meta.pk
+        self.fields = [field for field in meta.concrete_fields if not field.primary_key]
+        self.columns = tuple(field.column for field in self.fields)
+        self.pk_columns = (self.pk.column,) + self.columns
+        self.known = {field.name for field in self.fields}
+        self.m2m = {}
+        for field in meta.many_to_many:
+            through = field.remote_field.through
+            # Like dumpdata: explicit through models are loaded as models of their own
+            if through._meta.auto_created:
+                self.m2m[field.name] = (
+                    through,
+                    through._meta.get_field(field.m2m_field_name()),
+                    through._meta.get_field(field.m2m_reverse_field_name()),
+                )
+                self.known.add(field.name)
+
+    def convert(self, field, value):
+        if field.is_relation:
+            if isinstance(value, (list, tuple)):
+                raise FixtureError(f'{self.model._meta.label}.{field.name}: no se admiten claves naturales')
+            return field.target_field.to_python(value)
+        return field.to_python(value)
+
+
+class FixtureLoader:
+    """
+    Insert fixture records in per-model batches of ``batch_size`` rows.
+
+    ``run`` loads the given files in one transaction and yields one stats dict
+    per file; ``counts`` holds the rows inserted per model.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, fmt=None, refresh=True, using=DEFAULT_DB_ALIAS):
+        self.batch_size = batch_size
+        self.fmt = fmt
+        self.refresh = refresh
+        self.using = using
+        self.connection = connections[using]
+        self.plans = {}
+        # (model, columns) -> rows of database values
+        self.pending = {}
+        self.counts = defaultdict(int)
+        # Value of auto_now fields missing from the fixture
+        self.now = timezone.now()
+        self.rank = {
+            model: index
+            for index, model in enumerate(dependency_order(apps.get_models(include_auto_created=True)))
+        }
+
+    def run(self, paths):
+        with transaction.atomic(using=self.using):
+            for path in self.order_paths(paths):
+                started = time.perf_counter()
+                records = 0
+                try:
+                    for record in iter_fixture(path, self.fmt):
+                        records += 1
+                        try:
+                            self.add(record)
+                        except (ValidationError, KeyError, TypeError, ValueError) as exc:
+                            raise FixtureError(f'Objeto {records}: {exc}') from exc
+                except FixtureError as exc:
+                    raise FixtureError(f'{path}: {exc}') from exc
+                self.flush()
+                yield {'path': path, 'records': records, 'elapsed': time.perf_counter() - started}
+            self.reset_sequences()
+            self.analyze()
+        if self.refresh:
+            self.refresh_derived()
+
+    def order_paths(self, paths):
+        """Parents first, by the model of each file's first record; not required, the constraints are deferred."""
+        def rank(path):
+            first = next(iter_fixture(path, self.fmt), None)
+            try:
+                return self.rank[apps.get_model(first['model'])]
+            except (FixtureError, TypeError, KeyError, LookupError, ValueError):
+                # Reported with the file name when the file is loaded
+                return len(self.rank)
+        return sorted(paths, key=rank)
+
+    def _plan(self, label):
+        plan = self.plans.get(label)
+        if plan is None:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError) as exc:
+                raise FixtureError(f'Modelo desconocido: {label!r}') from exc
+            plan = self.plans[label] = _ModelPlan(model)
+        return plan
+
+    def add(self, record):
+        plan = self._plan(record['model'])
+        values = record.get('fields', {})
+        unknown = set(values) - plan.known
+        if unknown:
+            raise FixtureError(f'{plan.model._meta.label} no tiene los campos {", ".join(sorted(unknown))}')
+
+        connection = self.connection
+        columns = plan.columns
+        row = []
+        pk = record.get('pk')
+        if pk is not None:
+            pk = plan.pk.to_python(pk)
+            columns = plan.pk_columns
+            row.append(plan.pk.get_db_prep_save(pk, connection))
+        for field in plan.fields:
+            if field.name in values:
+                value = plan.convert(field, values[field.name])
+            elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                value = self.now
+            else:
+                value = field.get_default()
+            row.append(field.get_db_prep_save(value, connection))
+        self._add(plan.model, columns, tuple(row))
+
+        for name, (through, source, target) in plan.m2m.items():
+            targets = values.get(name) or []
+            if targets and pk is None:
+                raise FixtureError(f'{plan.model._meta.label}.{name} requiere el pk del objeto')
+            columns = (source.column, target.column)
+            source_value = source.get_db_prep_save(pk, connection)
+            for value in targets:
+                value = plan.convert(target, value)
+                self._add(through, columns, (source_value, target.get_db_prep_save(value, connection)))
+
+    def _add(self, model, columns, row):
+        rows = self.pending.setdefault((model, columns), [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert every pending batch, referenced models first."""
+        pending = sorted(self.pending.items(), key=lambda item: self.rank.get(item[0][0], len(self.rank)))
+        self.pending = {}
+        with self.connection.cursor() as cursor:
+            for (model, columns), rows in pending:
+                self._insert(cursor, model, columns, rows)
+                self.counts[model] += len(rows)
+
+    def _insert(self, cursor, model, columns, rows):
+        quote = self.connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        column_list = ', '.join(quote(column) for column in columns)
+        if self.connection.vendor == 'postgresql':
+            # copy() is psycopg's own; wrap its errors like Django's execute()
+            with self.connection.wrap_database_errors, cursor.copy(f'COPY {table} ({column_list}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            placeholders = ', '.join(['%s'] * len(columns))
+            cursor.executemany(f'INSERT INTO {table} ({column_list}) VALUES ({placeholders})', rows)
+
+    def reset_sequences(self):
+        statements = self.connection.ops.sequence_reset_sql(no_style(), list(self.counts))
+        if statements:
+            with self.connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def analyze(self):
+        """
+        Refresh the planner statistics of the loaded tables before the deferred
+        foreign key checks run at commit. Left at "0 rows" (a truncated or
+        freshly vacuumed table), they make every index look free and a check
+        may scan a whole index for each row.
+        """
+        if self.connection.vendor != 'postgresql' or not self.counts:
+            return
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute('ANALYZE ' + ', '.join(quote(model._meta.db_table) for model in self.counts))
+
+    def refresh_derived(self):
+        """Rebuild what the skipped signals would have kept up to date."""
+        loaded = set(self.counts)
+        if loaded & set(SEARCH_MODELS):
+            refresh_search_index(using=self.using)
+            invalidate_catalog_snapshot()
+        if loaded & set(ROLLUP_MODELS):
+            rebuild_rollups(using=self.using)
+        if loaded & set(HOLD_MODELS):
+            holds_changed()
+        if loaded & set(IDENTITY_MODELS):
+            user_ids = (
+                Client.objects.using(self.using).exclude(user=None)
+                .values_list('user_id', flat=True).iterator(chunk_size=self.batch_size)
+            )
+            while keys := [IDENTITY_KEY.format(user_id=user_id) for user_id in islice(user_ids, self.batch_size)]:
+                cache.delete_many(keys)
+
+
+def _label_models(label):
+    try:
+        if '.' in label:
+            return [apps.get_model(label)]
+        return [
+            model for model in apps.get_app_config(label).get_models()
+            if model._meta.managed and not model._meta.proxy
+        ]
+    except (LookupError, ValueError) as exc:
+        raise FixtureError(f'Modelo o aplicación desconocida: {label!r}') from exc
+
+
+def dump_models(labels=(), exclude=()):
+    """
+    The models named by ``labels`` (``app`` or ``app.Model``; every model when
+    empty), minus those named by ``exclude``.
+    """
+    if labels:
+        models = [model for label in labels for model in _label_models(label)]
+    else:
+        models = [model for model in apps.get_models() if model._meta.managed and not model._meta.proxy]
+    excluded = {model for label in exclude for model in _label_models(label)}
+    return [model for model in models if model not in excluded]
+
+
+def iter_dump(models, batch_size=DEFAULT_BATCH_SIZE, using=DEFAULT_DB_ALIAS):
+    """Yield ``dumpdata`` records for ``models``, referenced models first and rows in pk order."""
+    for model in dependency_order(models):
+        meta = model._meta
+        label = meta.label_lower
+        fields = [field for field in meta.concrete_fields if not field.primary_key]
+        m2m = [
+            field for field in meta.many_to_many if field.remote_field.through._meta.auto_created
+        ]
+        rows = (
+            model._base_manager.using(using).order_by(meta.pk.attname)
+            .values_list(meta.pk.attname, *(field.attname for field in fields))
+            .iterator(chunk_size=batch_size)
+        )
+        while chunk := list(islice(rows, batch_size)):
+            related = {}
+            for field in m2m:
+                through = field.remote_field.through
+                source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+                values = defaultdict(list)
+                pairs = (
+                    through._base_manager.using(using)
+                    .filter(**{f'{source}__in': [row[0] for row in chunk]})
+                    .order_by(source, target)
+                    .values_list(source, target)
+                )
+                for pk, value in pairs:
+                    values[pk].append(value)
+                related[field.name] = values
+            for pk, *values in chunk:
+                record = {field.name: value for field, value in zip(fields, values)}
+                for name, values_by_pk in related.items():
+                    record[name] = values_by_pk.get(pk, [])
+                yield {'model': label, 'pk': pk, 'fields': record}
@@ -0,0 +1,162 @@
+"""
+Precomputed catalog snapshot.
+
+The catalog page used to walk every active product and run several queries per
+product. Instead we build one category-grouped, sorted structure of plain dicts
+with a fixed number of queries, keep it in the cache and only rebuild it when a
+``Product`` or ``ProductVariant`` changes (see ``core.signals``).
+
+Every product also carries a ``version``, a digest of the product and its
+variants, which keys its rendered card in ``landing.catalog_cards``: after a
+rebuild only the cards whose data changed miss the fragment cache.
+"""
+import hashlib
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Product, ProductVariant
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_CHANGED_KEY = 'catalog:changed'
+CATALOG_SNAPSHOT_KEY = 'catalog:snapshot:{version}'
+CATALOG_CARD_STATS_KEY = 'catalog:cards:{counter}'
+
+PRODUCT_FIELDS = ('id', 'name', 'description', 'brand', 'category', 'image_url')
+VARIANT_FIELDS = (
+    'id', 'color', 'size', 'weight', 'is_luminous', 'unit_price', 'bulk_price',
+    'stock', 'has_variants', 'image_url',
+)
+
+
+def _sort_key(value):
+    return (value or '').lower()
+
+
+def _product_version(product):
+    """Digest of everything a product card shows; changes with the product or any of its variants."""
+    return hashlib.md5(repr(product).encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def build_catalog_snapshot():
+    """
+    Build the catalog structure from the database using exactly two queries.
+
+    Returns an ``OrderedDict`` mapping category -> list of product dicts, both
+    sorted alphabetically (case-insensitive). Each product dict carries its
+    variants and the flags the template needs, so rendering runs no queries.
+    """
+    variants_by_product = defaultdict(list)
+    variants = (
+        ProductVariant.objects
+        .filter(product__is_active=True)
+        .order_by('id')
+        .values('product_id', *VARIANT_FIELDS)
+    )
+    for variant in variants:
+        variants_by_product[variant.pop('product_id')].append(variant)
+
+    categories = defaultdict(list)
+    for product in Product.objects.filter(is_active=True).values(*PRODUCT_FIELDS):
+        product_variants = variants_by_product.get(product['id'], [])
+        product['variants'] = product_variants
+        product['variant_count'] = len(product_variants)
+        product['has_variants'] = any(v['has_variants'] for v in product_variants)
+        product['has_standard_variant'] = any(not v['has_variants'] for v in product_variants)
+        product['version'] = _product_version(product)
+        categories[product['category']].append(product)
+
+    snapshot = OrderedDict()
+    for category in sorted(categories, key=_sort_key):
+        snapshot[category] = sorted(categories[category], key=lambda p: _sort_key(p['name']))
+    return snapshot
+
+
+def _new_version():
+    # Not 1: after a cache flush the counter must not repeat a version an ETag already used
+    return time.time_ns()
+
+
+def _current_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, _new_version, timeout=None)
+
+
+def catalog_stamp():
+    """
+    Conditional GET validator part for pages showing catalog data:
+    ``(version, changed_at)`` of the snapshot, read from the cache without
+    touching the database. ``changed_at`` is the last invalidation (None
+    before the first one).
+    """
+    values = cache.get_many([CATALOG_VERSION_KEY, CATALOG_CHANGED_KEY])
+    version = values.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = _current_version()
+    return version, values.get(CATALOG_CHANGED_KEY)
+
+
+def get_catalog_snapshot():
+    """
+    Return the cached catalog snapshot, building it on a miss.
+
+    Set ``CATALOG_SNAPSHOT_BYPASS = True`` to always build from the database,
+    which is handy when debugging catalog data.
+    """
+    if getattr(settings, 'CATALOG_SNAPSHOT_BYPASS', False):
+        return build_catalog_snapshot()
+
+    key = CATALOG_SNAPSHOT_KEY.format(version=_current_version())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_catalog_snapshot()
+        cache.set(key, snapshot, getattr(settings, 'CATALOG_SNAPSHOT_TIMEOUT', None))
+    return snapshot
+
+
+def invalidate_catalog_snapshot():
+    """
+    Retire the current snapshot.
+
+    The snapshot key is versioned, so a rebuild that started before the
+    invalidation writes to the old key and can never resurrect stale data.
+    """
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, _new_version(), timeout=None)
+    cache.set(CATALOG_CHANGED_KEY, timezone.now(), timeout=None)
+
+
+def warm_catalog_snapshot():
+    """Invalidate and rebuild the snapshot so the next request is a cache hit."""
+    invalidate_catalog_snapshot()
+    return get_catalog_snapshot()
+
+
+def record_card_lookups(hits, misses):
+    """Add to the product card fragment cache counters shared by all workers."""
+    for counter, value in (('hits', hits), ('misses', misses)):
+        if not value:
+            continue
+        key = CATALOG_CARD_STATS_KEY.format(counter=counter)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            if not cache.add(key, value, timeout=None):
+                cache.incr(key, value)
+
+
+def card_cache_stats():
+    """Hits, misses and hit rate (%) of the product card fragment cache since the counters started."""
+    values = cache.get_many([CATALOG_CARD_STATS_KEY.format(counter=counter) for counter in ('hits', 'misses')])
+    hits = values.get(CATALOG_CARD_STATS_KEY.format(counter='hits'), 0)
+    misses = values.get(CATALOG_CARD_STATS_KEY.format(counter='misses'), 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / lookups * 100 if lookups else None,
+    }
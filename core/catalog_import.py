@@ -0,0 +1,424 @@
+"""
+Streaming import of the Excel product sheet.
+
+The sheet is read one row at a time (Excel "Web page" HTML export, CSV or
+XLSX), each row is mapped to product/variant fields and the rows are upserted
+in fixed-size batches with ``bulk_create``/``bulk_update``, one transaction per
+batch. Memory is bounded by the batch size, not by the sheet size.
+
+Products are matched by name and variants by SKU (the sheet's UPC/JAN column),
+falling back to (product, color, size, weight) for variants created before
+SKUs were tracked, such as the ones loaded from the dashboard fixtures.
+"""
+import csv
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from html.parser import HTMLParser
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import invalidate_catalog_snapshot
+from .models import Product, ProductVariant
+from .pricing import gross_price, net_price
+from .rollups import STOCK_BY_CATEGORY, rebuild_rollups
+from .search import refresh_search_index
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CATEGORY = 'Uncategorized'
+
+# Normalized header text -> field. The first column matching a field wins,
+# which picks the transfer prices in the Excel sheet over the card prices.
+HEADER_ALIASES = {
+    'upc/jan': 'sku', 'upc': 'sku', 'jan': 'sku', 'sku': 'sku',
+    'item': 'name', 'producto': 'name', 'nombre': 'name', 'name': 'name',
+    'color': 'color', 'variante': 'color',
+    'tamaño': 'size', 'tamano': 'size', 'size': 'size',
+    'peso': 'weight', 'weight': 'weight',
+    'cantidad disponible': 'stock', 'stock': 'stock',
+    'precios unitario neto': 'bulk_price', 'precio unitario neto': 'bulk_price', 'bulk_price': 'bulk_price',
+    'precio c/iva': 'unit_price', 'unit_price': 'unit_price',
+    'categoria': 'category', 'categoría': 'category', 'category': 'category',
+    'marca': 'brand', 'brand': 'brand',
+    'descripcion': 'description', 'descripción': 'description', 'description': 'description',
+    'imagen': 'image_url', 'image_url': 'image_url',
+}
+
+PRODUCT_FIELDS = ('category', 'brand', 'description')
+VARIANT_FIELDS = ('sku', 'color', 'size', 'weight', 'stock', 'unit_price', 'bulk_price', 'has_variants', 'image_url')
+
+CSV_DELIMITERS = ',;\t'
+
+# "0.8g/15pcs" -> weight 0.8, size "15pcs"
+WEIGHT_SIZE_RE = re.compile(r'^(\d+(?:[.,]\d+)?)\s*g\s*/\s*(.+)$', re.IGNORECASE)
+
+
+class CatalogImportError(Exception):
+    pass
+
+
+class _TableRowParser(HTMLParser):
+    """Collects ``<tr>`` rows as lists of cell texts, expanding colspans."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.sheet_link = None
+        self._row = None
+        self._cell = None
+        self._colspan = 1
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'tr':
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+            try:
+                self._colspan = max(1, int(attrs.get('colspan') or 1))
+            except ValueError:
+                self._colspan = 1
+        elif tag == 'br' and self._cell is not None:
+            self._cell.append(' ')
+        elif tag == 'link' and attrs.get('id') == 'shLink' and attrs.get('href') and not self.sheet_link:
+            # Excel workbook frameset: the data lives in the linked sheet
+            self.sheet_link = attrs['href']
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th') and self._cell is not None and self._row is not None:
+            self._row.append(' '.join(''.join(self._cell).split()))
+            self._row.extend([''] * (self._colspan - 1))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def read_html_rows(path, chunk_size=64 * 1024):
+    path = Path(path)
+    parser = _TableRowParser()
+    found_rows = False
+    with open(path, encoding='utf-8', errors='replace') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), ''):
+            parser.feed(chunk)
+            found_rows = found_rows or bool(parser.rows)
+            yield from parser.rows
+            parser.rows.clear()
+    parser.close()
+    yield from parser.rows
+
+    if not found_rows and parser.sheet_link:
+        yield from read_html_rows(path.parent / parser.sheet_link, chunk_size)
+
+
+def _header_delimiter(sample):
+    """The delimiter that splits a line of ``sample`` into the sheet's header row, if any."""
+    for delimiter in CSV_DELIMITERS:
+        if any(_detect_columns(row) for row in csv.reader(sample.splitlines(), delimiter=delimiter)):
+            return delimiter
+    return None
+
+
+def read_csv_rows(path):
+    with open(path, encoding='utf-8-sig', newline='') as fh:
+        sample = fh.read(4096)
+        fh.seek(0)
+        # Sniffing alone is fooled by decimal commas in semicolon sheets and by
+        # the title rows above the header
+        delimiter = _header_delimiter(sample)
+        if delimiter:
+            yield from csv.reader(fh, delimiter=delimiter)
+            return
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(fh, dialect)
+
+
+def read_xlsx_rows(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise CatalogImportError('Importar XLSX requiere openpyxl (pip install openpyxl)') from exc
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+READERS = {
+    'html': read_html_rows,
+    'csv': read_csv_rows,
+    'xlsx': read_xlsx_rows,
+}
+
+EXTENSION_FORMATS = {'.htm': 'html', '.html': 'html', '.csv': 'csv', '.xlsx': 'xlsx'}
+
+
+def read_rows(path, fmt=None):
+    fmt = fmt or EXTENSION_FORMATS.get(Path(path).suffix.lower())
+    if fmt not in READERS:
+        raise CatalogImportError(f'Formato no soportado para {path}')
+    return READERS[fmt](path)
+
+
+def _normalize_header(value):
+    return ' '.join(str(value).split()).lower()
+
+
+def _detect_columns(row):
+    columns = {}
+    for index, cell in enumerate(row):
+        field = HEADER_ALIASES.get(_normalize_header(cell))
+        if field and field not in columns.values():
+            columns[index] = field
+    fields = set(columns.values())
+    if 'name' in fields and fields & {'sku', 'stock', 'unit_price', 'bulk_price'}:
+        return columns
+    return None
+
+
+def parse_decimal(value):
+    """Parse sheet amounts such as ``CLP 7.579``, ``1.234,5`` or ``3492.65``."""
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    text = re.sub(r'[^0-9.,-]', '', str(value))
+    if not text:
+        return None
+    if ',' in text:
+        # Chilean format: dot thousands, comma decimals
+        text = text.replace('.', '').replace(',', '.')
+    elif text.count('.') > 1 or re.search(r'\.\d{3}$', text):
+        text = text.replace('.', '')
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f'Monto inválido: {value!r}')
+
+
+def _text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def parse_record(raw):
+    """Turn a header-mapped row into product/variant values. Raises ``ValueError``."""
+    record = {field: _text(value) for field, value in raw.items() if field not in ('stock', 'unit_price', 'bulk_price', 'weight')}
+    record['sku'] = record.get('sku') or None
+
+    color = record.get('color', '')
+    record['source_color'] = color
+    match = WEIGHT_SIZE_RE.match(color)
+    if match and not raw.get('size') and not raw.get('weight'):
+        record['weight'] = float(match.group(1).replace(',', '.'))
+        record['size'] = match.group(2).strip()
+        record['color'] = ''
+    elif raw.get('weight') not in (None, ''):
+        weight = parse_decimal(raw['weight'])
+        record['weight'] = float(weight) if weight is not None else None
+    record.setdefault('color', '')
+    record.setdefault('size', '')
+    record.setdefault('weight', None)
+
+    stock = parse_decimal(raw.get('stock', '')) if raw.get('stock') not in (None, '') else Decimal(0)
+    record['stock'] = max(0, int(stock or 0))
+
+    unit_price = parse_decimal(raw['unit_price']) if raw.get('unit_price') not in (None, '') else None
+    bulk_price = parse_decimal(raw['bulk_price']) if raw.get('bulk_price') not in (None, '') else None
+    if unit_price is None and bulk_price is None:
+        raise ValueError('Fila sin precio')
+    if unit_price is None:
+        unit_price = gross_price(bulk_price)
+    if bulk_price is None:
+        bulk_price = net_price(unit_price)
+    record['unit_price'] = unit_price.quantize(Decimal('0.01'))
+    record['bulk_price'] = bulk_price.quantize(Decimal('0.01'))
+
+    record['has_variants'] = bool(record['color'] or record['size'] or record['weight'])
+    return record
+
+
+def iter_records(rows, on_error=None):
+    """Map raw sheet rows to records, skipping everything above the header row."""
+    columns = None
+    for line, row in enumerate(rows, 1):
+        if columns is None:
+            columns = _detect_columns(row)
+            continue
+        raw = {field: row[index] for index, field in columns.items() if index < len(row)}
+        if not _text(raw.get('name', '')):
+            continue  # blank separator rows and the TOTAL footer
+        try:
+            yield parse_record(raw)
+        except ValueError as exc:
+            if on_error:
+                on_error(line, str(exc))
+    if columns is None:
+        raise CatalogImportError('No se encontró la fila de encabezados (ITEM, UPC/JAN, ...)')
+
+
+def _variant_key(product_id, record):
+    return (product_id, record['color'], record['size'], record['weight'])
+
+
+class CatalogImporter:
+    """
+    Upsert records in batches. ``run`` yields one stats dict per batch.
+
+    With ``dry_run`` nothing is written; each batch's stats carry a ``diff``
+    list describing what would be created or changed.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, dry_run=False,
+                 default_category=DEFAULT_CATEGORY, default_brand=''):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.default_category = default_category
+        self.default_brand = default_brand
+
+    def run(self, records):
+        batch = {}
+        for record in records:
+            # Last row wins when the sheet repeats a variant within a batch
+            key = record['sku'] or (record['name'], record['color'], record['size'], record['weight'])
+            batch[key] = record
+            if len(batch) >= self.batch_size:
+                yield self._import_batch(list(batch.values()))
+                batch = {}
+        if batch:
+            yield self._import_batch(list(batch.values()))
+        if not self.dry_run:
+            invalidate_catalog_snapshot()
+            # Bulk writes send no signals; one GROUP BY refreshes the stock rollup
+            rebuild_rollups([STOCK_BY_CATEGORY])
+
+    def _import_batch(self, records):
+        started = time.perf_counter()
+        stats = {
+            'rows': len(records), 'products_created': 0, 'products_updated': 0,
+            'variants_created': 0, 'variants_updated': 0, 'unchanged': 0, 'diff': [],
+        }
+        if self.dry_run:
+            self._upsert(records, stats)
+        else:
+            with transaction.atomic():
+                self._upsert(records, stats)
+        stats['elapsed'] = time.perf_counter() - started
+        return stats
+
+    def _upsert(self, records, stats):
+        diff = stats['diff'] if self.dry_run else None
+
+        # Products, matched by name
+        products = {p.name: p for p in Product.objects.filter(name__in={r['name'] for r in records})}
+        new_products, new_names, changed_products = [], set(), {}
+        for record in records:
+            product = products.get(record['name'])
+            if product is None:
+                product = Product(
+                    name=record['name'],
+                    category=record.get('category') or self.default_category,
+                    brand=record.get('brand') or self.default_brand,
+                    description=record.get('description', ''),
+                )
+                products[record['name']] = product
+                new_products.append(product)
+                new_names.add(product.name)
+                if diff is not None:
+                    diff.append(f"+ producto {product.name} ({product.category})")
+                continue
+            if product.name in new_names:
+                continue
+            for field in PRODUCT_FIELDS:
+                value = record.get(field)
+                if value and getattr(product, field) != value:
+                    if diff is not None:
+                        diff.append(f"~ producto {product.name}: {field} {getattr(product, field)!r} -> {value!r}")
+                    setattr(product, field, value)
+                    changed_products[product.pk] = product
+
+        if not self.dry_run and new_products:
+            Product.objects.bulk_create(new_products, batch_size=self.batch_size)
+        if not self.dry_run and changed_products:
+            # bulk_update() skips auto_now
+            now = timezone.now()
+            for product in changed_products.values():
+                product.updated_at = now
+            Product.objects.bulk_update(
+                changed_products.values(), PRODUCT_FIELDS + ('updated_at',), batch_size=self.batch_size,
+            )
+        stats['products_created'] = len(new_products)
+        stats['products_updated'] = len(changed_products)
+
+        # Variants, matched by SKU, then by (product, color, size, weight)
+        existing_ids = [p.pk for p in products.values() if p.pk]
+        by_sku = {
+            v.sku: v for v in ProductVariant.objects.filter(sku__in={r['sku'] for r in records if r['sku']})
+        }
+        by_key = {
+            (v.product_id, v.color, v.size, v.weight): v
+            for v in ProductVariant.objects.filter(product_id__in=existing_ids, sku__isnull=True)
+        }
+
+        new_variants, changed_variants, changed_fields = [], [], set()
+        for record in records:
+            product = products[record['name']]
+            variant = by_sku.get(record['sku']) if record['sku'] else None
+            if variant is None and product.pk:
+                # Older rows may keep the sheet's "0.8g/15pcs" text as the color
+                variant = (
+                    by_key.pop(_variant_key(product.pk, record), None)
+                    or by_key.pop((product.pk, record['source_color'], '', None), None)
+                )
+            if variant is None:
+                values = {field: record[field] for field in VARIANT_FIELDS if field in record}
+                new_variants.append(ProductVariant(product=product, **values))
+                if diff is not None:
+                    diff.append(f"+ variante {product.name} {record['sku'] or ''} {record['color']} {record['size']}".rstrip())
+                continue
+
+            changes = [
+                field for field in VARIANT_FIELDS
+                if field in record and getattr(variant, field) != record[field]
+            ]
+            if variant.product_id != product.pk:
+                variant.product = product
+                changes.append('product')
+            if not changes:
+                stats['unchanged'] += 1
+                continue
+            if diff is not None:
+                diff.append(f"~ variante {variant.sku or variant.pk} ({product.name}): " + ', '.join(
+                    f"{field} {getattr(variant, field)!r} -> {record[field]!r}" for field in changes if field in record
+                ))
+            for field in changes:
+                if field in record:
+                    setattr(variant, field, record[field])
+            changed_variants.append(variant)
+            changed_fields.update(changes)
+
+        if not self.dry_run:
+            if new_variants:
+                ProductVariant.objects.bulk_create(new_variants, batch_size=self.batch_size)
+            if changed_variants:
+                now = timezone.now()
+                for variant in changed_variants:
+                    variant.updated_at = now
+                ProductVariant.objects.bulk_update(
+                    changed_variants, sorted(changed_fields) + ['updated_at'], batch_size=self.batch_size,
+                )
+            # bulk writes skip signals, so keep the search columns in sync here
+            refresh_search_index({p.pk for p in products.values()})
+        stats['variants_created'] = len(new_variants)
+        stats['variants_updated'] = len(changed_variants)
@@ -0,0 +1,103 @@
+"""
+Conditional GET for HTML pages.
+
+A page's validator must be cheap: cache-kept versions where the data has
+one (``catalog.catalog_stamp``, ``reservations.holds_state``), or an
+indexed ``max(updated_at)`` and row count of the user's own rows (the count
+catches deletions), plus per-user parts. Never an aggregate over a whole
+table: it would run on every request, 304 or not. ``conditional_page``
+hashes it into an ETag and answers a matching ``If-None-Match`` with 304
+before the view runs its main queries or renders anything.
+
+Every page also depends on the user shown in the navbar and on the CSRF
+secret its forms embed, so both are always part of the ETag.
+``PAGE_ETAG_SALT`` (the release id) retires every ETag when the templates
+change. Responses are ``Cache-Control: private, no-cache``: browsers keep the
+page but revalidate on every visit, and shared caches never store it.
+
+``update()`` and ``bulk_update()`` skip ``auto_now``, so code writing these
+models in bulk sets ``updated_at`` itself.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def table_stamp(queryset):
+    """(max updated_at, row count) of ``queryset`` in one aggregate query."""
+    stamp = queryset.order_by().aggregate(changed=Max('updated_at'), rows=Count('pk'))
+    return stamp['changed'], stamp['rows']
+
+
+def _csrf_secret(request):
+    # get_token() creates the secret on a first visit, as rendering a form
+    # would; the token it returns is masked differently on every call
+    get_token(request)
+    return request.META['CSRF_COOKIE']
+
+
+def _etag(request, parts):
+    user = request.user
+    key = repr((
+        getattr(settings, 'PAGE_ETAG_SALT', ''),
+        # The navbar shows the user's name and role menus
+        (user.pk, user.get_username(), getattr(user, 'first_name', ''), getattr(user, 'role', '')),
+        _csrf_secret(request),
+        parts,
+    ))
+    return quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+
+
+def conditional_page(validator):
+    """
+    Answer GET/HEAD with 304 when the page's validator is unchanged.
+
+    ``validator(request, *args, **kwargs)`` receives the view's arguments and
+    returns ``(parts, last_modified)``: anything ``repr``-able that changes
+    whenever the page would, and the newest ``updated_at`` shown (or None).
+    It returns None to skip conditional handling, e.g. when the view is going
+    to redirect.
+
+    Only ``If-None-Match`` is honoured. ``Last-Modified`` is sent for
+    information, but it cannot see the per-user parts, so ``If-Modified-Since``
+    alone always gets the full page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Pending flash messages are shown by the next render, so render it
+            if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+                return view(request, *args, **kwargs)
+            validated = validator(request, *args, **kwargs)
+            if validated is None:
+                return view(request, *args, **kwargs)
+            parts, last_modified = validated
+            etag = _etag(request, parts)
+
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            _set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def latest(*timestamps):
+    """Newest of ``timestamps``, ignoring None (empty tables)."""
+    return max((timestamp for timestamp in timestamps if timestamp is not None), default=None)
@@ -0,0 +1,168 @@
+"""
+The logged-in client's ``Client`` row and cart id, cached per user.
+
+Almost every landing view needs both. ``resolve_identity(request)`` sets
+``request.client`` (None for users without a Client) and ``request.cart_id``
+(None until the client has a cart) on its first call and reuses them for the
+rest of the request. Across requests they are kept in the cache next to the
+cart summary, so after a user's first request they cost no query; the
+``Client`` is rebuilt from the cached field values.
+
+Saving or deleting the user's Client or one of its carts drops the cached
+copy (see core.signals); like the other caches, this needs a shared cache
+(``REDIS_URL``) to reach every worker. A copy read inside a transaction is
+only cached once it commits, so a rolled-back cart never reaches the cache.
+The key carries a hash of the cached field names, so after a deploy that
+changes the ``Client`` fields the old copies are simply no longer read.
+
+A cached ``cart_id`` of None can still be stale: a request that read the
+identity just before another one created the cart may cache it afterwards.
+``request_cart``, ``resolve_cart_id`` and ``get_or_create_cart`` therefore
+check the database before treating a client as cartless, which costs one
+query only for clients that have no cart yet.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Min
+
+from .models import Cart, Client
+
+CLIENT_FIELDS = [field.attname for field in Client._meta.concrete_fields]
+
+
+def fields_version(fields):
+    """Short hash of the cached field names, in order."""
+    return hashlib.sha1(','.join(fields).encode()).hexdigest()[:8]
+
+
+IDENTITY_KEY = 'identity:' + fields_version(CLIENT_FIELDS) + ':user:{user_id}'
+
+
+def _key(user_id):
+    return IDENTITY_KEY.format(user_id=user_id)
+
+
+def _timeout():
+    return getattr(settings, 'CLIENT_IDENTITY_TIMEOUT', 3600)
+
+
+def invalidate_identity(user_id):
+    """Drop the cached client and cart of ``user_id``."""
+    if user_id is not None:
+        cache.delete(_key(user_id))
+
+
+def _client_query(user_id):
+    # The client and its first cart (the one the views have always used) in one query
+    return (
+        Client.objects.filter(user_id=user_id)
+        .annotate(first_cart_id=Min('carts__id'))
+        .values(*CLIENT_FIELDS, 'first_cart_id')
+    )
+
+
+def _identity(row):
+    if row is None:
+        return {'client': None, 'cart_id': None}
+    return {'client': [row[field] for field in CLIENT_FIELDS], 'cart_id': row['first_cart_id']}
+
+
+def _load_identity(user_id):
+    identity = _identity(_client_query(user_id).first())
+    # Inside a transaction, cache only if it commits
+    transaction.on_commit(lambda: cache.set(_key(user_id), identity, _timeout()))
+    return identity
+
+
+def _attach(request, identity):
+    values = identity['client']
+    request.client = Client.from_db(DEFAULT_DB_ALIAS, CLIENT_FIELDS, values) if values else None
+    request.cart_id = identity['cart_id']
+    return request.client, request.cart_id
+
+
+def resolve_identity(request):
+    """Set and return ``(request.client, request.cart_id)``."""
+    if hasattr(request, 'cart_id'):
+        return request.client, request.cart_id
+    user = request.user
+    if not user.is_authenticated:
+        request.client, request.cart_id = None, None
+        return None, None
+    identity = cache.get(_key(user.pk))
+    if identity is None:
+        identity = _load_identity(user.pk)
+    return _attach(request, identity)
+
+
+async def aresolve_identity(request):
+    """Async ``resolve_identity`` for async views."""
+    if hasattr(request, 'cart_id'):
+        return request.client, request.cart_id
+    user = await request.auser()
+    if not user.is_authenticated:
+        request.client, request.cart_id = None, None
+        return None, None
+    identity = await cache.aget(_key(user.pk))
+    if identity is None:
+        identity = await sync_to_async(_load_identity)(user.pk)
+    return _attach(request, identity)
+
+
+def _recheck_cart_id(request, client):
+    # The cached None may predate the cart; on a hit, drop the stale copy
+    cart_id = Cart.objects.filter(client=client).order_by('id').values_list('id', flat=True).first()
+    if cart_id:
+        request.cart_id = cart_id
+        invalidate_identity(request.user.pk)
+    return cart_id
+
+
+def resolve_cart_id(request):
+    """The request's cart id, or None if its client has no cart."""
+    client, cart_id = resolve_identity(request)
+    if client is not None and not cart_id:
+        cart_id = _recheck_cart_id(request, client)
+    return cart_id
+
+
+async def aresolve_cart_id(request):
+    """Async ``resolve_cart_id`` for async views."""
+    client, cart_id = await aresolve_identity(request)
+    if client is not None and not cart_id:
+        cart_id = await sync_to_async(_recheck_cart_id)(request, client)
+    return cart_id
+
+
+def request_cart(request):
+    """The request's cart as a ``Cart`` reference, or None."""
+    cart_id = resolve_cart_id(request)
+    return Cart(pk=cart_id, client=request.client) if cart_id else None
+
+
+def _create_cart(request, client):
+    cart = Cart.objects.create(client=client)
+    request.cart_id = cart.pk
+    # Drop the cached "no cart" now; the post_save signal drops it again on commit
+    invalidate_identity(request.user.pk)
+    return cart
+
+
+def get_or_create_cart(request):
+    """The request's cart, created on the client's first add."""
+    cart_id = resolve_cart_id(request)
+    if cart_id:
+        return Cart(pk=cart_id, client=request.client)
+    return _create_cart(request, request.client)
+
+
+async def aget_or_create_cart(request):
+    """Async ``get_or_create_cart`` for async views."""
+    cart_id = await aresolve_cart_id(request)
+    if cart_id:
+        return Cart(pk=cart_id, client=request.client)
+    return await sync_to_async(_create_cart)(request, request.client)
@@ -0,0 +1,214 @@
+"""
+Synthetic load data for benchmarks and query-plan checks.
+
+Builds clients (with login users), products, variants, open carts and order
+history with skewed, shop-like distributions: a few best-selling variants and
+a few heavy-buying clients account for most orders, order sizes are mostly
+small, and order dates spread over the last ``days``. Everything is written
+with ``bulk_create`` in batches; denormalized data (search columns, KPI
+rollups, catalog snapshot) is rebuilt once at the end, as the importer does.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import invalidate_catalog_snapshot
+from .models import (
+    Cart, CartItem, Client, OrderItem, Product, ProductVariant, PurchaseOrder, StockReservation, User,
+)
+from .pricing import CENT, line_amounts, net_price, update_order_totals
+from .reservations import holds_changed, reservation_ttl
+from .rollups import rebuild_rollups
+from .search import refresh_search_index
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PASSWORD = 'loadtest'
+
+# (value, weight) pairs
+CATEGORIES = [
+    ('Soft baits', 30), ('MINNOW', 20), ('Jigs', 15), ('Spinners', 10),
+    ('Anzuelos', 10), ('Líneas', 8), ('Accesorios', 7),
+]
+BRANDS = ['Inserf', 'Daiwa', 'Shimano', 'Rapala', 'Yo-Zuri', 'Berkley', 'Owner', '']
+COLORS = ['Rojo', 'Azul', 'Verde', 'Blanco', 'Negro', 'Plateado', 'Dorado', 'Chartreuse', 'Natural', '']
+SIZES = ['5pcs', '10pcs', '15pcs', '2"', '3"', '4"', '5"', '7g', '14g', '21g', '28g']
+STATUSES = [('completado', 70), ('pendiente', 25), ('cancelado', 5)]
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights)[0]
+
+
+def _zipf_weights(count, exponent=1.1):
+    """Popularity weights for ``count`` ranked items: a long tail behind a few hits."""
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def _price(rng):
+    """Gross unit price in whole pesos, log-normal around ~5.000."""
+    return Decimal(max(500, round(rng.lognormvariate(8.5, 0.6), -1))).quantize(CENT)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class LoadDataGenerator:
+    """
+    Generate a dataset of the given size. ``log`` receives one progress line
+    per phase; ``run`` returns the number of rows created per model.
+    """
+
+    def __init__(self, clients=200, products=500, orders=2000, max_variants=6, cart_ratio=0.3,
+                 days=365, prefix='load', password=DEFAULT_PASSWORD, batch_size=DEFAULT_BATCH_SIZE,
+                 seed=None, log=None):
+        self.clients = clients
+        self.products = products
+        self.orders = orders
+        self.max_variants = max_variants
+        self.cart_ratio = cart_ratio
+        self.days = days
+        self.prefix = prefix
+        self.password = password
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.created = dict.fromkeys(
+            ('users', 'clients', 'products', 'variants', 'carts', 'cart_items', 'orders', 'order_items'), 0
+        )
+
+    def run(self):
+        with transaction.atomic():
+            clients = self._create_clients()
+            variants = self._create_catalog()
+            self._create_carts(clients, variants)
+            self._create_orders(clients, variants)
+        refresh_search_index()
+        rebuild_rollups()
+        invalidate_catalog_snapshot()
+        holds_changed()
+        self.log("Rebuilt search index, KPI rollups and catalog snapshot")
+        return self.created
+
+    def _bulk(self, model, objects):
+        created = []
+        for chunk in _chunks(objects, self.batch_size):
+            created += model.objects.bulk_create(chunk)
+        return created
+
+    def _create_clients(self):
+        # Continue numbering after an earlier run with the same prefix
+        offset = User.objects.filter(username__startswith=f'{self.prefix}-').count()
+        password = make_password(self.password)  # hashed once, shared by every account
+        users = self._bulk(User, [
+            User(username=f'{self.prefix}-client-{offset + number:06d}', password=password,
+                 name=f'Cliente {offset + number}', role='client', email=f'{self.prefix}{offset + number}@example.com')
+            for number in range(self.clients)
+        ])
+        if not User.objects.filter(username=f'{self.prefix}-admin').exists():
+            User.objects.create(username=f'{self.prefix}-admin', password=password, name='Admin', role='admin')
+            self.created['users'] += 1
+        clients = self._bulk(Client, [
+            Client(user=user, company_name=f'Comercial {user.name} SpA',
+                   tax_id=f'{76000000 + user.pk}-{user.pk % 10}', address=f'Av. Costanera {user.pk}, Puerto Montt',
+                   phone=f'+56 9 {self.rng.randint(10000000, 99999999)}', email=user.email)
+            for user in users
+        ])
+        self.created['users'] += len(users)
+        self.created['clients'] = len(clients)
+        self.log(f"Created {len(clients)} clients with users {self.prefix}-client-* (password: {self.password})")
+        return clients
+
+    def _create_catalog(self):
+        products = []
+        for number in range(self.products):
+            category = _weighted(self.rng, CATEGORIES)
+            products.append(Product(
+                name=f'{category} {number:05d}', brand=self.rng.choice(BRANDS), category=category,
+                description='Producto generado para pruebas de carga.', is_active=self.rng.random() > 0.03,
+            ))
+        products = self._bulk(Product, products)
+        variants = []
+        for product in products:
+            # Most products have one or two variants, a few have many
+            count = min(self.max_variants, 1 + int(self.rng.expovariate(0.8)))
+            for number in range(count):
+                unit_price = _price(self.rng)
+                variants.append(ProductVariant(
+                    product=product, sku=f'{self.prefix}-{product.pk}-{number}',
+                    color=self.rng.choice(COLORS), size=self.rng.choice(SIZES),
+                    weight=round(self.rng.uniform(0.5, 30), 1), is_luminous=self.rng.random() < 0.1,
+                    stock=0 if self.rng.random() < 0.05 else int(self.rng.lognormvariate(3.5, 1)),
+                    unit_price=unit_price, bulk_price=net_price(unit_price),
+                    has_variants=count > 1,
+                ))
+        variants = self._bulk(ProductVariant, variants)
+        self.created['products'] = len(products)
+        self.created['variants'] = len(variants)
+        self.log(f"Created {len(products)} products with {len(variants)} variants")
+        return variants
+
+    def _create_carts(self, clients, variants):
+        in_stock = [variant for variant in variants if variant.stock > 0]
+        if not in_stock:
+            return
+        with_cart = self.rng.sample(clients, int(len(clients) * self.cart_ratio))
+        carts = self._bulk(Cart, [Cart(client=client) for client in with_cart])
+        items = []
+        for cart in carts:
+            for variant in self.rng.sample(in_stock, min(len(in_stock), self.rng.randint(1, 8))):
+                items.append(CartItem(cart=cart, variant=variant, quantity=self.rng.randint(1, min(5, variant.stock)),
+                                      variant_details=f'{variant.color} / {variant.size}'))
+        items = self._bulk(CartItem, items)
+        expires_at = timezone.now() + reservation_ttl()
+        self._bulk(StockReservation, [
+            StockReservation(cart_item=item, client_id=item.cart.client_id, variant=item.variant, quantity=item.quantity,
+                             expires_at=expires_at)
+            for item in items
+        ])
+        self.created['carts'] = len(carts)
+        self.created['cart_items'] = len(items)
+        self.log(f"Created {len(carts)} open carts with {len(items)} reserved lines")
+
+    def _create_orders(self, clients, variants):
+        if not clients or not variants:
+            return
+        # Shuffle before ranking so popularity is unrelated to creation order
+        ranked_clients = self.rng.sample(clients, len(clients))
+        ranked_variants = self.rng.sample(variants, len(variants))
+        client_weights = _zipf_weights(len(ranked_clients), exponent=0.8)
+        variant_weights = _zipf_weights(len(ranked_variants))
+        now = timezone.now()
+
+        for batch in _chunks(range(self.orders), self.batch_size):
+            owners = self.rng.choices(ranked_clients, client_weights, k=len(batch))
+            orders = PurchaseOrder.objects.bulk_create([
+                PurchaseOrder(client=owner, status=_weighted(self.rng, STATUSES), total_amount=0)
+                for owner in owners
+            ])
+            # created_at is auto_now_add, so spread the dates with a second write
+            for order in orders:
+                order.created_at = now - timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+            PurchaseOrder.objects.bulk_update(orders, ['created_at'])
+
+            items = []
+            for order in orders:
+                count = min(len(ranked_variants), 1 + int(self.rng.expovariate(0.4)))
+                chosen = {variant.pk: variant for variant in
+                          self.rng.choices(ranked_variants, variant_weights, k=count)}
+                for variant in chosen.values():
+                    quantity = self.rng.choice((1, 1, 1, 2, 2, 3, 5, 10, 12))
+                    items.append(OrderItem(order=order, variant=variant, quantity=quantity,
+                                           variant_details=f'{variant.color} / {variant.size}',
+                                           **line_amounts(variant.unit_price, quantity)))
+            self._bulk(OrderItem, items)
+            update_order_totals(PurchaseOrder.objects.filter(pk__in=[order.pk for order in orders]))
+            self.created['orders'] += len(orders)
+            self.created['order_items'] += len(items)
+            self.log(f"Created {self.created['orders']}/{self.orders} orders ({self.created['order_items']} items)")
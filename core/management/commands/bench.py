@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench import BenchError, Flows, HttpDriver, TestClientDriver, WsgiDriver, compare, environment, run_bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main flows (catalog, add to cart, checkout, my_orders, dashboard home) and report "
+        "p50/p95/p99 latency, queries per request and throughput. Example: "
+        "python manage.py bench --requests 200 --output bench.json --compare previous.json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flow', action='append', choices=Flows.NAMES, dest='flows',
+                            help="Run only this flow (repeatable)")
+        parser.add_argument('--requests', type=int, default=100, help="Timed requests per flow")
+        parser.add_argument('--warmup', type=int, default=5, help="Untimed requests per flow before timing")
+        parser.add_argument('--concurrency', type=int, default=1, help="Parallel workers per flow")
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument('--url', help="Benchmark a running server at this base URL instead of in-process")
+        target.add_argument('--wsgi', action='store_true',
+                            help="Run in-process through the WSGI handler, so database connections are opened "
+                                 "and reused per DB_CONNECTION_MODE as in production (writes are kept)")
+        parser.add_argument('--client-user', help="Username of a client account (default: first client)")
+        parser.add_argument('--admin-user', help="Username of an admin account (default: first admin)")
+        parser.add_argument('--password', help="Password of both accounts (required with --url)")
+        parser.add_argument('--commit', action='store_true',
+                            help="Keep in-process writes instead of rolling back each iteration")
+        parser.add_argument('--seed', type=int, help="Random seed for the variants added to carts")
+        parser.add_argument('-o', '--output', help="Save the results as JSON to this file")
+        parser.add_argument('--compare', help="Print the change against a previous JSON result file")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive, --warmup not negative")
+        previous = None
+        if options['compare']:
+            try:
+                previous = json.loads(Path(options['compare']).read_text())['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        client_user = self._user(options['client_user'], role='client')
+        admin_user = self._user(options['admin_user'], role='admin')
+        if client_user is None:
+            raise CommandError("No client user with a client record found; run generate_load_data first")
+
+        if options['url']:
+            driver = HttpDriver(options['url'])
+        elif options['wsgi']:
+            driver = WsgiDriver()
+        else:
+            driver = TestClientDriver(commit=options['commit'])
+        try:
+            results = run_bench(
+                driver, client_user, admin_user,
+                flow_names=options['flows'] or Flows.NAMES,
+                password=options['password'],
+                requests=options['requests'],
+                warmup=options['warmup'],
+                concurrency=options['concurrency'],
+                seed=options['seed'],
+                log=self.stdout.write,
+            )
+        except BenchError as exc:
+            raise CommandError(str(exc))
+
+        report = {
+            'environment': environment(),
+            'options': {
+                key: options[key]
+                for key in ('requests', 'warmup', 'concurrency', 'url', 'wsgi', 'commit', 'seed')
+            },
+            'results': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Saved results to {options['output']}"))
+        if previous is not None:
+            for line in compare(previous, results):
+                self.stdout.write(line)
+
+    def _user(self, username, role):
+        users = get_user_model().objects.filter(is_active=True)
+        if username:
+            user = users.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"User {username} not found")
+            return user
+        if role == 'client':
+            users = users.filter(client__isnull=False)
+        return users.filter(role=role).order_by('id').first()
@@ -0,0 +1,148 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client as TestClient
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.models import Client, PurchaseOrder
+
+# Bookkeeping queries every authenticated request makes
+NOISE_TABLES = ('django_session', 'django_content_type', 'auth_permission')
+
+# Plan lines that usually mean a missing or unusable index
+FULL_SCAN = re.compile(r'Seq Scan|\bSCAN \w+$|USE TEMP B-TREE')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every landing and dashboard page, capture the SQL each one runs and print its "
+        "EXPLAIN plan, flagging full scans. Nothing is written: the run is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client-user', help="Username of a client account (default: first client)")
+        parser.add_argument('--admin-user', help="Username of an admin account (default: first admin)")
+        parser.add_argument('--analyze', action='store_true',
+                            help="Use EXPLAIN ANALYZE on PostgreSQL (runs the queries)")
+        parser.add_argument('--only', help="Only views whose name contains this text")
+
+    def handle(self, *args, **options):
+        client_user = self._user(options['client_user'], role='client')
+        admin_user = self._user(options['admin_user'], role='admin')
+        if not client_user and not admin_user:
+            raise CommandError("No client or admin user found to request the pages with")
+
+        flagged = 0
+        try:
+            with transaction.atomic():
+                for name, user, url in self._pages(client_user, admin_user):
+                    if options['only'] and options['only'] not in name:
+                        continue
+                    flagged += self._explain_page(name, user, url, options['analyze'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        style = self.style.WARNING if flagged else self.style.SUCCESS
+        self.stdout.write(style(f"{flagged} plan(s) with full scans or temp sorts"))
+
+    def _user(self, username, role):
+        users = get_user_model().objects.filter(is_active=True)
+        if username:
+            user = users.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"User {username} not found")
+            return user
+        return users.filter(role=role).order_by('id').first()
+
+    def _pages(self, client_user, admin_user):
+        """(view name, user, url) for every page, using real ids where a page needs one."""
+        pages = []
+        if client_user:
+            pages += [
+                ('landing:home', client_user, reverse('landing:home')),
+                ('landing:catalog', client_user, reverse('landing:catalog')),
+                ('landing:catalog?q', client_user, reverse('landing:catalog') + '?q=vinilo'),
+                ('landing:catalog_api', client_user, reverse('landing:catalog_api')),
+                ('landing:catalog_search', client_user, reverse('landing:catalog_search') + '?q=vinilo'),
+                ('landing:cart', client_user, reverse('landing:cart')),
+                ('landing:checkout', client_user, reverse('landing:checkout')),
+                ('landing:my_orders', client_user, reverse('landing:my_orders')),
+                ('landing:my_orders?status', client_user, reverse('landing:my_orders') + '?status=pendiente'),
+            ]
+            order = PurchaseOrder.objects.filter(client__user=client_user).order_by('-id').first()
+            if order:
+                pages += [
+                    ('landing:order_detail', client_user, reverse('landing:order_detail', args=[order.id])),
+                    ('landing:order_confirmation', client_user,
+                     reverse('landing:order_confirmation', args=[order.id])),
+                ]
+        if admin_user:
+            pages += [
+                ('admin_home', admin_user, reverse('admin_home')),
+                ('client_home', admin_user, reverse('client_home')),
+                ('orders_by_client', admin_user, reverse('orders_by_client')),
+                ('export_data', admin_user, reverse('export_data', args=['order_items']) + '?status=pendiente'),
+            ]
+            client = Client.objects.order_by('id').first()
+            if client:
+                pages.append(('client_orders', admin_user, reverse('client_orders', args=[client.id])))
+        return pages
+
+    def _explain_page(self, name, user, url, analyze):
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith('SELECT') \
+                    and not any(table in sql for table in NOISE_TABLES):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        browser = TestClient()
+        browser.force_login(user)
+        with override_settings(ALLOWED_HOSTS=['testserver']), connection.execute_wrapper(capture):
+            response = browser.get(url)
+            # Streaming responses run their queries while being consumed
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n== {name} {url} -> {response.status_code}, {len(queries)} queries"
+        ))
+        flagged = 0
+        seen = set()
+        for sql, params in queries:
+            if sql in seen:
+                continue
+            seen.add(sql)
+            plan = self._explain(sql, params, analyze)
+            scans = [line for line in plan if FULL_SCAN.search(line)]
+            flagged += bool(scans)
+            self.stdout.write(f"\n{sql}")
+            for line in plan:
+                self.stdout.write(self.style.WARNING(f"  {line}") if line in scans else f"  {line}")
+        return flagged
+
+    def _explain(self, sql, params, analyze):
+        if connection.vendor == 'postgresql':
+            prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+        elif connection.vendor == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        else:
+            prefix = 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            # (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        return [' '.join(str(value) for value in row) for row in rows]
+
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from core.bulk_fixtures import DEFAULT_BATCH_SIZE, FORMATS, FixtureError, FixtureLoader
+
+
+class Command(BaseCommand):
+    help = (
+        "Load dumpdata fixtures (JSON or JSON Lines, optionally .gz) streaming, in bulk batches per model, "
+        "with COPY on PostgreSQL. Example: python manage.py fast_loaddata dashboard/fixtures/*.json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Fixture files to load")
+        parser.add_argument('--format', choices=FORMATS, help="Override the format detected from the extension")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per insert")
+        parser.add_argument(
+            '--no-refresh', action='store_true',
+            help="Skip rebuilding the search index and rollups (run rebuild_search_index and reconcile_rollups later)",
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        loader = FixtureLoader(
+            batch_size=options['batch_size'], fmt=options['format'], refresh=not options['no_refresh'],
+        )
+        started = time.perf_counter()
+        try:
+            for stats in loader.run(options['paths']):
+                self.stdout.write(
+                    f"{stats['path']}: {stats['records']} objects in {stats['elapsed']:.2f}s "
+                    f"({stats['records'] / max(stats['elapsed'], 1e-6):.0f} objects/s)"
+                )
+        except (FixtureError, OSError, DatabaseError) as exc:
+            raise CommandError(f"Nothing loaded: {exc}")
+
+        elapsed = time.perf_counter() - started
+        for model, rows in sorted(loader.counts.items(), key=lambda item: item[0]._meta.label):
+            self.stdout.write(f"  {model._meta.label}: {rows} rows")
+        rows = sum(loader.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-6):.0f} rows/s)"
+        ))
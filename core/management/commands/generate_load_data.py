@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadgen import DEFAULT_BATCH_SIZE, DEFAULT_PASSWORD, LoadDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic clients, products, variants, carts and orders with bulk inserts, "
+        "for benchmarks. Example: python manage.py generate_load_data --clients 1000 --orders 50000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--max-variants', type=int, default=6, help="Most variants a product can have")
+        parser.add_argument('--cart-ratio', type=float, default=0.3, help="Share of clients with an open cart")
+        parser.add_argument('--days', type=int, default=365, help="Spread order dates over this many days")
+        parser.add_argument('--prefix', default='load', help="Prefix for generated usernames and SKUs")
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help="Password for generated users")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible datasets")
+
+    def handle(self, *args, **options):
+        for name in ('clients', 'products', 'orders', 'days'):
+            if options[name] < 0:
+                raise CommandError(f"--{name} must not be negative")
+        if options['batch_size'] < 1 or options['max_variants'] < 1:
+            raise CommandError("--batch-size and --max-variants must be positive")
+        if not 0 <= options['cart_ratio'] <= 1:
+            raise CommandError("--cart-ratio must be between 0 and 1")
+
+        generator = LoadDataGenerator(
+            clients=options['clients'],
+            products=options['products'],
+            orders=options['orders'],
+            max_variants=options['max_variants'],
+            cart_ratio=options['cart_ratio'],
+            days=options['days'],
+            prefix=options['prefix'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        started = time.perf_counter()
+        created = generator.run()
+        elapsed = time.perf_counter() - started
+        rows = sum(created.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-6):.0f} rows/s) - "
+            + ', '.join(f"{name} +{count}" for name, count in created.items())
+        ))
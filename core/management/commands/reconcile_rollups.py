@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import KpiRollup
+from core.rollups import METRICS, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard KPI rollups from the source tables and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metric', action='append', choices=METRICS, dest='metrics',
+                            help="Rebuild only this metric (repeatable)")
+
+    def handle(self, *args, **options):
+        metrics = options['metrics'] or METRICS
+        before = {
+            (row.metric, row.key): row.value
+            for row in KpiRollup.objects.filter(metric__in=metrics)
+        }
+        started = time.perf_counter()
+        rebuild_rollups(metrics)
+        elapsed = time.perf_counter() - started
+        after = {
+            (row.metric, row.key): row.value
+            for row in KpiRollup.objects.filter(metric__in=metrics)
+        }
+
+        for metric, key in sorted(before.keys() | after.keys()):
+            old, new = before.get((metric, key), 0), after.get((metric, key), 0)
+            if old != new:
+                self.stdout.write(self.style.WARNING(f"{metric}[{key}]: {old} -> {new}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(after)} rollup rows for {', '.join(metrics)} in {elapsed:.2f}s"
+        ))
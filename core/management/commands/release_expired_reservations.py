@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.reservations import DEFAULT_SWEEP_BATCH_SIZE, release_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired cart stock reservations in batches (optionally in a loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_SWEEP_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping until interrupted")
+        parser.add_argument('--interval', type=float, default=60, help="Seconds between sweeps with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            removed = release_expired(options['batch_size'])
+            if removed or not options['loop']:
+                self.stdout.write(f"Released {removed} expired reservations")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
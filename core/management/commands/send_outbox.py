@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import DEFAULT_BATCH_SIZE, send_batch
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails in batches (optionally in a loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep sending until interrupted")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            # Drain everything that is due before sleeping
+            while True:
+                sent, failed = send_batch(options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < options['batch_size']:
+                    break
+            if total_sent or total_failed or not options['loop']:
+                self.stdout.write(f"Sent {total_sent} emails, {total_failed} failed")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,68 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import perf
+
+
+class PerformanceMiddleware:
+    """
+    Time each request, its queries and template rendering (see core.perf).
+
+    Installed first in ``MIDDLEWARE`` when ``PERF_INSTRUMENTATION`` is on, so
+    the numbers cover the other middleware (sessions, auth) as well. Works in
+    both WSGI and ASGI stacks without forcing async views back to a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(perf.install_query_hook, dispatch_uid='perf.install_query_hook')
+        self.hooked_sync_thread = False
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._install_hooks()
+        profile = perf.RequestProfile()
+        token = perf.activate(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            perf.deactivate(token)
+        profile.finish()
+        response['Server-Timing'] = profile.server_timing()
+        perf.report(self._view_name(request), request, response, profile)
+        return response
+
+    async def __acall__(self, request):
+        if not self.hooked_sync_thread:
+            # Connections the ORM's sync thread opened before this middleware
+            # existed missed connection_created; later ones are hooked by it
+            await sync_to_async(self._install_hooks)()
+            self.hooked_sync_thread = True
+        profile = perf.RequestProfile()
+        token = perf.activate(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            perf.deactivate(token)
+        profile.finish()
+        response['Server-Timing'] = profile.server_timing()
+        # Logging and the periodic cache flush may block
+        await sync_to_async(perf.report, thread_sensitive=False)(
+            self._view_name(request), request, response, profile,
+        )
+        return response
+
+    def _install_hooks(self):
+        for connection in connections.all(initialized_only=True):
+            perf.install_query_hook(connection)
+
+    def _view_name(self, request):
+        match = request.resolver_match
+        return match.view_name if match else 'unresolved'
@@ -0,0 +1,50 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVectorField
+from django.db import migrations, models
+
+import core.operations
+
+
+def populate_search_columns(apps, schema_editor):
+    from core.search import refresh_search_index
+
+    refresh_search_index(
+        product_model=apps.get_model('core', 'Product'),
+        variant_model=apps.get_model('core', 'ProductVariant'),
+        using=schema_editor.connection.alias,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_productvariant_image_url'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=SearchVectorField(editable=False, null=True),
+        ),
+        core.operations.PostgreSQLOnly(
+            migrations.AddIndex(
+                model_name='product',
+                index=GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            ),
+        ),
+        core.operations.PostgreSQLOnly(
+            migrations.AddIndex(
+                model_name='product',
+                index=GinIndex(fields=['search_document'], name='product_search_trgm_idx', opclasses=['gin_trgm_ops']),
+            ),
+        ),
+        migrations.RunPython(populate_search_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    from core.rollups import rebuild_rollups
+
+    rebuild_rollups(
+        rollup_model=apps.get_model('core', 'KpiRollup'),
+        order_model=apps.get_model('core', 'PurchaseOrder'),
+        variant_model=apps.get_model('core', 'ProductVariant'),
+        client_model=apps.get_model('core', 'Client'),
+        using=schema_editor.connection.alias,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=32)),
+                ('key', models.CharField(blank=True, max_length=255)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'key'), name='kpi_rollup_metric_key_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
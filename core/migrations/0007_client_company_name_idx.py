@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+import core.operations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_kpirollup'),
+    ]
+
+    operations = [
+        core.operations.ConcurrentAddIndex(
+            model_name='client',
+            index=models.Index(fields=['company_name', 'id'], name='client_company_name_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+import core.operations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_client_company_name_idx'),
+    ]
+
+    operations = [
+        core.operations.ConcurrentAddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['client', 'status', '-created_at', '-id'], name='order_client_status_idx'),
+        ),
+        core.operations.ConcurrentAddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['client', '-created_at', '-id'], name='order_client_created_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:16
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    """Fold repeated (cart, variant) lines into the oldest one before it becomes unique."""
+    CartItem = apps.get_model('core', 'CartItem')
+    items = CartItem.objects.using(schema_editor.connection.alias)
+    duplicates = (
+        items.values('cart_id', 'variant_id')
+        .annotate(lines=Count('id'), keep_id=Min('id'), quantity=Sum('quantity'))
+        .filter(lines__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates.iterator():
+        items.filter(pk=duplicate['keep_id']).update(quantity=duplicate['quantity'])
+        items.filter(cart_id=duplicate['cart_id'], variant_id=duplicate['variant_id']) \
+            .exclude(pk=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_purchaseorder_client_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+    ]
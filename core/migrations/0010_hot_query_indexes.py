@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:16
+
+import core.operations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_merge_duplicate_cart_items'),
+    ]
+
+    operations = [
+        core.operations.ConcurrentAddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'category', 'name', 'id'], name='product_active_catalog_idx'),
+        ),
+        core.operations.ConcurrentAddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['product', 'has_variants'], name='variant_product_hasvar_idx'),
+        ),
+        core.operations.ConcurrentAddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['status'], name='order_status_idx'),
+        ),
+        core.operations.ConcurrentAddUniqueConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'variant'), name='cartitem_cart_variant_uniq'),
+        ),
+    ]
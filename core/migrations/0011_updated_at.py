@@ -0,0 +1,40 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+import core.operations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        # A constant default: PostgreSQL adds the columns without rewriting the tables
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        core.operations.ConcurrentAddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['client', 'updated_at'], name='order_client_updated_idx'),
+        ),
+    ]
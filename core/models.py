@@ -1,6 +1,9 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from decimal import Decimal
+
+from . import pricing
 
 class User(AbstractUser):
     name = models.CharField(max_length=100)
@@ -19,6 +22,12 @@ class Client(models.Model):
     phone = models.CharField(max_length=30)
     email = models.EmailField()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the dashboard client lists
+            models.Index(fields=['company_name', 'id'], name='client_company_name_idx'),
+        ]
+
     def __str__(self):
         return self.company_name
 
@@ -29,12 +38,26 @@ class Product(models.Model):
     category = models.CharField(max_length=100)
     image_url = models.URLField(blank=True)
     is_active = models.BooleanField(default=True)
+    # Queryset update()s and bulk_update()s must set it themselves (see core.conditional)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized search columns, kept in sync by core.search
+    search_document = models.TextField(blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['search_document'], name='product_search_trgm_idx', opclasses=['gin_trgm_ops']),
+            # Active catalog in (category, name, id) keyset order
+            models.Index(fields=['is_active', 'category', 'name', 'id'], name='product_active_catalog_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 class ProductVariant(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)  # UPC/JAN from the product sheet
     color = models.CharField(max_length=50, blank=True)
     weight = models.FloatField(null=True, blank=True)
     size = models.CharField(max_length=50, blank=True)
@@ -44,6 +67,12 @@ class ProductVariant(models.Model):
     bulk_price = models.DecimalField(max_digits=10, decimal_places=2)
     has_variants = models.BooleanField(default=True)
     image_url = models.URLField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'has_variants'], name='variant_product_hasvar_idx'),
+        ]
 
     def __str__(self):
         if not self.has_variants:
@@ -78,6 +107,12 @@ class CartItem(models.Model):
     variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='cart_items')
     quantity = models.PositiveIntegerField()
     variant_details = models.TextField(blank=True)  # Store variant details as text
+
+    class Meta:
+        constraints = [
+            # One line per variant; repeated adds increase its quantity
+            models.UniqueConstraint(fields=['cart', 'variant'], name='cartitem_cart_variant_uniq'),
+        ]
     
     def save(self, *args, **kwargs):
         # Store variant details when saving the cart item
@@ -91,7 +126,7 @@ class CartItem(models.Model):
     @property
     def net_price(self):
         """Returns the unit price without VAT"""
-        return self.variant.unit_price / Decimal('1.19')  # Assuming 19% VAT
+        return pricing.net_price(self.variant.unit_price)
     
     @property
     def vat_amount(self):
@@ -113,6 +148,26 @@ class CartItem(models.Model):
         """Returns the subtotal with VAT included"""
         return self.variant.unit_price * self.quantity
 
+class StockReservation(models.Model):
+    """Time-limited hold on variant stock for one cart line (see core.reservations)."""
+    cart_item = models.OneToOneField(CartItem, on_delete=models.CASCADE, related_name='reservation')
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='reservations')
+    # The cart's client, copied so the aggregate can skip a client's own holds without joining carts
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Covers SUM(quantity) of other clients' active holds per variant
+            models.Index(fields=['variant', 'expires_at'], include=['quantity', 'client'], name='reservation_held_idx'),
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.variant_id} until {self.expires_at:%H:%M}"
+
 class PurchaseOrder(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='purchase_orders')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -121,6 +176,17 @@ class PurchaseOrder(models.Model):
     net_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Total without VAT
     vat_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # VAT amount
     notes = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # A client's order history (optionally by status), newest first, in keyset order
+            models.Index(fields=['client', 'status', '-created_at', '-id'], name='order_client_status_idx'),
+            models.Index(fields=['client', '-created_at', '-id'], name='order_client_created_idx'),
+            models.Index(fields=['status'], name='order_status_idx'),
+            # Index-only max(updated_at)/count of a client's orders (my_orders validator)
+            models.Index(fields=['client', 'updated_at'], name='order_client_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.client.company_name}"
@@ -138,22 +204,11 @@ class OrderItem(models.Model):
     variant_details = models.TextField(blank=True)  # Store variant details as text
     
     def save(self, *args, **kwargs):
-        # Calculate prices if not provided
-        if not self.net_unit_price:
-            self.net_unit_price = self.unit_price / Decimal('1.19')  # Assuming 19% VAT
-        
-        if not self.vat_amount:
-            self.vat_amount = self.unit_price - self.net_unit_price
-            
-        if not self.net_subtotal:
-            self.net_subtotal = self.net_unit_price * self.quantity
-            
-        if not self.vat_subtotal:
-            self.vat_subtotal = self.vat_amount * self.quantity
-            
-        if not self.subtotal:
-            self.subtotal = self.unit_price * self.quantity
-            
+        # Fill in whichever price fields were not provided
+        for field, value in pricing.line_amounts(self.unit_price, self.quantity).items():
+            if not getattr(self, field):
+                setattr(self, field, value)
+
         # Store variant details when saving the order item
         if not self.variant_details and self.variant:
             self.variant_details = self.variant.get_variant_display()
@@ -162,3 +217,47 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.variant} for Order #{self.order.id}"
+
+class KpiRollup(models.Model):
+    """Pre-aggregated dashboard counter, one row per (metric, key) (see core.rollups)."""
+    metric = models.CharField(max_length=32)
+    key = models.CharField(max_length=255, blank=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'key'], name='kpi_rollup_metric_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}[{self.key}] = {self.value}"
+
+
+class OutboxMessage(models.Model):
+    """Email waiting to be sent by ``manage.py send_outbox`` (see core.outbox)."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = [(PENDING, 'Pendiente'), (SENT, 'Enviado'), (DEAD, 'Fallido')]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Earliest next delivery attempt; also the lease of a worker sending it
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "pending and due" scan
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
@@ -0,0 +1,123 @@
+"""Custom migration operations."""
+from django.db import NotSupportedError
+from django.db.migrations.operations import AddConstraint, AddIndex
+from django.db.migrations.operations.base import Operation
+from django.db.models import UniqueConstraint
+
+
+class PostgreSQLOnly(Operation):
+    """
+    Apply the wrapped operation's schema change on PostgreSQL only.
+
+    The migration state is always updated, so models can declare
+    PostgreSQL-specific indexes (GIN, trigram) while the SQLite database of
+    ``inserf.test_settings`` simply skips them.
+    """
+
+    reversible = True
+    reduces_to_sql = False
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.operation], {}
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            self.operation.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            self.operation.database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f"{self.operation.describe()} (PostgreSQL only)"
+
+    @property
+    def migration_name_fragment(self):
+        return self.operation.migration_name_fragment
+
+
+def _concurrent(schema_editor, operation):
+    """Whether to build without blocking writes (PostgreSQL, outside a transaction)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    if schema_editor.connection.in_atomic_block:
+        raise NotSupportedError(
+            f"{operation.__class__.__name__} cannot run inside a transaction (set atomic = False on the migration)."
+        )
+    return True
+
+
+class ConcurrentAddIndex(AddIndex):
+    """
+    ``AddIndex`` that uses ``CREATE INDEX CONCURRENTLY`` on PostgreSQL.
+
+    Writes keep flowing while the index builds on a large table. Other
+    backends get a plain ``CREATE INDEX``. The migration must set
+    ``atomic = False``.
+    """
+
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if _concurrent(schema_editor, self):
+            schema_editor.add_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if _concurrent(schema_editor, self):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, self.index)
+
+    def describe(self):
+        return f"{super().describe()} (concurrently on PostgreSQL)"
+
+
+class ConcurrentAddUniqueConstraint(AddConstraint):
+    """
+    ``AddConstraint`` for a plain field ``UniqueConstraint``.
+
+    On PostgreSQL the unique index is built with ``CREATE UNIQUE INDEX
+    CONCURRENTLY`` and then attached with ``ADD CONSTRAINT ... USING INDEX``,
+    which only takes a brief lock. The migration must set ``atomic = False``.
+    """
+
+    atomic = False
+
+    def __init__(self, model_name, constraint):
+        if not isinstance(constraint, UniqueConstraint) or not constraint.fields or constraint.condition \
+                or constraint.include or constraint.opclasses or constraint.deferrable:
+            raise ValueError('ConcurrentAddUniqueConstraint only supports plain field UniqueConstraints.')
+        super().__init__(model_name, constraint)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not _concurrent(schema_editor, self):
+            schema_editor.add_constraint(model, self.constraint)
+            return
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        name = quote(self.constraint.name)
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in self.constraint.fields)
+        # A failed concurrent build leaves an INVALID index behind; start clean
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}', params=None)
+        schema_editor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY {name} ON {table} ({columns})', params=None)
+        schema_editor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}', params=None)
+
+    def describe(self):
+        return f"{super().describe()} (concurrently on PostgreSQL)"
@@ -0,0 +1,137 @@
+"""
+Transactional email outbox.
+
+Views never talk to the mail server: ``enqueue_mail`` inserts an
+``OutboxMessage`` row, inside the caller's transaction when there is one, so
+a message is queued if and only if the data it describes is committed.
+``manage.py send_outbox`` sends due messages in batches over one SMTP
+connection per batch.
+
+A batch is claimed by pushing its ``next_attempt_at`` forward by
+``OUTBOX_LEASE_SECONDS`` (``SKIP LOCKED`` lets several workers claim
+disjoint batches), so no transaction stays open while the mail server
+answers. If a worker dies mid-batch the lease expires and the messages are
+sent again: delivery is at least once. A failed message is retried after
+``OUTBOX_RETRY_SECONDS`` doubled on every attempt, up to
+``OUTBOX_RETRY_MAX_SECONDS``. After ``OUTBOX_MAX_ATTEMPTS`` it is marked
+dead, for an admin to inspect and requeue.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+DEFAULT_BATCH_SIZE = 100
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _new_message(subject, body, from_email, recipient_list):
+    return OutboxMessage(
+        subject=subject[:255], body=body, from_email=from_email or '',
+        recipients=list(recipient_list), next_attempt_at=timezone.now(),
+    )
+
+
+def enqueue_mail(subject, body, from_email, recipient_list):
+    """Queue an email for ``send_outbox``; same arguments as ``send_mail``."""
+    message = _new_message(subject, body, from_email, recipient_list)
+    message.save()
+    return message
+
+
+async def aenqueue_mail(subject, body, from_email, recipient_list):
+    """Async ``enqueue_mail`` for async views."""
+    message = _new_message(subject, body, from_email, recipient_list)
+    await message.asave()
+    return message
+
+
+def retry_delay(attempts):
+    """Wait before the next attempt after ``attempts`` failures."""
+    base = _setting('OUTBOX_RETRY_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), _setting('OUTBOX_RETRY_MAX_SECONDS', 3600)))
+
+
+def claim_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """Lease up to ``batch_size`` due messages to this worker and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in batch]).update(
+            next_attempt_at=now + timedelta(seconds=_setting('OUTBOX_LEASE_SECONDS', 300)),
+        )
+    return batch
+
+
+def _failed(message, error, now):
+    message.attempts += 1
+    message.last_error = f'{type(error).__name__}: {error}'[:2000]
+    if message.attempts >= _setting('OUTBOX_MAX_ATTEMPTS', 8):
+        message.status = OutboxMessage.DEAD
+    else:
+        message.next_attempt_at = now + retry_delay(message.attempts)
+
+
+def send_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Send one batch of due messages over a single connection.
+
+    Returns ``(sent, failed)``; a failed message is rescheduled or dead-lettered.
+    """
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+    sent = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        # Mail server unreachable: every message in the batch counts a failed attempt
+        open_error = exc
+    else:
+        open_error = None
+    try:
+        for message in batch:
+            now = timezone.now()
+            if open_error is not None:
+                _failed(message, open_error, now)
+                continue
+            email = EmailMessage(
+                message.subject, message.body, message.from_email or None, message.recipients,
+                connection=connection,
+            )
+            try:
+                email.send()
+            except Exception as exc:
+                _failed(message, exc, now)
+            else:
+                message.status = OutboxMessage.SENT
+                message.sent_at = now
+                message.last_error = ''
+                sent.append(message)
+    finally:
+        if open_error is None:
+            connection.close()
+        OutboxMessage.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+        )
+    return len(sent), len(batch) - len(sent)
+
+
+def requeue(messages):
+    """Send dead (or any) ``messages`` again from scratch."""
+    return messages.update(
+        status=OutboxMessage.PENDING, attempts=0, next_attempt_at=timezone.now(), last_error='',
+    )
@@ -0,0 +1,63 @@
+"""
+Keyset (seek) pagination helpers.
+
+OFFSET pagination makes the database walk and discard every skipped row, so
+page N costs O(N). Keyset pagination remembers the sort key of the last row
+and asks for rows strictly after it, which an index on the same columns
+answers in constant time no matter how deep the client scrolls.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    """Encode the sort-key values of the last row as an opaque URL-safe token."""
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decode a token produced by ``encode_cursor``. Raises ``ValueError`` if invalid."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('Cursor inválido') from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Cursor inválido')
+    return values
+
+
+def keyset_filter(fields, values, descending=False):
+    """
+    Build the ``Q`` selecting rows after ``values`` in ``fields`` order.
+
+    For ``('category', 'name', 'id')`` this expands to
+    ``category > c OR (category = c AND name > n) OR (category = c AND name = n AND id > i)``.
+    """
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for position, field in enumerate(fields):
+        equal = {f: v for f, v in zip(fields[:position], values[:position])}
+        condition |= Q(**equal, **{f'{field}__{lookup}': values[position]})
+    return condition
+
+
+def keyset_page(queryset, fields, cursor=None, limit=20, descending=False):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``queryset`` ordered by ``fields``.
+
+    ``fields`` must end in a unique column (usually ``id``). Fetches one extra
+    row to know whether another page exists; ``next_cursor`` is None on the
+    last page. Raises ``ValueError`` for a malformed cursor.
+    """
+    queryset = queryset.order_by(*[f'-{field}' if descending else field for field in fields])
+    if cursor:
+        queryset = queryset.filter(keyset_filter(fields, decode_cursor(cursor, len(fields)), descending))
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], field) for field in fields])
@@ -0,0 +1,300 @@
+"""
+Per-request performance instrumentation.
+
+Enabled with ``PERF_INSTRUMENTATION``, which installs
+``core.middleware.PerformanceMiddleware`` and the ``InstrumentedDjangoTemplates``
+backend. For every request the middleware records total time, query count and
+time, and template render time (excluding queries issued while rendering), and:
+
+* adds a ``Server-Timing`` header, so the numbers show up in the browser's
+  network panel;
+* logs one JSON line to the ``inserf.perf`` logger, plus warnings for slow
+  requests and for SQL repeated within a request (the N+1 signature);
+* adds the request to rolling per-view histograms kept in the cache, read by
+  the dashboard's performance page.
+
+Histogram counters are accumulated in process and flushed to the cache every
+``PERF_FLUSH_SECONDS`` with ``incr``, so every worker adds to the same
+windows without a cache round trip per request. Times are measured until the
+view returns; the body of a streaming response is not included.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger('inserf.perf')
+
+PERF_COUNTER_KEY = 'perf:{window}:{view}:{counter}'
+PERF_VIEWS_KEY = 'perf:{window}:views'
+PERF_REPEATED_KEY = 'perf:repeated:{view}'
+
+# Upper bounds (ms) of the latency histogram buckets; slower requests go to 'inf'
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+BUCKET_COUNTERS = tuple(f'le_{bound}' for bound in BUCKETS_MS) + ('le_inf',)
+COUNTERS = ('requests', 'errors', 'slow', 'repeated', 'total_ms', 'db_ms', 'render_ms', 'queries') + BUCKET_COUNTERS
+
+_active_profile = ContextVar('perf_profile', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RequestProfile:
+    """Timings and SQL signatures collected while one request is handled."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_time = None
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.queries = 0
+        self.signatures = Counter()
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def repeated_queries(self, threshold):
+        """[(sql, times)] for statements run at least ``threshold`` times, most repeated first."""
+        return [(sql, count) for sql, count in self.signatures.most_common() if count >= threshold]
+
+    def server_timing(self):
+        app = max(0.0, self.total_time - self.db_time - self.render_time)
+        return ', '.join([
+            f'total;dur={self.total_time * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+        ])
+
+
+def activate(profile):
+    return _active_profile.set(profile)
+
+
+def deactivate(token):
+    _active_profile.reset(token)
+
+
+def install_query_hook(connection, **kwargs):
+    """
+    Add ``record_query`` to ``connection`` (also a ``connection_created`` receiver).
+
+    Connections are per thread, and async views run their queries in
+    sync_to_async threads, so the hook lives on every connection for good
+    and only records while a profile is active in the calling context.
+    """
+    if record_query not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks that pop() on exit keep working
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def record_query(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook timing every statement of the active profile."""
+    profile = _active_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - started
+        profile.queries += 1
+        # Placeholders keep the parameters out of the SQL, so equal text is the same statement
+        profile.signatures[sql] += 1
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        profile = _active_profile.get()
+        if profile is None:
+            return self.template.render(context, request)
+        started, db_before = time.perf_counter(), profile.db_time
+        try:
+            return self.template.render(context, request)
+        finally:
+            # Lazy querysets evaluated by the template count as database time
+            profile.render_time += time.perf_counter() - started - (profile.db_time - db_before)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend that adds the render time of top-level templates to the active profile."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+def window_start(now=None):
+    size = _setting('PERF_WINDOW_SECONDS', 300)
+    now = time.time() if now is None else now
+    return int(now // size * size)
+
+
+class _Accumulator:
+    """Process-local counters per (window, view), flushed to the cache periodically."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(Counter)
+        self.flushed_at = time.monotonic()
+
+    def add(self, view, counters):
+        with self.lock:
+            self.pending[(window_start(), view)].update(counters)
+            due = time.monotonic() - self.flushed_at >= _setting('PERF_FLUSH_SECONDS', 10)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(Counter)
+            self.flushed_at = time.monotonic()
+        if not pending:
+            return
+        timeout = _setting('PERF_WINDOW_SECONDS', 300) * (_setting('PERF_WINDOWS', 12) + 1)
+        views_by_window = defaultdict(set)
+        for (window, view), counters in pending.items():
+            views_by_window[window].add(view)
+            for counter, value in counters.items():
+                if not value:
+                    continue
+                key = PERF_COUNTER_KEY.format(window=window, view=view, counter=counter)
+                cache.add(key, 0, timeout)
+                try:
+                    cache.incr(key, value)
+                except ValueError:
+                    # Expired between add and incr
+                    cache.set(key, value, timeout)
+        for window, views in views_by_window.items():
+            key = PERF_VIEWS_KEY.format(window=window)
+            known = cache.get(key, set())
+            if not views <= known:
+                cache.set(key, known | views, timeout)
+
+
+_accumulator = _Accumulator()
+
+
+def flush():
+    """Write pending histogram counters to the cache now (the page calls this before reading)."""
+    _accumulator.flush()
+
+
+def report(view, request, response, profile):
+    """Log the request and add it to the histograms of ``view``."""
+    total_ms = profile.total_time * 1000
+    slow = total_ms >= _setting('PERF_SLOW_REQUEST_MS', 500)
+    repeated = profile.repeated_queries(_setting('PERF_REPEATED_QUERY_THRESHOLD', 5))
+
+    logger.info(json.dumps({
+        'view': view,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'total_ms': round(total_ms, 1),
+        'db_ms': round(profile.db_time * 1000, 1),
+        'queries': profile.queries,
+        'render_ms': round(profile.render_time * 1000, 1),
+        'slow': slow,
+        'repeated_queries': len(repeated),
+    }))
+    if slow:
+        logger.warning('Slow request: %s %s (%s) took %.0f ms with %d queries',
+                       request.method, request.path, view, total_ms, profile.queries)
+    for sql, count in repeated:
+        logger.warning('Repeated query in %s (%s): %d times: %s', request.path, view, count, sql[:500])
+    if repeated:
+        sql, count = repeated[0]
+        cache.set(PERF_REPEATED_KEY.format(view=view), {'sql': sql[:2000], 'count': count, 'path': request.path},
+                  _setting('PERF_WINDOW_SECONDS', 300) * _setting('PERF_WINDOWS', 12))
+
+    bucket = next((f'le_{bound}' for bound in BUCKETS_MS if total_ms <= bound), 'le_inf')
+    _accumulator.add(view, {
+        'requests': 1,
+        'errors': int(response.status_code >= 500),
+        'slow': int(slow),
+        'repeated': int(bool(repeated)),
+        'total_ms': round(total_ms),
+        'db_ms': round(profile.db_time * 1000),
+        'render_ms': round(profile.render_time * 1000),
+        'queries': profile.queries,
+        bucket: 1,
+    })
+
+
+def _estimate_percentile(buckets, requests, pct):
+    """Upper bound (ms) of the bucket holding the ``pct`` percentile; None past the last bound."""
+    target = pct / 100 * requests
+    seen = 0
+    for bound, counter in zip(BUCKETS_MS + (None,), BUCKET_COUNTERS):
+        seen += buckets.get(counter, 0)
+        if seen >= target:
+            return bound
+    return None
+
+
+def view_stats():
+    """
+    Per-view totals over the last ``PERF_WINDOWS`` windows, slowest p95 first:
+    averages, bucket-estimated percentiles, the histogram and the last
+    repeated-query sample.
+    """
+    size = _setting('PERF_WINDOW_SECONDS', 300)
+    current = window_start()
+    windows = [current - size * number for number in range(_setting('PERF_WINDOWS', 12))]
+    registries = cache.get_many([PERF_VIEWS_KEY.format(window=window) for window in windows])
+    views = sorted(set().union(*registries.values())) if registries else []
+
+    keys = [
+        PERF_COUNTER_KEY.format(window=window, view=view, counter=counter)
+        for window in windows for view in views for counter in COUNTERS
+    ]
+    values = cache.get_many(keys) if keys else {}
+    repeated = cache.get_many([PERF_REPEATED_KEY.format(view=view) for view in views]) if views else {}
+
+    stats = []
+    for view in views:
+        totals = Counter()
+        for window in windows:
+            for counter in COUNTERS:
+                totals[counter] += values.get(PERF_COUNTER_KEY.format(window=window, view=view, counter=counter), 0)
+        requests = totals['requests']
+        if not requests:
+            continue
+        stats.append({
+            'view': view,
+            'requests': requests,
+            'errors': totals['errors'],
+            'slow': totals['slow'],
+            'repeated': totals['repeated'],
+            'avg_ms': totals['total_ms'] / requests,
+            'avg_db_ms': totals['db_ms'] / requests,
+            'avg_render_ms': totals['render_ms'] / requests,
+            'avg_queries': totals['queries'] / requests,
+            'p50_ms': _estimate_percentile(totals, requests, 50),
+            'p95_ms': _estimate_percentile(totals, requests, 95),
+            'p99_ms': _estimate_percentile(totals, requests, 99),
+            'histogram': [
+                {'bound': bound, 'count': totals[counter], 'share': totals[counter] / requests * 100}
+                for bound, counter in zip(BUCKETS_MS + (None,), BUCKET_COUNTERS)
+            ],
+            'repeated_sample': repeated.get(PERF_REPEATED_KEY.format(view=view)),
+        })
+    stats.sort(key=lambda row: (row['p95_ms'] is None, row['p95_ms'] or 0), reverse=True)
+    return stats
@@ -0,0 +1,141 @@
+"""
+Central pricing rules.
+
+Variant prices are stored VAT-inclusive. The net unit price is the gross
+price divided by ``1 + VAT_RATE``, rounded half-up to cents; the unit VAT is
+the remainder, and line amounts are unit amounts times quantity. The same
+policy is available as Python helpers (for single values) and as ORM
+expressions, so cart and order totals are computed by the database in one
+query instead of looping over lines in Python.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+CENT = Decimal('0.01')
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def vat_rate():
+    return Decimal(str(getattr(settings, 'VAT_RATE', '0.19')))
+
+
+def vat_divisor():
+    return 1 + vat_rate()
+
+
+# Python helpers
+
+def net_price(gross):
+    """Net (VAT-exclusive) amount of a VAT-inclusive unit price."""
+    return (Decimal(gross) / vat_divisor()).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def gross_price(net):
+    return (Decimal(net) * vat_divisor()).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def split_vat(gross):
+    """Return (net, vat) for a VAT-inclusive unit price."""
+    net = net_price(gross)
+    return net, Decimal(gross) - net
+
+
+def line_amounts(unit_price, quantity):
+    """All OrderItem price fields for one line."""
+    net_unit_price, vat_amount = split_vat(unit_price)
+    return {
+        'unit_price': unit_price,
+        'net_unit_price': net_unit_price,
+        'vat_amount': vat_amount,
+        'subtotal': unit_price * quantity,
+        'net_subtotal': net_unit_price * quantity,
+        'vat_subtotal': vat_amount * quantity,
+    }
+
+
+# ORM expressions
+
+def _money(expression):
+    return ExpressionWrapper(expression, output_field=MONEY)
+
+
+def net_price_expression(price='unit_price'):
+    return Round(_money(F(price) / Value(vat_divisor(), output_field=MONEY)), 2, output_field=MONEY)
+
+
+def line_expressions(price='unit_price', quantity='quantity'):
+    """Expressions for every line amount, keyed by OrderItem field name."""
+    net = net_price_expression(price)
+    vat = _money(F(price) - net)
+    return {
+        'unit_price': _money(F(price)),
+        'net_unit_price': net,
+        'vat_amount': vat,
+        'subtotal': _money(F(price) * F(quantity)),
+        'net_subtotal': _money(net * F(quantity)),
+        'vat_subtotal': _money(vat * F(quantity)),
+    }
+
+
+def annotate_cart_lines(cart_items):
+    """
+    Annotate CartItem rows with ``line_*`` price amounts computed in SQL.
+
+    Templates use ``item.line_subtotal`` and friends instead of the
+    per-row Python properties.
+    """
+    expressions = line_expressions(price='variant__unit_price')
+    return cart_items.annotate(**{f'line_{name}': expression for name, expression in expressions.items()})
+
+
+def cart_totals(cart_items):
+    """Return {'total', 'net_total', 'vat_total'} for a CartItem queryset in one query."""
+    expressions = line_expressions(price='variant__unit_price')
+    totals = cart_items.aggregate(
+        total=Sum(expressions['subtotal']),
+        net_total=Sum(expressions['net_subtotal']),
+        vat_total=Sum(expressions['vat_subtotal']),
+    )
+    return {key: (value or Decimal('0')).quantize(CENT) for key, value in totals.items()}
+
+
+def order_total_expressions():
+    """Subquery expressions summing OrderItem amounts, keyed by PurchaseOrder field."""
+    from .models import OrderItem
+
+    def item_sum(field):
+        sums = (
+            OrderItem.objects.filter(order=OuterRef('pk'))
+            .order_by().values('order').annotate(total=Sum(field)).values('total')
+        )
+        return Coalesce(Subquery(sums, output_field=MONEY), Value(Decimal('0'), output_field=MONEY))
+
+    return {
+        'total_amount': item_sum('subtotal'),
+        'net_total': item_sum('net_subtotal'),
+        'vat_total': item_sum('vat_subtotal'),
+    }
+
+
+def update_order_totals(orders):
+    """Set the totals of every order in ``orders`` from its items in one UPDATE."""
+    return orders.update(**order_total_expressions(), updated_at=timezone.now())
+
+
+def recalculate_order(order):
+    """
+    Recompute every line of ``order`` and its totals in the database.
+
+    One UPDATE fills the VAT fields of all items from their unit price, and
+    one UPDATE sets the order totals from the item sums.
+    """
+    from .models import OrderItem, PurchaseOrder
+
+    expressions = line_expressions()
+    del expressions['unit_price']
+    OrderItem.objects.filter(order=order).update(**expressions)
+    update_order_totals(PurchaseOrder.objects.filter(pk=order.pk))
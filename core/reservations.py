@@ -0,0 +1,179 @@
+"""
+Time-limited stock reservations for carts.
+
+Adding a variant to a cart holds the units for ``CART_RESERVATION_MINUTES``.
+Available stock is ``stock`` minus the active holds of *other* clients, read
+from one grouped aggregate over the (variant, expires_at) index, which also
+covers the quantity and the cart's client (copied onto the hold), so no view
+scans or joins carts or runs a query per variant. Expired holds are simply
+ignored by the aggregate and deleted in batches by
+``manage.py release_expired_reservations``.
+
+``holds_version()`` changes on every commit that creates, changes or
+releases reservations, and ``holds_state()`` adds the earliest live expiry,
+so pages showing available stock can build their ETag without running the
+aggregate and the ETag still changes when a hold lapses before the sweep.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ProductVariant, StockReservation
+
+DEFAULT_SWEEP_BATCH_SIZE = 1000
+HOLDS_VERSION_KEY = 'reservations:version'
+HOLDS_EXPIRY_KEY = 'reservations:next_expiry'
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'CART_RESERVATION_MINUTES', 30))
+
+
+def holds_version():
+    """Changes whenever reservations change (see ``holds_changed``)."""
+    return cache.get_or_set(HOLDS_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def holds_state():
+    """
+    ``(holds_version(), earliest expires_at of the live holds)``.
+
+    The expiry is cached with the version it was read under and read again
+    (one seek on the expires_at index) once the version changes or the hold
+    has lapsed.
+    """
+    version = holds_version()
+    now = timezone.now()
+    cached = cache.get(HOLDS_EXPIRY_KEY)
+    if cached and cached[0] == version and (cached[1] is None or cached[1] > now):
+        return cached
+    next_expiry = (
+        StockReservation.objects.filter(expires_at__gt=now)
+        .order_by('expires_at').values_list('expires_at', flat=True).first()
+    )
+    cache.set(HOLDS_EXPIRY_KEY, (version, next_expiry), timeout=None)
+    return version, next_expiry
+
+
+def _touch_holds():
+    cache.set(HOLDS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def holds_changed():
+    """Call after writing reservations (deleting cart lines included); takes effect on commit."""
+    transaction.on_commit(_touch_holds)
+
+
+async def aholds_changed():
+    """``holds_changed`` for async views, whose ORM writes are already committed."""
+    await cache.aset(HOLDS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def active_reservations(variant_ids=None, exclude_client=None):
+    reservations = StockReservation.objects.filter(expires_at__gt=timezone.now())
+    if variant_ids is not None:
+        reservations = reservations.filter(variant_id__in=variant_ids)
+    if exclude_client is not None:
+        reservations = reservations.exclude(client=exclude_client)
+    return reservations
+
+
+def held_quantities(variant_ids=None, exclude_client=None):
+    """
+    Return {variant_id: units held by active reservations} in one query.
+
+    Pass ``exclude_client`` to leave out that client's own holds, which is what
+    the client can still buy.
+    """
+    rows = (
+        active_reservations(variant_ids, exclude_client)
+        .values('variant_id')
+        .annotate(held=Sum('quantity'))
+        .order_by()
+    )
+    return {row['variant_id']: row['held'] for row in rows}
+
+
+async def aheld_quantities(variant_ids=None, exclude_client=None):
+    """Async ``held_quantities`` for async views."""
+    rows = (
+        active_reservations(variant_ids, exclude_client)
+        .values('variant_id')
+        .annotate(held=Sum('quantity'))
+        .order_by()
+    )
+    return {row['variant_id']: row['held'] async for row in rows}
+
+
+def lock_available_stock(variant_id, client=None):
+    """
+    Lock the variant row and return the units ``client`` may still hold.
+
+    Must run inside a transaction; the lock serializes concurrent carts
+    reserving the same variant until the caller commits.
+    """
+    variant = ProductVariant.objects.select_for_update().get(pk=variant_id)
+    held = held_quantities([variant_id], exclude_client=client).get(variant_id, 0)
+    return max(0, variant.stock - held)
+
+
+def hold(cart_item, client):
+    """Create or refresh the reservation for ``cart_item.quantity`` units; ``client`` owns the cart."""
+    StockReservation.objects.update_or_create(
+        cart_item=cart_item,
+        defaults={
+            'client': client,
+            'variant_id': cart_item.variant_id,
+            'quantity': cart_item.quantity,
+            'expires_at': timezone.now() + reservation_ttl(),
+        },
+    )
+    holds_changed()
+
+
+def hold_many(cart_items, client):
+    """Create or refresh reservations for several of ``client``'s cart lines with one upsert."""
+    expires_at = timezone.now() + reservation_ttl()
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(cart_item=item, client=client, variant_id=item.variant_id, quantity=item.quantity,
+                             expires_at=expires_at)
+            for item in cart_items
+        ],
+        update_conflicts=True,
+        unique_fields=['cart_item'],
+        update_fields=['variant', 'quantity', 'expires_at'],
+    )
+    holds_changed()
+
+
+def apply_to_catalog(categories, held):
+    """Show available rather than physical stock in a catalog structure of dicts."""
+    if not held:
+        return categories
+    for products in categories.values():
+        for product in products:
+            for variant in product['variants']:
+                if variant['id'] in held:
+                    variant['stock'] = max(0, variant['stock'] - held[variant['id']])
+    return categories
+
+
+def release_expired(batch_size=DEFAULT_SWEEP_BATCH_SIZE):
+    """Delete expired reservations in batches; return how many were removed."""
+    removed = 0
+    while True:
+        ids = list(
+            StockReservation.objects
+            .filter(expires_at__lte=timezone.now())
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        removed += StockReservation.objects.filter(id__in=ids).delete()[0]
+        holds_changed()
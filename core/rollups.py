@@ -0,0 +1,204 @@
+"""
+Incrementally maintained dashboard KPIs.
+
+``KpiRollup`` keeps one row per (metric, key): orders per status, stock per
+category and the client count. Signal handlers (core.signals) and the code
+paths that write through ``update()``/``bulk_*`` report deltas to
+``apply_deltas``, so the dashboard reads a handful of rows instead of
+scanning orders and variants. ``manage.py reconcile_rollups`` rebuilds them
+from the source tables (run it after loaddata or raw SQL).
+
+Inside a transaction the deltas are only collected, and written in one short
+transaction when it commits. Every checkout moves the same
+``orders_by_status/pendiente`` row; updating it in the checkout's own
+transaction would keep the row locked, and concurrent checkouts queued on
+it, until that checkout commits. Deltas are collected per savepoint, in a
+batch whose ``flush`` is registered with ``on_commit``: Django holds the only
+strong reference to it, so rolling the savepoint back drops the batch with
+its callback. The first callback to run at the commit writes every batch
+still alive. A crash between the commit and the write loses the deltas;
+reconcile_rollups repairs that.
+"""
+import threading
+import weakref
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Client, KpiRollup, Product, ProductVariant, PurchaseOrder
+
+ORDERS_BY_STATUS = 'orders_by_status'
+STOCK_BY_CATEGORY = 'stock_by_category'
+CLIENTS = 'clients'
+METRICS = (ORDERS_BY_STATUS, STOCK_BY_CATEGORY, CLIENTS)
+
+# {using: {savepoint ids: _Batch}} for this thread's transactions, held weakly
+_local = threading.local()
+
+
+def _batches(using):
+    if not hasattr(_local, using):
+        setattr(_local, using, weakref.WeakValueDictionary())
+    return getattr(_local, using)
+
+
+class _Batch:
+    """What one savepoint of a transaction changed: rollup deltas, written on
+    commit, and the orders whose ``updated_at`` it already bumped."""
+
+    def __init__(self, using):
+        self.using = using
+        self.deltas = defaultdict(int)
+        self.touched = set()
+        self.written = False
+
+    def flush(self):
+        deltas = defaultdict(int)
+        for batch in _live_batches(self.using):
+            batch.written = True
+            for key, delta in batch.deltas.items():
+                deltas[key] += delta
+        if deltas:
+            _write_deltas(deltas, self.using)
+
+
+def _live_batches(using):
+    """The batches not rolled back and waiting for their commit."""
+    return [batch for batch in list(_batches(using).values()) if not batch.written]
+
+
+def _current_batch(using):
+    """The batch of the current savepoint, registering its flush on first use."""
+    connection = transaction.get_connection(using)
+    scope = tuple(connection.savepoint_ids)
+    batch = _batches(using).get(scope)
+    if batch is None or batch.written:
+        batch = _batches(using)[scope] = _Batch(using)
+        transaction.on_commit(batch.flush, using=using)
+    return batch
+
+
+def _pending(metric, using):
+    """{key: delta} of ``metric`` collected in this transaction and not written yet."""
+    pending = defaultdict(int)
+    if not transaction.get_connection(using).in_atomic_block:
+        return pending
+    for batch in _live_batches(using):
+        for (batch_metric, key), delta in batch.deltas.items():
+            if batch_metric == metric:
+                pending[key] += delta
+    return pending
+
+
+def _write_deltas(deltas, using):
+    """Add {(metric, key): delta} to the rollup rows, creating missing rows."""
+    rows = KpiRollup.objects.using(using)
+    with transaction.atomic(using=using):
+        # Sorted, so concurrent writers lock the rows in the same order
+        for (metric, key), delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            updated = rows.filter(metric=metric, key=key).update(value=F('value') + delta, updated_at=timezone.now())
+            if not updated:
+                # get_or_create survives a concurrent insert of the same row
+                rows.get_or_create(metric=metric, key=key)
+                rows.filter(metric=metric, key=key).update(value=F('value') + delta, updated_at=timezone.now())
+
+
+def apply_deltas(metric, deltas, using='default'):
+    """Add {key: delta} to the rows of ``metric``, when the current transaction commits."""
+    if not transaction.get_connection(using).in_atomic_block:
+        _write_deltas({(metric, key): delta for key, delta in deltas.items()}, using)
+        return
+    batch = _current_batch(using)
+    for key, delta in deltas.items():
+        batch.deltas[metric, key] += delta
+
+
+def touch_orders(order_ids, using='default'):
+    """Bump ``updated_at`` (the order pages' ETag) of ``order_ids``, once per order and transaction."""
+    order_ids = set(order_ids)
+    if transaction.get_connection(using).in_atomic_block:
+        for batch in _live_batches(using):
+            order_ids -= batch.touched
+        _current_batch(using).touched.update(order_ids)
+    if order_ids:
+        PurchaseOrder.objects.using(using).filter(pk__in=order_ids).update(updated_at=timezone.now())
+
+
+def _aggregate(metric, order_model, variant_model, client_model, using):
+    if metric == ORDERS_BY_STATUS:
+        rows = order_model.objects.using(using).values('status').annotate(value=Count('id')).order_by()
+        return {row['status']: row['value'] for row in rows}
+    if metric == STOCK_BY_CATEGORY:
+        rows = (
+            variant_model.objects.using(using)
+            .values('product__category').annotate(value=Sum('stock')).order_by()
+        )
+        return {row['product__category']: row['value'] or 0 for row in rows}
+    return {'': client_model.objects.using(using).count()}
+
+
+def rebuild_rollups(metrics=METRICS, rollup_model=KpiRollup, order_model=PurchaseOrder,
+                    variant_model=ProductVariant, client_model=Client, using='default'):
+    """Recompute ``metrics`` from scratch with one GROUP BY each; return {metric: rows written}."""
+    written = {}
+    with transaction.atomic(using=using):
+        for metric in metrics:
+            values = _aggregate(metric, order_model, variant_model, client_model, using)
+            # This transaction's collected deltas are already in the source
+            # tables and will still be added on commit
+            for key, delta in _pending(metric, using).items():
+                values[key] = values.get(key, 0) - delta
+            rollup_model.objects.using(using).filter(metric=metric).delete()
+            rollup_model.objects.using(using).bulk_create([
+                rollup_model(metric=metric, key=key, value=value) for key, value in values.items()
+            ])
+            written[metric] = len(values)
+    return written
+
+
+def rebuild_category_stock(categories, using='default'):
+    """Recompute the stock rows of ``categories`` only."""
+    categories = set(categories)
+    totals = dict.fromkeys(categories, 0)
+    rows = (
+        ProductVariant.objects.using(using).filter(product__category__in=categories)
+        .values('product__category').annotate(value=Sum('stock')).order_by()
+    )
+    totals.update({row['product__category']: row['value'] or 0 for row in rows})
+    for category, delta in _pending(STOCK_BY_CATEGORY, using).items():
+        if category in totals:
+            totals[category] -= delta
+    with transaction.atomic(using=using):
+        for category, value in totals.items():
+            KpiRollup.objects.using(using).update_or_create(
+                metric=STOCK_BY_CATEGORY, key=category, defaults={'value': value},
+            )
+
+
+def category_of(product_id, using='default'):
+    return Product.objects.using(using).filter(pk=product_id).values_list('category', flat=True).first()
+
+
+def dashboard_summary():
+    """Read every KPI row in one query and shape it for the dashboard."""
+    rows = {metric: [] for metric in METRICS}
+    for rollup in KpiRollup.objects.order_by('metric', 'key'):
+        rows.setdefault(rollup.metric, []).append(rollup)
+
+    orders_by_status = [
+        {'status': row.key, 'count': row.value} for row in rows[ORDERS_BY_STATUS] if row.value
+    ]
+    stock_by_category = [
+        {'category': row.key, 'total_stock': row.value} for row in rows[STOCK_BY_CATEGORY] if row.value
+    ]
+    return {
+        'total_orders': sum(row['count'] for row in orders_by_status),
+        'total_products': sum(row['total_stock'] for row in stock_by_category),
+        'total_clients': sum(row.value for row in rows[CLIENTS]),
+        'orders_by_status': orders_by_status,
+        'stock_by_category': stock_by_category,
+    }
@@ -0,0 +1,96 @@
+"""
+Product search.
+
+Each product stores a denormalized ``search_document`` (its own text plus the
+colors and sizes of its variants) and a weighted ``search_vector``. On
+PostgreSQL queries hit the GIN full-text index and the trigram index on the
+document (for typos); SQLite (``inserf.test_settings``, which runs the test
+suite without PostgreSQL) falls back to plain substring matching over the
+same document.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .models import Product, ProductVariant
+
+SEARCH_CONFIG = 'simple'
+SEARCH_BATCH_SIZE = 1000
+SEARCH_RESULTS_LIMIT = 50
+
+
+def build_search_document(product, variants):
+    parts = [product['name'], product['brand'], product['category'], product['description']]
+    for variant in variants:
+        parts.extend([variant['color'], variant['size']])
+    # Drop blanks and repeated variant attributes, keep first-seen order
+    return ' '.join(dict.fromkeys(part.strip() for part in parts if part and part.strip()))
+
+
+def refresh_search_index(product_ids=None, product_model=Product, variant_model=ProductVariant, using='default'):
+    """
+    Recompute the search columns for ``product_ids`` (every product when None).
+
+    Uses bulk writes only, so it is safe to call from signal handlers and from
+    bulk imports that bypass ``save()``.
+    """
+    products = product_model.objects.using(using).order_by('id')
+    variants = variant_model.objects.using(using).order_by('id')
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        products = products.filter(id__in=product_ids)
+        variants = variants.filter(product_id__in=product_ids)
+
+    variants_by_product = {}
+    for variant in variants.values('product_id', 'color', 'size').iterator(chunk_size=SEARCH_BATCH_SIZE):
+        variants_by_product.setdefault(variant['product_id'], []).append(variant)
+
+    batch = []
+    for product in products.values('id', 'name', 'brand', 'category', 'description').iterator(chunk_size=SEARCH_BATCH_SIZE):
+        document = build_search_document(product, variants_by_product.get(product['id'], []))
+        batch.append(product_model(id=product['id'], search_document=document))
+        if len(batch) >= SEARCH_BATCH_SIZE:
+            product_model.objects.using(using).bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        product_model.objects.using(using).bulk_update(batch, ['search_document'])
+
+    if connections[using].vendor == 'postgresql':
+        products.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('brand', 'category', weight='B', config=SEARCH_CONFIG)
+            + SearchVector('search_document', weight='C', config=SEARCH_CONFIG)
+        ))
+
+
+def matching_products(query):
+    """
+    Every active product matching ``query``, best match first.
+
+    Unsliced, so it can filter the catalog; slice it for suggestions.
+    """
+    query = (query or '').strip()
+    products = Product.objects.filter(is_active=True)
+    if not query:
+        return products.none()
+
+    if connections[products.db].vendor == 'postgresql':
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        products = (
+            products
+            .filter(Q(search_vector=search_query) | Q(search_document__trigram_word_similar=query))
+            .annotate(
+                rank=SearchRank(F('search_vector'), search_query),
+                similarity=TrigramWordSimilarity(query, 'search_document'),
+            )
+            .order_by('-rank', '-similarity', 'name', 'id')
+        )
+    else:
+        for term in query.split():
+            products = products.filter(search_document__icontains=term)
+        products = products.annotate(
+            rank=Case(When(name__icontains=query, then=Value(1)), default=Value(0), output_field=IntegerField()),
+        ).order_by('-rank', 'name', 'id')
+    return products
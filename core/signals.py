@@ -0,0 +1,175 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import rollups
+from .catalog import invalidate_catalog_snapshot
+from .identity import invalidate_identity
+from .models import Cart, Client, OrderItem, Product, ProductVariant, PurchaseOrder
+from .search import refresh_search_index
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def catalog_changed(sender, **kwargs):
+    # Wait for the commit so a concurrent rebuild can't cache uncommitted rows
+    transaction.on_commit(invalidate_catalog_snapshot)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(sender, instance, raw=False, using='default', **kwargs):
+    # Order pages list their items, so editing one (e.g. in the admin) changes
+    # the order's ETag; a cascade over many items bumps each order once
+    if not raw:
+        rollups.touch_orders([instance.order_id], using=using)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def client_identity_changed(sender, instance, **kwargs):
+    # The client's fields and cart id are cached per user (core/identity.py)
+    transaction.on_commit(lambda: invalidate_identity(instance.user_id))
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def cart_identity_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    client = instance._state.fields_cache.get('client')
+    if client is not None and client.pk == instance.client_id:
+        user_id = client.user_id
+    else:
+        user_id = Client.objects.filter(pk=instance.client_id).values_list('user_id', flat=True).first()
+    transaction.on_commit(lambda: invalidate_identity(user_id))
+
+
+@receiver(post_save, sender=Product)
+def product_search_changed(sender, instance, raw=False, **kwargs):
+    # Fixtures load in raw mode; run rebuild_search_index afterwards
+    if not raw:
+        refresh_search_index([instance.pk])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def variant_search_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_search_index([instance.product_id])
+
+
+# KPI rollups. pre_save reads the stored values of a row being updated, so
+# post_save can apply a delta. Fixtures load in raw mode; run
+# reconcile_rollups afterwards.
+
+ROLLUP_TRACKED_FIELDS = {
+    PurchaseOrder: ('status',),
+    Product: ('category',),
+    ProductVariant: ('stock', 'product_id'),
+}
+
+
+@receiver(pre_save, sender=PurchaseOrder)
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductVariant)
+def rollup_stored(sender, instance, raw=False, using='default', **kwargs):
+    instance._rollup_stored = None
+    if not raw and instance.pk is not None:
+        fields = ROLLUP_TRACKED_FIELDS[sender]
+        instance._rollup_stored = sender._base_manager.using(using).filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def order_rollup_saved(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    stored = None if created else instance._rollup_stored
+    old_status = stored and stored['status']
+    if old_status != instance.status:
+        deltas = {instance.status: 1}
+        if old_status is not None:
+            deltas[old_status] = -1
+        rollups.apply_deltas(rollups.ORDERS_BY_STATUS, deltas, using=using)
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+def order_rollup_deleted(sender, instance, using='default', **kwargs):
+    rollups.apply_deltas(rollups.ORDERS_BY_STATUS, {instance.status: -1}, using=using)
+
+
+@receiver(post_save, sender=Product)
+def product_rollup_saved(sender, instance, created, raw=False, using='default', **kwargs):
+    stored = None if raw or created else instance._rollup_stored
+    if stored and stored['category'] != instance.category:
+        # The product's stock moves to its new category
+        rollups.rebuild_category_stock({stored['category'], instance.category}, using=using)
+
+
+# {(using, product id): category} of the products being deleted, so their
+# cascaded variants need no query each
+_deleting = threading.local()
+
+
+def _deleting_categories():
+    if not hasattr(_deleting, 'categories'):
+        _deleting.categories = {}
+    return _deleting.categories
+
+
+@receiver(pre_delete, sender=Product)
+def product_rollup_deleting(sender, instance, using='default', **kwargs):
+    # The collector deletes the variants before the product itself
+    _deleting_categories()[using, instance.pk] = instance.category
+
+
+@receiver(post_delete, sender=Product)
+def product_rollup_deleted(sender, instance, using='default', **kwargs):
+    _deleting_categories().pop((using, instance.pk), None)
+
+
+def _variant_category(instance, using):
+    product = instance._state.fields_cache.get('product')
+    if product is not None and product.pk == instance.product_id:
+        return product.category
+    if (using, instance.product_id) in _deleting_categories():
+        return _deleting_categories()[using, instance.product_id]
+    return rollups.category_of(instance.product_id, using=using)
+
+
+@receiver(post_save, sender=ProductVariant)
+def variant_rollup_saved(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    stored = instance._rollup_stored if not created else None
+    old_stock, old_product_id = (stored['stock'], stored['product_id']) if stored else (0, instance.product_id)
+    category = _variant_category(instance, using)
+    if old_product_id != instance.product_id:
+        deltas = {category: instance.stock}
+        old_category = rollups.category_of(old_product_id, using=using)
+        deltas[old_category] = deltas.get(old_category, 0) - old_stock
+        rollups.apply_deltas(rollups.STOCK_BY_CATEGORY, deltas, using=using)
+    elif instance.stock != old_stock:
+        rollups.apply_deltas(rollups.STOCK_BY_CATEGORY, {category: instance.stock - old_stock}, using=using)
+
+
+@receiver(post_delete, sender=ProductVariant)
+def variant_rollup_deleted(sender, instance, using='default', **kwargs):
+    category = _variant_category(instance, using)
+    if category is not None:
+        rollups.apply_deltas(rollups.STOCK_BY_CATEGORY, {category: -instance.stock}, using=using)
+
+
+@receiver(post_save, sender=Client)
+def client_rollup_saved(sender, instance, created, raw=False, using='default', **kwargs):
+    if created and not raw:
+        rollups.apply_deltas(rollups.CLIENTS, {'': 1}, using=using)
+
+
+@receiver(post_delete, sender=Client)
+def client_rollup_deleted(sender, instance, using='default', **kwargs):
+    rollups.apply_deltas(rollups.CLIENTS, {'': -1}, using=using)
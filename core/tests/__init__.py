@@ -0,0 +1 @@
+"""Tests for the core app, one module per feature."""
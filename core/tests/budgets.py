@@ -0,0 +1,190 @@
+"""
+Query-count budgets: the dataset and base class shared by the landing
+(core.tests.test_landing_budgets) and dashboard (dashboard.tests) budgets.
+
+Every view is requested against a small and a large synthetic dataset. The
+number of queries must be identical at both scales (no N+1) and within the
+view's budget; a failure prints the SQL the view ran.
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, NamedTuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+
+from ..models import Cart, CartItem, Client, OrderItem, Product, ProductVariant, PurchaseOrder, StockReservation, User
+from ..rollups import rebuild_rollups
+from ..search import refresh_search_index
+
+
+SMALL_SCALE = 10
+LARGE_SCALE = 1000
+CATEGORIES = ('Vinilos', 'Jigs', 'Anzuelos', 'Señuelos', 'Líneas')
+VARIANTS_PER_PRODUCT = 3
+MAX_CART_LINES = 60
+
+
+def url_names(urlconf, namespace=None):
+    """Every named URL in ``urlconf``, prefixed with ``namespace:`` when given."""
+    names = set()
+    for pattern in get_resolver(urlconf).url_patterns:
+        if isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f'{namespace}:{pattern.name}' if namespace else pattern.name)
+        elif isinstance(pattern, URLResolver):
+            names |= url_names(pattern.urlconf_name, pattern.namespace)
+    return names
+
+
+def build_dataset(scale, client):
+    """
+    Create ``scale`` products (with variants), other clients with orders, and a
+    cart plus order history for ``client`` that all grow with ``scale``.
+    """
+    products = Product.objects.bulk_create([
+        Product(
+            name=f'Vinilo {number:05d}', brand='Inserf', category=CATEGORIES[number % len(CATEGORIES)],
+            description='Señuelo de prueba',
+        )
+        for number in range(scale)
+    ])
+    variants = ProductVariant.objects.bulk_create([
+        ProductVariant(
+            product=product, sku=f'SKU-{product.id}-{number}', color=f'Color {number}', size='3"',
+            stock=500, unit_price=Decimal('1190.00'), bulk_price=Decimal('1000.00'),
+        )
+        for product in products for number in range(VARIANTS_PER_PRODUCT)
+    ])
+
+    others = Client.objects.bulk_create([
+        Client(company_name=f'Empresa {number:05d}', tax_id=f'{number}-K', address='Calle 1',
+               phone='+56 9 0000 0000', email=f'empresa{number}@example.com')
+        for number in range(scale)
+    ])
+
+    # Two orders per other client, and scale // 2 orders for the logged-in client
+    owners = [other for other in others for _ in range(2)] + [client] * max(1, scale // 2)
+    orders = PurchaseOrder.objects.bulk_create([
+        PurchaseOrder(client=owner, status='pendiente' if number % 2 else 'completado',
+                      total_amount=Decimal('3570.00'), net_total=Decimal('3000.00'), vat_total=Decimal('570.00'))
+        for number, owner in enumerate(owners)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, variant=variants[(order.id + number) % len(variants)], quantity=1,
+                  unit_price=Decimal('1190.00'), net_unit_price=Decimal('1000.00'), vat_amount=Decimal('190.00'),
+                  subtotal=Decimal('1190.00'), net_subtotal=Decimal('1000.00'), vat_subtotal=Decimal('190.00'))
+        for order in orders for number in range(3)
+    ])
+
+    # Cart lines (with reservations) for the logged-in client and one other
+    expires_at = timezone.now() + timedelta(minutes=30)
+    cart = Cart.objects.create(client=client)
+    other_cart = Cart.objects.create(client=others[0])
+    # Enough lines to touch every category at any scale, growing with the catalog
+    # but staying within one SQLite bulk insert batch at checkout (inserf.test_settings)
+    lines = min(max(len(CATEGORIES) * VARIANTS_PER_PRODUCT, scale // 10), MAX_CART_LINES)
+    items = CartItem.objects.bulk_create(
+        [CartItem(cart=cart, variant=variant, quantity=1, variant_details=variant.color)
+         for variant in variants[:lines]]
+        + [CartItem(cart=other_cart, variant=variant, quantity=1) for variant in variants[:lines]]
+    )
+    StockReservation.objects.bulk_create([
+        StockReservation(cart_item=item, client_id=item.cart.client_id, variant=item.variant, quantity=item.quantity,
+                         expires_at=expires_at)
+        for item in items
+    ])
+
+    refresh_search_index()
+    rebuild_rollups()
+    return {
+        'cart': cart,
+        'cart_items': items[:lines],
+        'variants': variants,
+        'order': next(order for order in orders if order.client_id == client.id),
+        'other_client': others[0],
+    }
+
+
+class Budget(NamedTuple):
+    """
+    How to request one view and how many queries it may run. ``build`` takes
+    the dataset from ``build_dataset`` and returns ``(url, body)``; a body
+    with ``_form`` is posted as a form, any other body as JSON.
+    """
+    role: str
+    method: str
+    build: Callable
+    queries: int
+    status: int = 200
+
+
+class QueryBudgetTestCase(TestCase):
+    """Base class: subclasses map URL names to a ``Budget`` in ``budgets``."""
+
+    budgets = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_user('budget-admin', password='x', role='admin')
+        cls.client_user = User.objects.create_user('budget-client', password='x', role='client')
+        cls.client_record = Client.objects.create(
+            user=cls.client_user, company_name='Pesca Budget', tax_id='1-9', address='Calle 2',
+            phone='+56 9 1111 1111', email='budget@example.com',
+        )
+
+    def measure(self, scale):
+        """Run every budgeted request on a fresh dataset of ``scale``; return {name: (response, queries)}."""
+        results = {}
+        users = {'admin': self.admin_user, 'client': self.client_user, 'anonymous': None}
+        with transaction.atomic():
+            data = build_dataset(scale, self.client_record)
+            for name, budget in self.budgets.items():
+                url, body = budget.build(data)
+                with transaction.atomic():
+                    browser = self.client_class()
+                    if users[budget.role]:
+                        browser.force_login(users[budget.role])
+                    # Cold caches: budgets cover the worst case
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self._request(browser, budget.method, url, body)
+                    transaction.set_rollback(True)
+                results[name] = (response, [query['sql'] for query in queries.captured_queries])
+            transaction.set_rollback(True)
+        return results
+
+    def _request(self, browser, method, url, body):
+        if method == 'get':
+            response = browser.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+        if body is None:
+            return browser.post(url)
+        if isinstance(body, dict) and body.get('_form'):
+            return browser.post(url, {key: value for key, value in body.items() if key != '_form'})
+        return browser.post(url, json.dumps(body), content_type='application/json')
+
+    def assert_budgets(self):
+        small = self.measure(SMALL_SCALE)
+        large = self.measure(LARGE_SCALE)
+        for name, budget in self.budgets.items():
+            with self.subTest(view=name):
+                small_response, small_queries = small[name]
+                large_response, large_queries = large[name]
+                self.assertEqual(
+                    large_response.status_code, budget.status,
+                    f"{name} answered HTTP {large_response.status_code} {large_response.get('Location', '')}",
+                )
+                self.assertEqual(small_response.status_code, large_response.status_code)
+                if len(large_queries) != len(small_queries) or len(large_queries) > budget.queries:
+                    self.fail(
+                        f'{name}: {len(small_queries)} queries at {SMALL_SCALE} products, '
+                        f'{len(large_queries)} at {LARGE_SCALE} (budget {budget.queries}). Queries at {LARGE_SCALE}:\n'
+                        + '\n'.join(f'{number}. {sql}' for number, sql in enumerate(large_queries, 1))
+                    )
@@ -0,0 +1,21 @@
+"""Test data shared by several test modules."""
+from decimal import Decimal
+
+from ..models import Cart, CartItem, Client, Product, ProductVariant
+
+
+def order_fixture(stock, clients=1, lines=1):
+    """``lines`` variants with ``stock`` units each, and one cart per client holding one unit of each."""
+    product = Product.objects.create(name='Vinilo', brand='Marca', category='Vinilos')
+    variants = ProductVariant.objects.bulk_create([
+        ProductVariant(product=product, color=f'Color {number}', stock=stock,
+                       unit_price=Decimal('1190'), bulk_price=Decimal('0'))
+        for number in range(lines)
+    ])
+    carts = []
+    for number in range(clients):
+        client = Client.objects.create(company_name=f'Pesca {number}', tax_id=f'{number}-1', email='p@example.com')
+        cart = Cart.objects.create(client=client)
+        CartItem.objects.bulk_create([CartItem(cart=cart, variant=variant, quantity=1) for variant in variants])
+        carts.append(cart)
+    return variants, carts
@@ -0,0 +1,45 @@
+"""Tests for the rendered product card cache (landing/catalog_cards.py)."""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from landing.catalog_cards import CARD_TEMPLATE, card_template_version
+
+from ..catalog import card_cache_stats
+from ..models import Client, Product, ProductVariant, User
+
+
+class CardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for name in ('Jig Azul', 'Jig Rojo'):
+            product = Product.objects.create(name=name, brand='Marca', category='Jigs')
+            self.variant = ProductVariant.objects.create(product=product, color='Azul', stock=5,
+                                                         unit_price=Decimal('1190'), bulk_price=Decimal('0'))
+        user = User.objects.create_user('cards-client', password='x', role='client')
+        Client.objects.create(user=user, company_name='Pesca Centro', tax_id='3-5', email='centro@example.com')
+        self.client.force_login(user)
+
+    def get_catalog(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(reverse('landing:catalog')).status_code, 200)
+
+    def test_lookups_are_counted_as_hits_and_misses(self):
+        self.get_catalog()
+        self.assertEqual(card_cache_stats(), {'hits': 0, 'misses': 2, 'hit_rate': 0.0})
+        self.get_catalog()
+        self.assertEqual(card_cache_stats(), {'hits': 2, 'misses': 2, 'hit_rate': 50.0})
+        # Only the changed product's card is rendered again
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.stock = 4
+            self.variant.save()
+        self.get_catalog()
+        self.assertEqual(card_cache_stats(), {'hits': 3, 'misses': 3, 'hit_rate': 50.0})
+
+    def test_card_keys_follow_the_template_source(self):
+        source = (settings.BASE_DIR / 'landing' / 'templates' / CARD_TEMPLATE).read_bytes()
+        self.assertEqual(card_template_version(), hashlib.sha1(source).hexdigest()[:12])
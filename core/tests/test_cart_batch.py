@@ -0,0 +1,126 @@
+"""Tests for the batch cart endpoint (landing:cart_batch)."""
+import json
+import threading
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+
+from ..models import Cart, CartItem, Client, Product, ProductVariant, User
+from ..reservations import held_quantities, hold
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('batch-client', password='x', role='client')
+        self.client_record = Client.objects.create(user=user, company_name='Pesca Norte', tax_id='2-7',
+                                                   email='norte@example.com')
+        self.client.force_login(user)
+        product = Product.objects.create(name='Jig', brand='Marca', category='Jigs')
+        self.jig, self.shad, self.last = ProductVariant.objects.bulk_create([
+            ProductVariant(product=product, color=color, stock=stock, unit_price=Decimal('1190'), bulk_price=Decimal('0'))
+            for color, stock in (('Azul', 5), ('Rojo', 5), ('Verde', 2))
+        ])
+
+    def batch(self, *operations):
+        response = self.client.post(reverse('landing:cart_batch'), json.dumps({'operations': list(operations)}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def lines(self):
+        return dict(CartItem.objects.filter(cart__client=self.client_record).values_list('variant_id', 'quantity'))
+
+    def assertHeldAsInCart(self):
+        self.assertEqual(held_quantities(), self.lines())
+
+    def test_mixed_operations(self):
+        self.batch({'op': 'add', 'variant_id': self.jig.id}, {'op': 'add', 'variant_id': self.shad.id, 'quantity': 2})
+        shad_line = CartItem.objects.get(variant=self.shad)
+        data = self.batch(
+            {'op': 'add', 'variant_id': self.jig.id, 'quantity': 2},
+            {'op': 'update', 'item_id': shad_line.id, 'quantity': 4},
+            {'op': 'add', 'variant_id': self.last.id},
+            {'op': 'add', 'variant_id': self.last.id},
+        )
+        self.assertTrue(data['success'])
+        self.assertEqual([result['quantity'] for result in data['results']], [3, 4, 2, 2])
+        self.assertEqual(data['cart_count'], 3)
+        self.assertEqual(self.lines(), {self.jig.id: 3, self.shad.id: 4, self.last.id: 2})
+        self.assertHeldAsInCart()
+
+        data = self.batch({'op': 'remove', 'item_id': shad_line.id}, {'op': 'remove', 'variant_id': self.last.id})
+        self.assertTrue(data['success'])
+        self.assertEqual(self.lines(), {self.jig.id: 3})
+        self.assertHeldAsInCart()
+
+    def test_short_stock_rejects_only_that_variant(self):
+        other = Client.objects.create(company_name='Pesca Sur', tax_id='4-3', email='sur@example.com')
+        hold(CartItem.objects.create(cart=Cart.objects.create(client=other), variant=self.last, quantity=1), other)
+        data = self.batch(
+            {'op': 'add', 'variant_id': self.jig.id},
+            {'op': 'add', 'variant_id': self.last.id},
+            {'op': 'add', 'variant_id': self.last.id},
+        )
+        self.assertFalse(data['success'])
+        self.assertEqual([result['success'] for result in data['results']], [True, False, False])
+        self.assertEqual(data['results'][1]['error'], 'Stock insuficiente. Solo hay 1 unidades disponibles.')
+        self.assertEqual(self.lines(), {self.jig.id: 1})
+
+    def test_unknown_items_and_invalid_operations(self):
+        data = self.batch(
+            {'op': 'update', 'item_id': 999999, 'quantity': 2},
+            {'op': 'add', 'variant_id': 999999},
+            {'op': 'explode', 'variant_id': self.jig.id},
+            {'op': 'add', 'variant_id': self.jig.id, 'quantity': 0},
+            {'op': 'add', 'variant_id': self.jig.id},
+        )
+        self.assertFalse(data['success'])
+        self.assertEqual([result['error'] for result in data['results']], [
+            'Producto no encontrado en el carrito', 'Producto no encontrado', 'Operación inválida', 'Datos inválidos',
+            None,
+        ])
+        self.assertEqual(self.lines(), {self.jig.id: 1})
+        self.assertEqual(self.client.post(reverse('landing:cart_batch'), json.dumps({'operations': []}),
+                                          content_type='application/json').status_code, 400)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentCartBatchTests(TransactionTestCase):
+    def test_racing_adds_to_one_cart_all_count(self):
+        cache.clear()
+        user = User.objects.create_user('racing-client', password='x', role='client')
+        client = Client.objects.create(user=user, company_name='Pesca Norte', tax_id='2-7', email='n@example.com')
+        product = Product.objects.create(name='Jig', brand='Marca', category='Jigs')
+        variant = ProductVariant.objects.create(product=product, color='Azul', stock=50,
+                                                unit_price=Decimal('1190'), bulk_price=Decimal('0'))
+        Cart.objects.create(client=client)
+        workers = 4
+        start = threading.Barrier(workers)
+        statuses = []
+
+        def add(browser):
+            try:
+                start.wait()
+                response = browser.post(reverse('landing:cart_batch'), json.dumps({'operations': [
+                    {'op': 'add', 'variant_id': variant.id, 'quantity': 1},
+                ]}), content_type='application/json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        browsers = []
+        for _ in range(workers):
+            browser = self.client_class()
+            browser.force_login(user)
+            browsers.append(browser)
+        threads = [threading.Thread(target=add, args=(browser,)) for browser in browsers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, [200] * workers)
+        self.assertEqual(CartItem.objects.get(cart__client=client).quantity, workers)
@@ -0,0 +1,134 @@
+"""Tests for the product sheet import (core/catalog_import.py)."""
+import csv
+import html
+import io
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..catalog_import import CatalogImporter, iter_records, read_rows
+from ..models import Product, ProductVariant
+
+try:
+    import openpyxl
+except ImportError:  # optional, only the XLSX import needs it
+    openpyxl = None
+
+
+SHEET_HEADER = ['ITEM', 'UPC/JAN', 'COLOR', 'CANTIDAD DISPONIBLE', 'PRECIOS UNITARIO NETO', 'PRECIO C/IVA', 'CATEGORIA']
+SHEET_ROWS = [
+    ['Jig Metal', '7790001', 'Azul', '10', 'CLP 5.000', 'CLP 5.950', 'Jigs'],
+    ['Jig Metal', '7790002', '0.8g/15pcs', '3', '', 'CLP 1.190', 'Jigs'],
+    ['Vinilo Shad', '7790003', 'Rojo', '0', '1.234,5', '', 'Vinilos'],
+]
+
+
+class CatalogImportTests(TestCase):
+    def write_sheet(self, fmt, rows=SHEET_ROWS):
+        """The sheet as Excel exports it: a title row, the header, the rows and a blank footer."""
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / f'productos.{fmt}'
+        if fmt == 'csv':
+            with open(path, 'w', encoding='utf-8', newline='') as handle:
+                csv.writer(handle, delimiter=';').writerows([['Lista de precios'], SHEET_HEADER, *rows, []])
+        elif fmt == 'htm':
+            cells = ''.join(f'<th>{cell}</th>' for cell in SHEET_HEADER)
+            body = ''.join('<tr>' + ''.join(f'<td>{html.escape(cell)}</td>' for cell in row) + '</tr>' for row in rows)
+            path.write_text(
+                f'<html><body><table><tr><td colspan="{len(SHEET_HEADER)}">Lista de<br>precios</td></tr>'
+                f'<tr>{cells}</tr>{body}<tr><td colspan="{len(SHEET_HEADER)}"></td></tr></table></body></html>',
+                encoding='utf-8',
+            )
+        else:
+            workbook = openpyxl.Workbook()
+            sheet = workbook.active
+            sheet.append(['Lista de precios'])
+            sheet.append(SHEET_HEADER)
+            for row in rows:
+                # Excel keeps codes and quantities as numbers
+                sheet.append([int(cell) if cell.isdigit() else cell for cell in row])
+            workbook.save(path)
+        return path
+
+    def import_sheet(self, path, **kwargs):
+        return list(CatalogImporter(**kwargs).run(iter_records(read_rows(path))))
+
+    def test_sheet_records(self):
+        azul, pack, rojo = iter_records(read_rows(self.write_sheet('csv')))
+        self.assertEqual((azul['sku'], azul['stock'], azul['unit_price'], azul['bulk_price']),
+                         ('7790001', 10, Decimal('5950.00'), Decimal('5000.00')))
+        # "0.8g/15pcs" is a weight and a pack size; missing prices come from the other one
+        self.assertEqual((pack['color'], pack['weight'], pack['size'], pack['bulk_price']),
+                         ('', 0.8, '15pcs', Decimal('1000.00')))
+        self.assertEqual((rojo['bulk_price'], rojo['unit_price']), (Decimal('1234.50'), Decimal('1469.06')))
+
+    def test_html_export_reads_like_the_csv(self):
+        self.assertEqual(list(iter_records(read_rows(self.write_sheet('htm')))),
+                         list(iter_records(read_rows(self.write_sheet('csv')))))
+
+    @skipUnless(openpyxl, 'openpyxl is not installed')
+    def test_xlsx_reads_like_the_csv(self):
+        self.assertEqual(list(iter_records(read_rows(self.write_sheet('xlsx')))),
+                         list(iter_records(read_rows(self.write_sheet('csv')))))
+
+    def test_csv_delimiter_comes_from_the_header_row(self):
+        # Decimal commas must not make a semicolon sheet look comma-separated
+        rows = list(read_rows(self.write_sheet('csv')))
+        self.assertEqual(rows[1:-1], [SHEET_HEADER, *SHEET_ROWS])
+
+    def test_html_rows_expand_colspans(self):
+        rows = list(read_rows(self.write_sheet('htm')))
+        self.assertEqual(rows[0], ['Lista de precios'] + [''] * (len(SHEET_HEADER) - 1))
+        self.assertEqual(rows[1:-1], [SHEET_HEADER, *SHEET_ROWS])
+
+    def test_batches_create_then_update(self):
+        # A variant loaded before SKUs were tracked is matched by product and color
+        vinilo = Product.objects.create(name='Vinilo Shad', brand='Marca', category='Vinilos')
+        old = ProductVariant.objects.create(
+            product=vinilo, color='Rojo', stock=4, unit_price=Decimal('1000'), bulk_price=Decimal('840.34'),
+        )
+        stats = self.import_sheet(self.write_sheet('csv'), batch_size=2)
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(sum(batch['products_created'] for batch in stats), 1)
+        self.assertEqual(sum(batch['variants_created'] for batch in stats), 2)
+        self.assertEqual(sum(batch['variants_updated'] for batch in stats), 1)
+        old.refresh_from_db()
+        self.assertEqual((old.sku, old.stock, old.bulk_price), ('7790003', 0, Decimal('1234.50')))
+        self.assertEqual(
+            sorted(ProductVariant.objects.filter(product__name='Jig Metal').values_list('sku', 'stock')),
+            [('7790001', 10), ('7790002', 3)],
+        )
+
+        # Importing the sheet again only touches the rows that changed
+        rows = [list(row) for row in SHEET_ROWS]
+        rows[0][3] = '7'
+        stats = self.import_sheet(self.write_sheet('csv', rows))
+        self.assertEqual([(batch['variants_created'], batch['variants_updated'], batch['unchanged'])
+                          for batch in stats], [(0, 1, 2)])
+        self.assertEqual(ProductVariant.objects.get(sku='7790001').stock, 7)
+        self.assertEqual(ProductVariant.objects.filter(sku__startswith='77900').count(), 3)
+
+    def test_dry_run_writes_nothing(self):
+        self.import_sheet(self.write_sheet('csv'))
+        rows = [list(row) for row in SHEET_ROWS]
+        rows[0][3] = '7'
+        rows.append(['Señuelo Nuevo', '7790004', 'Verde', '2', '', '990', 'Señuelos'])
+        before = list(ProductVariant.objects.order_by('pk').values())
+        products = Product.objects.count()
+
+        output = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_catalog', str(self.write_sheet('htm', rows)), '--dry-run', stdout=output)
+        writes = [query['sql'] for query in queries.captured_queries
+                  if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(list(ProductVariant.objects.order_by('pk').values()), before)
+        self.assertEqual(Product.objects.count(), products)
+        self.assertIn('+ producto Señuelo Nuevo', output.getvalue())
+        self.assertIn('stock 10 -> 7', output.getvalue())
+        self.assertIn('Dry run, nothing written', output.getvalue())
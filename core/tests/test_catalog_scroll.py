@@ -0,0 +1,58 @@
+"""Tests for the catalog JSON API and its infinite-scroll mode."""
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Client, Product, ProductVariant, User
+from ..search import refresh_search_index
+
+
+class CatalogScrollTests(TestCase):
+    def setUp(self):
+        for category, name in [('Jigs', 'Jig Azul'), ('Jigs', 'Jig Rojo'), ('Vinilos', 'Vinilo Jig'),
+                               ('Vinilos', 'Vinilo Shad'), ('Anzuelos', 'Anzuelo Jig')]:
+            product = Product.objects.create(name=name, brand='Marca', category=category)
+            ProductVariant.objects.create(product=product, color='Azul', stock=5,
+                                          unit_price=Decimal('1190'), bulk_price=Decimal('0'))
+        refresh_search_index()
+        user = User.objects.create_user('scroll-client', password='x', role='client')
+        Client.objects.create(user=user, company_name='Pesca Centro', tax_id='3-5', email='centro@example.com')
+        self.client.force_login(user)
+
+    def test_cursor_pages_list_the_catalog_in_order(self):
+        names, params = [], {'limit': 2}
+        while True:
+            data = self.client.get(reverse('landing:catalog_api'), params).json()
+            names += [product['name'] for product in data['products']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(names, ['Anzuelo Jig', 'Jig Azul', 'Jig Rojo', 'Vinilo Jig', 'Vinilo Shad'])
+
+    def test_cursor_pages_keep_the_search(self):
+        names, params = [], {'q': 'jig', 'limit': 2}
+        while True:
+            data = self.client.get(reverse('landing:catalog_api'), params).json()
+            names += [product['name'] for product in data['products']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(names, ['Anzuelo Jig', 'Jig Azul', 'Jig Rojo', 'Vinilo Jig'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('landing:catalog_api'), {'cursor': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_scroll_mode_is_linked(self):
+        self.assertContains(self.client.get(reverse('landing:catalog')), '?scroll=1')
+        response = self.client.get(reverse('landing:catalog'), {'scroll': '1'})
+        self.assertContains(response, 'id="catalogScroll"')
+        self.assertContains(response, 'Ver agrupado por categoría')
+
+    def test_scroll_mode_keeps_the_search(self):
+        response = self.client.get(reverse('landing:catalog'), {'q': 'jig'})
+        self.assertContains(response, '?scroll=1&amp;q=jig')
+        response = self.client.get(reverse('landing:catalog'), {'q': 'jig', 'scroll': '1'})
+        self.assertContains(response, 'data-query="jig"')
+        self.assertContains(response, '<input type="hidden" name="scroll" value="1">', html=True)
@@ -0,0 +1,66 @@
+"""Tests for conditional GET on the catalog (core/conditional.py)."""
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Cart, CartItem, Client, Product, ProductVariant, User
+from ..reservations import hold, reservation_ttl
+
+
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        product = Product.objects.create(name='Jig', brand='Marca', category='Jigs')
+        self.variant = ProductVariant.objects.create(
+            product=product, color='Azul', stock=10, unit_price=Decimal('1190'), bulk_price=Decimal('0'),
+        )
+        user = User.objects.create_user('conditional-client', password='x', role='client')
+        Client.objects.create(user=user, company_name='Pesca Centro', tax_id='3-5', email='centro@example.com')
+        self.client.force_login(user)
+
+    def get_catalog(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(reverse('landing:catalog'), **headers)
+
+    def test_unchanged_catalog_revalidates_without_reading_the_catalog(self):
+        etag = self.get_catalog()['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_catalog(etag)
+        self.assertEqual(response.status_code, 304)
+        tables = ('"core_product"', '"core_productvariant"', '"core_stockreservation"')
+        self.assertEqual([query['sql'] for query in queries.captured_queries
+                          if any(table in query['sql'] for table in tables)], [])
+
+    def test_catalog_changes_with_stock_and_holds(self):
+        etag = self.get_catalog()['ETag']
+        other = Client.objects.create(company_name='Pesca Sur', tax_id='4-3', email='sur@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            hold(CartItem.objects.create(cart=Cart.objects.create(client=other), variant=self.variant, quantity=4), other)
+        response = self.get_catalog(etag)
+        self.assertEqual(response.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.stock = 3
+            self.variant.save()
+        self.assertEqual(self.get_catalog(response['ETag']).status_code, 200)
+
+    def test_lapsed_hold_changes_the_catalog(self):
+        other = Client.objects.create(company_name='Pesca Sur', tax_id='4-3', email='sur@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            hold(CartItem.objects.create(cart=Cart.objects.create(client=other), variant=self.variant, quantity=4), other)
+        response = self.get_catalog()
+        self.assertContains(response, 'Stock: 6')
+        self.assertEqual(self.get_catalog(response['ETag']).status_code, 304)
+
+        # Nothing is written when a hold lapses; the sweep has not run yet
+        lapsed = timezone.now() + reservation_ttl() + timedelta(seconds=1)
+        with mock.patch('django.utils.timezone.now', return_value=lapsed):
+            response = self.get_catalog(response['ETag'])
+        self.assertContains(response, 'Stock: 10')
@@ -0,0 +1,30 @@
+"""Tests for the order exports (core/exports.py)."""
+from datetime import date, datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..exports import export_queryset
+from ..models import PurchaseOrder
+from .factories import order_fixture
+
+
+class ExportTests(TestCase):
+    @override_settings(TIME_ZONE='America/Santiago')
+    def test_date_filters_cover_whole_local_days(self):
+        _, (cart,) = order_fixture(stock=5)
+        santiago = timezone.get_current_timezone()
+        times = [
+            datetime(2026, 3, 9, 23, 59, 59),
+            datetime(2026, 3, 10, 0, 0),
+            datetime(2026, 3, 11, 23, 59, 59, 999999),
+            datetime(2026, 3, 12, 0, 0),
+        ]
+        orders = []
+        for moment in times:
+            order = PurchaseOrder.objects.create(client=cart.client, status='completado', total_amount=0)
+            PurchaseOrder.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(moment, santiago))
+            orders.append(order.pk)
+
+        rows = export_queryset('orders', date_from=date(2026, 3, 10), date_to=date(2026, 3, 11))
+        self.assertEqual([row[0] for row in rows.filter(pk__in=orders)], orders[1:3])
@@ -0,0 +1,88 @@
+"""Tests for the cached client and cart of each user (core/identity.py)."""
+import json
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..identity import CLIENT_FIELDS, IDENTITY_KEY, fields_version
+from ..models import Cart, Client, Product, ProductVariant, PurchaseOrder, User
+
+
+class ClientIdentityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('identity-client', password='x', role='client')
+        self.client_record = Client.objects.create(
+            user=user, company_name='Pesca Norte', tax_id='2-7', address='Calle 3',
+            phone='+56 9 2222 2222', email='norte@example.com',
+        )
+        product = Product.objects.create(name='Jig', brand='Marca', category='Jigs')
+        self.variant = ProductVariant.objects.create(
+            product=product, color='Azul', stock=10, unit_price=Decimal('1190'), bulk_price=Decimal('0'),
+        )
+        self.client.force_login(user)
+
+    def add_to_cart(self):
+        # Cart and client signals invalidate on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('landing:add_to_cart'), json.dumps({'variant_id': self.variant.id}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_cart_pages_reuse_the_cached_client_and_cart(self):
+        self.add_to_cart()
+        self.assertEqual(Cart.objects.filter(client=self.client_record).count(), 1)
+        # The identity read by a request is cached when its transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('landing:cart'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('landing:checkout'))
+        self.assertContains(response, 'Pesca Norte')
+        lookups = [query['sql'] for query in queries.captured_queries
+                   if 'FROM "core_client"' in query['sql'] or 'FROM "core_cart"' in query['sql']]
+        self.assertEqual(lookups, [])
+
+    def test_client_changes_reach_the_cached_copy(self):
+        self.add_to_cart()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertContains(self.client.get(reverse('landing:checkout')), 'Pesca Norte')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_record.company_name = 'Pesca Sur'
+            self.client_record.save()
+        self.assertContains(self.client.get(reverse('landing:checkout')), 'Pesca Sur')
+
+    def test_copies_cached_with_other_fields_are_not_read(self):
+        # As cached by a release whose Client had one field less
+        old_fields = CLIENT_FIELDS[:-1]
+        old_key = IDENTITY_KEY.replace(fields_version(CLIENT_FIELDS), fields_version(old_fields))
+        self.assertNotEqual(old_key, IDENTITY_KEY)
+        cache.set(old_key.format(user_id=self.client_record.user_id),
+                  {'client': ['Otra'] * len(old_fields), 'cart_id': None})
+        self.add_to_cart()
+        self.assertContains(self.client.get(reverse('landing:checkout')), 'Pesca Norte')
+
+    def test_first_cart_is_found_before_its_creation_commits(self):
+        # Like bench: the client's first cart is created inside an outer transaction
+        # that has not committed, so the cached identity still says "no cart"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('landing:cart'))
+        with transaction.atomic():
+            response = self.client.post(reverse('landing:cart_batch'), json.dumps({'operations': [
+                {'op': 'add', 'variant_id': self.variant.id, 'quantity': 2},
+            ]}), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.add_to_cart()
+            response = self.client.post(reverse('landing:process_checkout'), {
+                'company_name': 'Pesca Norte', 'tax_id': '2-7', 'address': 'Calle 3',
+                'phone': '+56 9 2222 2222', 'email': 'norte@example.com',
+            })
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(Cart.objects.filter(client=self.client_record).count(), 1)
+            order = PurchaseOrder.objects.get(client=self.client_record)
+            self.assertEqual(order.items.get().quantity, 3)
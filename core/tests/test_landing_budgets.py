@@ -0,0 +1,82 @@
+"""Query-count budgets for the landing views (see core.tests.budgets)."""
+import tempfile
+
+from django.test import override_settings
+from django.urls import reverse
+
+from ..thumbnails import thumbnail_url
+from .budgets import Budget, QueryBudgetTestCase, url_names
+
+
+def _cart_item(data):
+    return data['cart_items'][0]
+
+
+def _checkout_form(data):
+    return {
+        '_form': True, 'company_name': 'Pesca Budget', 'tax_id': '1-9', 'address': 'Calle 2',
+        'phone': '+56 9 1111 1111', 'email': 'budget@example.com', 'notes': '',
+    }
+
+
+LANDING_BUDGETS = {
+    'landing:home': Budget('anonymous', 'get', lambda data: (reverse('landing:home'), None), 0),
+    'landing:login': Budget('anonymous', 'get', lambda data: (reverse('landing:login'), None), 0),
+    'landing:logout': Budget('client', 'post', lambda data: (reverse('landing:logout'), None), 4, status=302),
+    # Page budgets include the conditional GET validator (core/conditional.py)
+    'landing:my_orders': Budget('client', 'get', lambda data: (reverse('landing:my_orders'), None), 8),
+    'landing:order_detail': Budget(
+        'client', 'get', lambda data: (reverse('landing:order_detail', args=[data['order'].id]), None), 6,
+    ),
+    'landing:catalog': Budget('client', 'get', lambda data: (reverse('landing:catalog'), None), 8),
+    'landing:catalog_api': Budget('client', 'get', lambda data: (reverse('landing:catalog_api'), None), 6),
+    'landing:catalog_search': Budget(
+        'client', 'get', lambda data: (reverse('landing:catalog_search') + '?q=vinilo', None), 4,
+    ),
+    'landing:cart': Budget('client', 'get', lambda data: (reverse('landing:cart'), None), 7),
+    'landing:add_to_cart': Budget(
+        'client', 'post', lambda data: (reverse('landing:add_to_cart'), {'variant_id': data['variants'][-1].id}), 18,
+    ),
+    'landing:update_cart_item': Budget(
+        'client', 'post',
+        lambda data: (reverse('landing:update_cart_item'), {'item_id': _cart_item(data).id, 'quantity': 2}), 15,
+    ),
+    'landing:remove_cart_item': Budget(
+        'client', 'post', lambda data: (reverse('landing:remove_cart_item'), {'item_id': _cart_item(data).id}), 7,
+    ),
+    'landing:cart_batch': Budget(
+        'client', 'post',
+        lambda data: (reverse('landing:cart_batch'), {'operations': [
+            {'op': 'add', 'variant_id': data['variants'][-1].id, 'quantity': 1},
+            {'op': 'update', 'item_id': _cart_item(data).id, 'quantity': 3},
+        ]}), 13,
+    ),
+    'landing:checkout': Budget('client', 'get', lambda data: (reverse('landing:checkout'), None), 6),
+    'landing:process_checkout': Budget(
+        'client', 'post', lambda data: (reverse('landing:process_checkout'), _checkout_form(data)), 28, status=302,
+    ),
+    'landing:order_confirmation': Budget(
+        'client', 'get', lambda data: (reverse('landing:order_confirmation', args=[data['order'].id]), None), 5,
+    ),
+    'landing:thumbnail': Budget(
+        'anonymous', 'get', lambda data: (thumbnail_url('https://example.com/vinilo.jpg', 'card'), None), 0,
+    ),
+}
+
+
+class LandingQueryBudgetTests(QueryBudgetTestCase):
+    budgets = LANDING_BUDGETS
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(
+            THUMBNAIL_CACHE_DIR=cls.enterClassContext(tempfile.TemporaryDirectory()),
+            THUMBNAIL_FETCHER='core.tests.test_thumbnails.LocalImageFetcher',
+        ))
+
+    def test_every_landing_url_has_a_budget(self):
+        self.assertEqual(url_names('landing.urls', 'landing'), set(self.budgets))
+
+    def test_query_counts_do_not_grow_with_data(self):
+        self.assert_budgets()
@@ -0,0 +1,80 @@
+"""Tests for order placement (core/orders.py)."""
+import threading
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from ..models import CartItem, PurchaseOrder
+from ..orders import InsufficientStockError, _decrement_stock, place_order
+from .factories import order_fixture
+
+
+class OrderPlacementTests(TestCase):
+    def test_second_order_for_the_last_units_fails(self):
+        (variant,), carts = order_fixture(stock=5, clients=2)
+        CartItem.objects.update(quantity=3)
+        place_order(carts[0].client, carts[0])
+        with self.assertRaises(InsufficientStockError) as raised:
+            place_order(carts[1].client, carts[1])
+        (_, _, available), = raised.exception.lines
+        self.assertEqual(available, 2)
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock, 2)
+        self.assertEqual(PurchaseOrder.objects.filter(client__carts__in=carts).count(), 1)
+        self.assertEqual(carts[1].items.count(), 1)
+
+    def test_quantity_above_stock_writes_nothing(self):
+        (variant,), (cart,) = order_fixture(stock=2)
+        cart.items.update(quantity=3)
+        with self.assertRaises(InsufficientStockError):
+            place_order(cart.client, cart)
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock, 2)
+        self.assertFalse(PurchaseOrder.objects.filter(client=cart.client).exists())
+
+    def test_stock_update_never_goes_below_zero(self):
+        # The conditional UPDATE is the last line of defence if the lock was bypassed
+        (variant,), _ = order_fixture(stock=2, clients=0)
+        self.assertEqual(_decrement_stock({variant.id: 3}), 0)
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock, 2)
+
+    def test_query_count_does_not_grow_with_cart_lines(self):
+        counts = []
+        # The first order also creates the dashboard rollup rows
+        for lines in (1, 1, 20):
+            _, (cart,) = order_fixture(stock=5, lines=lines)
+            with CaptureQueriesContext(connection) as queries:
+                order = place_order(cart.client, cart)
+            self.assertEqual(order.items.count(), lines)
+            counts.append(len(queries))
+        self.assertEqual(counts[1], counts[2])
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentOrderTests(TransactionTestCase):
+    def test_racing_orders_for_the_last_units(self):
+        (variant,), carts = order_fixture(stock=5, clients=2)
+        CartItem.objects.update(quantity=3)
+        start = threading.Barrier(len(carts))
+        outcomes = []
+
+        def checkout(cart):
+            try:
+                start.wait()
+                place_order(cart.client, cart)
+                outcomes.append('placed')
+            except InsufficientStockError:
+                outcomes.append('rejected')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(cart,)) for cart in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes), ['placed', 'rejected'])
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock, 2)
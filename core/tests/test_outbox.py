@@ -0,0 +1,49 @@
+"""Tests for the email outbox (core/outbox.py)."""
+from smtplib import SMTPException
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import OutboxMessage
+from ..outbox import enqueue_mail, send_batch
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """``EMAIL_BACKEND`` for tests: a mail server that rejects every message."""
+
+    def send_messages(self, email_messages):
+        raise SMTPException('451 try again later')
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_SECONDS=60)
+class OutboxTests(TestCase):
+    def test_contact_form_only_queues_the_email(self):
+        response = self.client.post(reverse('landing:home'), {
+            'nombre': 'Ana', 'email': 'ana@example.com', 'mensaje': 'Hola',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        message = OutboxMessage.objects.get()
+
+        self.assertEqual(send_batch(), (1, 0))
+        self.assertEqual(mail.outbox[0].subject, message.subject)
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.SENT)
+        self.assertEqual(send_batch(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='core.tests.test_outbox.FailingEmailBackend')
+    def test_failures_back_off_then_dead_letter(self):
+        message = enqueue_mail('Pedido', 'Texto', '', ['cliente@example.com'])
+        for attempt in range(1, 4):
+            self.assertEqual(send_batch(), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, attempt)
+            self.assertIn('451', message.last_error)
+            # Not due again until its backoff has passed
+            self.assertEqual(send_batch(), (0, 0))
+            OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(message.status, OutboxMessage.DEAD)
+        self.assertEqual(send_batch(), (0, 0))
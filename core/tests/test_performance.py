@@ -0,0 +1,59 @@
+"""Tests for PerformanceMiddleware (core/middleware.py, core/perf.py)."""
+import asyncio
+import json
+import re
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from .. import perf
+from ..middleware import PerformanceMiddleware
+from ..models import User
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def query_count(self, response):
+        return re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1)
+
+    def test_sync_view_timing(self):
+        def view(request):
+            for _ in range(3):
+                User.objects.exists()
+            return HttpResponse()
+
+        with self.assertLogs('inserf.perf', 'INFO') as logs:
+            response = PerformanceMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(json.loads(logs.records[0].getMessage())['queries'], 3)
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", '
+                                                    r'render;dur=[\d.]+, app;dur=[\d.]+$')
+        self.assertEqual(self.query_count(response), '3')
+
+    async def test_async_view_timing(self):
+        async def view(request):
+            for _ in range(2):
+                await User.objects.aexists()
+            return HttpResponse()
+
+        with self.assertLogs('inserf.perf', 'INFO'):
+            response = await PerformanceMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(self.query_count(response), '2')
+
+    async def test_concurrent_async_requests_keep_their_own_profile(self):
+        async def view(request):
+            for _ in range(int(request.GET['queries'])):
+                await User.objects.aexists()
+                # Let the other request run in between
+                await asyncio.sleep(0)
+            return HttpResponse()
+
+        middleware = PerformanceMiddleware(view)
+        with self.assertLogs('inserf.perf', 'INFO'):
+            responses = await asyncio.gather(*[
+                middleware(self.factory.get('/', {'queries': queries})) for queries in (1, 4, 2)
+            ])
+        self.assertEqual([self.query_count(response) for response in responses], ['1', '4', '2'])
+        # Nothing is recorded outside a request
+        self.assertIsNone(perf._active_profile.get())
@@ -0,0 +1,64 @@
+"""Tests for cart stock holds (core/reservations.py)."""
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import StockReservation
+from ..orders import InsufficientStockError, place_order
+from ..reservations import held_quantities, hold, hold_many, release_expired
+from .factories import order_fixture
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        (self.variant,), (self.cart, self.other_cart) = order_fixture(stock=5, clients=2)
+        self.item = self.cart.items.get()
+        self.other_item = self.other_cart.items.get()
+
+    def test_hold_follows_the_cart_line(self):
+        self.item.quantity = 2
+        hold(self.item, self.cart.client)
+        self.item.quantity = 4
+        hold(self.item, self.cart.client)
+        self.assertEqual(held_quantities(), {self.variant.id: 4})
+        # A client's own holds are still theirs to buy
+        self.assertEqual(held_quantities(exclude_client=self.cart.client), {})
+        self.assertEqual(held_quantities(exclude_client=self.other_cart.client), {self.variant.id: 4})
+
+    def test_hold_many_upserts_every_line(self):
+        (first, second), (cart,) = order_fixture(stock=5, lines=2)
+        items = list(cart.items.order_by('variant_id'))
+        hold_many(items[:1], cart.client)
+        items[0].quantity = 3
+        hold_many(items, cart.client)
+        self.assertEqual(StockReservation.objects.filter(client=cart.client).count(), 2)
+        self.assertEqual(held_quantities([first.id, second.id]), {first.id: 3, second.id: 1})
+
+    def test_expired_holds_are_ignored_then_released(self):
+        hold(self.item, self.cart.client)
+        hold(self.other_item, self.other_cart.client)
+        StockReservation.objects.filter(cart_item=self.item).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(held_quantities(), {self.variant.id: 1})
+        self.assertEqual(release_expired(batch_size=1), 1)
+        self.assertEqual(list(StockReservation.objects.values_list('cart_item', flat=True)), [self.other_item.id])
+        self.assertEqual(release_expired(), 0)
+
+    def test_other_clients_holds_block_checkout(self):
+        self.other_item.quantity = 4
+        self.other_item.save()
+        hold(self.other_item, self.other_cart.client)
+        self.cart.items.update(quantity=2)
+        with self.assertRaises(InsufficientStockError) as raised:
+            place_order(self.cart.client, self.cart)
+        (_, _, available), = raised.exception.lines
+        self.assertEqual(available, 1)
+        # The client holding the units can buy them
+        self.assertEqual(place_order(self.other_cart.client, self.other_cart).items.get().quantity, 4)
+
+    def test_held_stock_aggregate_does_not_join_carts(self):
+        with CaptureQueriesContext(connection) as queries:
+            held_quantities(exclude_client=self.cart.client)
+        self.assertNotIn('core_cart', queries.captured_queries[0]['sql'])
@@ -0,0 +1,104 @@
+"""Tests for the dashboard KPI rollups (core/rollups.py, core/signals.py)."""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models.signals import post_init
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import rollups
+from ..models import Cart, CartItem, Client, KpiRollup, OrderItem, Product, ProductVariant, PurchaseOrder
+from ..orders import InsufficientStockError, place_order
+from ..rollups import rebuild_rollups
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        # Deltas are written by one on_commit callback per transaction (and savepoint)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_record = Client.objects.create(company_name='Pesca Norte', tax_id='2-7', email='n@example.com')
+
+    def rollups(self):
+        return {(row.metric, row.key): row.value for row in KpiRollup.objects.all() if row.value}
+
+    def assertRollupsMatchRecompute(self):
+        current = self.rollups()
+        with transaction.atomic():
+            rebuild_rollups()
+            recomputed = self.rollups()
+            transaction.set_rollback(True)
+        self.assertEqual(current, recomputed)
+
+    def create_catalog(self):
+        products = [Product.objects.create(name=f'Jig {number}', category=category)
+                    for number, category in enumerate(('Jigs', 'Vinilos'))]
+        return [
+            ProductVariant.objects.create(product=product, color=f'Color {number}', stock=10,
+                                          unit_price=Decimal('1190'), bulk_price=Decimal('0'))
+            for product in products for number in range(3)
+        ]
+
+    def test_rollups_match_a_recompute_after_creates_updates_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            variants = self.create_catalog()
+            other = Client.objects.create(company_name='Pesca Sur', tax_id='4-3', email='s@example.com')
+            cart = Cart.objects.create(client=other)
+            CartItem.objects.create(cart=cart, variant=variants[0], quantity=4)
+            order = place_order(other, cart)
+            PurchaseOrder.objects.create(client=self.client_record, status='completado', total_amount=0)
+        self.assertRollupsMatchRecompute()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'enviado'
+            order.save()
+            variants[1].stock = 3
+            variants[1].save()
+            variants[2].product = variants[3].product
+            variants[2].save()
+            product = variants[4].product
+            product.category = 'Anzuelos'
+            product.save()
+        self.assertRollupsMatchRecompute()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            variants[0].product.delete()
+            variants[5].delete()
+            Client.objects.filter(pk=other.pk).delete()
+        self.assertRollupsMatchRecompute()
+
+    def test_deltas_wait_for_the_commit_and_skip_rolled_back_savepoints(self):
+        before = self.rollups()
+        with self.captureOnCommitCallbacks(execute=True):
+            PurchaseOrder.objects.create(client=self.client_record, status='pendiente', total_amount=0)
+            with self.assertRaises(InsufficientStockError), transaction.atomic():
+                PurchaseOrder.objects.create(client=self.client_record, status='pendiente', total_amount=0)
+                raise InsufficientStockError([])
+            self.assertEqual(self.rollups(), before)
+        self.assertEqual(self.rollups()[rollups.ORDERS_BY_STATUS, 'pendiente'], 1)
+        self.assertRollupsMatchRecompute()
+
+    def test_product_cascade_does_not_look_up_each_variants_category(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_catalog()[0].product
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            product.delete()
+        self.assertEqual([query['sql'] for query in queries.captured_queries
+                          if query['sql'].startswith('SELECT "core_product"."category"')], [])
+        self.assertRollupsMatchRecompute()
+
+    def test_cascaded_order_items_bump_each_order_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            variants = self.create_catalog()
+            orders = [PurchaseOrder.objects.create(client=self.client_record, total_amount=0) for _ in range(2)]
+            for order in orders:
+                for variant in variants[:3]:
+                    OrderItem.objects.create(order=order, variant=variant, quantity=1, unit_price=variant.unit_price)
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            variants[0].product.delete()
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if query['sql'].startswith('UPDATE "core_purchaseorder"')]), len(orders))
+
+    def test_loading_rows_runs_no_receivers(self):
+        # The stored values are read when a row is saved, not whenever one is loaded
+        for model in (PurchaseOrder, Product, ProductVariant):
+            self.assertFalse(post_init.has_listeners(model))
@@ -0,0 +1,65 @@
+"""Tests for product search (core/search.py)."""
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Client, Product, ProductVariant, User
+from ..search import SEARCH_RESULTS_LIMIT, matching_products, refresh_search_index
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        for name, category, description, color in [
+            ('Vinilo Shad', 'Vinilos', '', 'Verde'),
+            ('Jig Slow', 'Jigs', 'Para pesca de shad', 'Azul'),
+            ('Jig Speed', 'Jigs', '', 'Shad Plata'),
+            ('Anzuelo Circular', 'Anzuelos', '', 'Negro'),
+        ]:
+            product = Product.objects.create(name=name, brand='Marca', category=category, description=description)
+            ProductVariant.objects.create(product=product, color=color, stock=5,
+                                          unit_price=Decimal('1190'), bulk_price=Decimal('0'))
+        refresh_search_index()
+
+    def names(self, query):
+        return [product.name for product in matching_products(query)]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.names('shad'), ['Vinilo Shad', 'Jig Slow', 'Jig Speed'])
+
+    def test_every_term_must_match_product_or_variant_text(self):
+        self.assertEqual(self.names('jig plata'), ['Jig Speed'])
+        self.assertEqual(self.names('jig negro'), [])
+        self.assertEqual(self.names('  '), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'trigram matching needs pg_trgm')
+    def test_misspelled_words_match_by_trigrams(self):
+        self.assertEqual(self.names('circulr')[:1], ['Anzuelo Circular'])
+
+    def test_suggestions_endpoint_is_limited(self):
+        user = User.objects.create_user('search-client', password='x', role='client')
+        self.client.force_login(user)
+        response = self.client.get(reverse('landing:catalog_search'), {'q': 'shad', 'limit': 2})
+        self.assertEqual([product['name'] for product in response.json()['products']], ['Vinilo Shad', 'Jig Slow'])
+        self.assertEqual(self.client.get(reverse('landing:catalog_search'), {'q': 'shad', 'limit': 'x'}).status_code, 400)
+
+    def test_catalog_lists_every_match(self):
+        # More matches than the suggestions endpoint returns
+        count = SEARCH_RESULTS_LIMIT + 10
+        product_ids = [Product.objects.create(name=f'Vinilo Paddle {number:03d}', brand='Marca', category='Vinilos').pk
+                       for number in range(count)]
+        refresh_search_index(product_ids)
+        user = User.objects.create_user('search-client', password='x', role='client')
+        Client.objects.create(user=user, company_name='Pesca Centro', tax_id='3-5', email='centro@example.com')
+        self.client.force_login(user)
+
+        names, params = [], {'q': 'paddle', 'limit': 25}
+        while True:
+            data = self.client.get(reverse('landing:catalog_api'), params).json()
+            names += [product['name'] for product in data['products']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(names, [f'Vinilo Paddle {number:03d}' for number in range(count)])
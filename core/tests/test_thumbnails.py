@@ -0,0 +1,88 @@
+"""Tests for the local thumbnail cache (core/thumbnails.py)."""
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..thumbnails import DiskLRU, get_thumbnail, thumbnail_url
+
+
+class LocalImageFetcher:
+    """``THUMBNAIL_FETCHER`` for tests: a generated image instead of a download."""
+
+    def __call__(self, url):
+        output = io.BytesIO()
+        Image.new('RGB', (1200, 900), 'steelblue').save(output, format='PNG')
+        return output.getvalue()
+
+
+class CountingImageFetcher(LocalImageFetcher):
+    calls = []
+
+    def __call__(self, url):
+        self.calls.append(url)
+        return super().__call__(url)
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        CountingImageFetcher.calls.clear()
+        cache.clear()
+        settings = override_settings(
+            THUMBNAIL_CACHE_DIR=self.enterContext(tempfile.TemporaryDirectory()),
+            THUMBNAIL_FETCHER='core.tests.test_thumbnails.CountingImageFetcher',
+        )
+        self.enterContext(settings)
+
+    def get(self, url, accept):
+        response = self.client.get(url, HTTP_ACCEPT=accept)
+        return response, b''.join(response.streaming_content)
+
+    def test_source_is_fetched_once_for_every_size_and_format(self):
+        source = 'https://example.com/jig.png'
+        webp, webp_body = self.get(thumbnail_url(source, 'card'), 'image/avif,image/webp,*/*')
+        jpeg, jpeg_body = self.get(thumbnail_url(source, 'card'), 'image/*')
+        line, line_body = self.get(thumbnail_url(source, 'line'), 'image/webp')
+
+        self.assertEqual(CountingImageFetcher.calls, [source])
+        self.assertEqual((webp['Content-Type'], jpeg['Content-Type']), ('image/webp', 'image/jpeg'))
+        self.assertEqual(webp['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(webp['Vary'], 'Accept')
+        self.assertEqual(Image.open(io.BytesIO(jpeg_body)).size, (640, 480))
+        self.assertEqual(Image.open(io.BytesIO(line_body)).size, (96, 96))
+
+    def test_tampered_token_is_not_fetched(self):
+        url = thumbnail_url('https://example.com/jig.png', 'card')
+        response = self.client.get(url.replace('/card/', '/card/x'))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(CountingImageFetcher.calls, [])
+
+    def test_thumbnail_evicted_before_it_is_opened_is_rendered_again(self):
+        source = 'https://example.com/jig.png'
+
+        def evicted_once(*args):
+            path = get_thumbnail(*args)
+            if patched.call_count == 1:
+                # Another worker's eviction runs right after the thumbnail is written
+                path.unlink()
+            return path
+
+        with mock.patch('core.thumbnails.get_thumbnail', side_effect=evicted_once) as patched:
+            response, body = self.get(thumbnail_url(source, 'line'), 'image/webp')
+        self.assertEqual(patched.call_count, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(body)).size, (96, 96))
+
+    def test_cache_evicts_least_recently_used_files(self):
+        store = DiskLRU(self.enterContext(tempfile.TemporaryDirectory()), max_bytes=1000)
+        oldest, newest = store.path('aa' * 32, '.src'), store.path('bb' * 32, '.src')
+        store.put(oldest, b'x' * 600)
+        os.utime(oldest, (0, 0))
+        store.put(newest, b'x' * 600)
+        self.assertFalse(oldest.exists())
+        self.assertTrue(newest.exists())
@@ -0,0 +1,311 @@
+"""
+Resized product and variant images served from a local disk cache.
+
+``Product.image_url`` and ``ProductVariant.image_url`` point at arbitrary
+external images, often several megabytes, shown in 48-64 px figures. Pages
+link to ``thumbnail_url(source, size)`` instead. The first request for a source
+downloads it once through ``THUMBNAIL_FETCHER``. Every size and format is then
+derived from that local copy: WebP for browsers that accept it, JPEG
+otherwise.
+
+Sources and thumbnails live under ``THUMBNAIL_CACHE_DIR``. The directory is
+an LRU bounded by ``THUMBNAIL_CACHE_MAX_BYTES``: a file's mtime is its last
+use, and the oldest files are deleted when the total grows past the limit.
+Any number of processes can share the directory. Writes are atomic renames,
+and each process tracks the total it added since its last scan.
+
+Thumbnail URLs carry the source URL signed with ``SECRET_KEY``, so the
+proxy only ever fetches images the site itself linked to.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# (width, height) of each size, twice the CSS size for high-density screens
+SIZES = {
+    'card': (640, 480),     # catalog card, 4:3 figure
+    'variant': (128, 128),  # 64x64 variant figure
+    'line': (96, 96),       # 48x48 cart and order lines
+}
+FORMATS = {
+    'webp': ('image/webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('image/jpeg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+SIGNING_SALT = 'core.thumbnails'
+FAILED_KEY = 'thumbnail:failed:{digest}'
+# Seconds before a source that could not be fetched or decoded is tried again
+FAILED_TIMEOUT = 600
+# Refresh a file's mtime (its LRU position) at most this often
+TOUCH_INTERVAL = 3600
+# Evict down to this share of the limit, so eviction does not run on every write
+EVICT_TO = 0.9
+# Decoding larger images is refused (decompression bombs)
+MAX_PIXELS = 40_000_000
+
+
+class ThumbnailError(Exception):
+    """The source image could not be fetched or decoded."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class HttpFetcher:
+    """
+    Default fetcher: GET http(s) URLs with a timeout and a size limit.
+
+    A fetcher is any callable taking the source URL and returning its bytes,
+    raising ``ThumbnailError`` on failure; point ``THUMBNAIL_FETCHER`` at a
+    local stand-in to run without network access.
+    """
+
+    def __init__(self):
+        self.timeout = _setting('THUMBNAIL_FETCH_TIMEOUT', 10)
+        self.max_bytes = _setting('THUMBNAIL_MAX_SOURCE_BYTES', 20 * 1024 * 1024)
+
+    def __call__(self, url):
+        if not url.lower().startswith(('http://', 'https://')):
+            raise ThumbnailError(f"Unsupported image URL: {url}")
+        request = urllib.request.Request(url, headers={'User-Agent': 'inserf-thumbnails'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read(self.max_bytes + 1)
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            raise ThumbnailError(f"Could not fetch {url}: {exc}") from exc
+        if len(data) > self.max_bytes:
+            raise ThumbnailError(f"{url} is larger than {self.max_bytes} bytes")
+        return data
+
+
+def get_fetcher():
+    return import_string(_setting('THUMBNAIL_FETCHER', 'core.thumbnails.HttpFetcher'))()
+
+
+def thumbnail_url(source_url, size):
+    """URL of the ``size`` thumbnail of ``source_url``; '' when there is no source."""
+    if not source_url:
+        return ''
+    if size not in SIZES:
+        raise ValueError(f"Unknown thumbnail size {size!r}")
+    # Signer, not signing.dumps(): no timestamp, so the URL is stable and cacheable
+    token = signing.Signer(salt=SIGNING_SALT).sign_object(source_url, compress=True)
+    return reverse('landing:thumbnail', args=[size, token])
+
+
+def source_from_token(token):
+    """The source URL signed into ``token``; raises ``signing.BadSignature``."""
+    return signing.Signer(salt=SIGNING_SALT).unsign_object(token)
+
+
+def negotiate_format(accept):
+    return 'webp' if 'image/webp' in (accept or '') else 'jpeg'
+
+
+class DiskLRU:
+    """Files under ``root``, least recently used evicted past ``max_bytes``."""
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Bytes on disk as of the last scan plus what this process wrote since
+        self.estimated = None
+
+    def path(self, digest, name):
+        return self.root / digest[:2] / f'{digest}{name}'
+
+    def get(self, path):
+        """Return ``path`` if cached, recording the use; None on a miss."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                return None
+        return path
+
+    def put(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        with self.lock:
+            if self.estimated is None:
+                self.estimated = self._scan_total()
+            else:
+                self.estimated += len(data)
+            over = self.estimated > self.max_bytes
+        if over:
+            self.evict()
+        return path
+
+    def _files(self):
+        for directory in self.root.iterdir() if self.root.exists() else ():
+            if directory.is_dir():
+                for path in directory.iterdir():
+                    if not path.name.startswith('.tmp-'):
+                        yield path
+
+    def _scan_total(self):
+        total = 0
+        for path in self._files():
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def evict(self):
+        """Delete least recently used files until the total is under ``EVICT_TO`` of the limit."""
+        entries = []
+        for path in self._files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self.lock:
+            self.estimated = total
+        return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+# Striped by source digest, so concurrent requests for a new image fetch it
+# once per process without keeping a lock per image ever served
+_source_locks = [threading.Lock() for _ in range(64)]
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DiskLRU(
+                _setting('THUMBNAIL_CACHE_DIR', Path(settings.BASE_DIR) / 'thumbnail_cache'),
+                _setting('THUMBNAIL_CACHE_MAX_BYTES', 512 * 1024 * 1024),
+            )
+        return _store
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs):
+    # Tests point THUMBNAIL_CACHE_DIR at a temporary directory
+    global _store
+    if setting.startswith('THUMBNAIL_CACHE_'):
+        with _store_lock:
+            _store = None
+
+
+def _source_lock(digest):
+    return _source_locks[int(digest[:8], 16) % len(_source_locks)]
+
+
+def _render(source, size, image_format):
+    try:
+        with Image.open(io.BytesIO(source)) as image:
+            if image.width * image.height > MAX_PIXELS:
+                raise ThumbnailError(f"Image of {image.width}x{image.height} pixels is too large")
+            image = ImageOps.exif_transpose(image)
+            # Cover the box and crop the overflow, like object-fit: cover
+            thumb = ImageOps.fit(image, SIZES[size], Image.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as exc:
+        raise ThumbnailError(f"Cannot decode image: {exc}") from exc
+
+    if image_format == 'jpeg' or thumb.mode not in ('RGB', 'RGBA'):
+        if thumb.mode in ('RGBA', 'LA') or 'transparency' in thumb.info:
+            # JPEG has no alpha; flatten onto white like the page background
+            background = Image.new('RGB', thumb.size, 'white')
+            background.paste(thumb, mask=thumb.convert('RGBA').getchannel('A'))
+            thumb = background
+        thumb = thumb.convert('RGB')
+    output = io.BytesIO()
+    thumb.save(output, **FORMATS[image_format][1])
+    return output.getvalue()
+
+
+def get_thumbnail(source_url, size, image_format):
+    """
+    Path of the cached ``size`` thumbnail of ``source_url`` in ``image_format``,
+    fetching and resizing on a miss. Raises ``ThumbnailError`` if the source
+    cannot be fetched or decoded (remembered for ``FAILED_TIMEOUT`` seconds).
+    """
+    store = get_store()
+    digest = hashlib.sha256(source_url.encode()).hexdigest()
+    path = store.path(digest, f'-{size}.{image_format}')
+    if store.get(path):
+        return path
+
+    failed_key = FAILED_KEY.format(digest=digest)
+    if cache.get(failed_key):
+        raise ThumbnailError(f"{source_url} failed recently")
+    with _source_lock(digest):
+        if store.get(path):
+            return path
+        try:
+            source_path = store.get(store.path(digest, '.src'))
+            if source_path:
+                source = source_path.read_bytes()
+            else:
+                source = get_fetcher()(source_url)
+                store.put(store.path(digest, '.src'), source)
+            return store.put(path, _render(source, size, image_format))
+        except FileNotFoundError:
+            # The source was evicted between get() and read; the next request fetches it again
+            raise ThumbnailError(f"{source_url} was evicted while in use")
+        except ThumbnailError:
+            cache.set(failed_key, True, FAILED_TIMEOUT)
+            raise
+
+
+def open_thumbnail(source_url, size, image_format):
+    """
+    ``get_thumbnail`` opened for reading. An open file survives eviction; if
+    another process evicts the thumbnail before it is opened, it is rendered
+    again once.
+    """
+    for _ in range(2):
+        try:
+            return open(get_thumbnail(source_url, size, image_format), 'rb')
+        except FileNotFoundError:
+            pass
+    raise ThumbnailError(f"{source_url} was evicted while in use")
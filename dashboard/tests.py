@@ -1,3 +1,28 @@
-from django.test import TestCase
+"""Query-count budgets for the admin dashboard views (see core.tests.budgets)."""
+from django.urls import reverse
 
-# Create your tests here.
+from core.tests.budgets import Budget, QueryBudgetTestCase, url_names
+
+DASHBOARD_BUDGETS = {
+    # Includes the conditional GET validator
+    'admin_home': Budget('admin', 'get', lambda data: (reverse('admin_home'), None), 4),
+    'client_home': Budget('admin', 'get', lambda data: (reverse('client_home'), None), 3),
+    'orders_by_client': Budget('admin', 'get', lambda data: (reverse('orders_by_client'), None), 3),
+    'client_orders': Budget(
+        'admin', 'get', lambda data: (reverse('client_orders', args=[data['other_client'].id]), None), 4,
+    ),
+    'performance': Budget('admin', 'get', lambda data: (reverse('performance'), None), 2),
+    'export_data': Budget(
+        'admin', 'get', lambda data: (reverse('export_data', args=['order_items']) + '?format=csv', None), 3,
+    ),
+}
+
+
+class DashboardQueryBudgetTests(QueryBudgetTestCase):
+    budgets = DASHBOARD_BUDGETS
+
+    def test_every_dashboard_url_has_a_budget(self):
+        self.assertEqual(url_names('dashboard.urls'), set(self.budgets))
+
+    def test_query_counts_do_not_grow_with_data(self):
+        self.assert_budgets()
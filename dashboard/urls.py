@@ -5,4 +5,8 @@ from . import views
 urlpatterns = [
     path('', views.admin_home, name='admin_home'),
     path("client/", views.list_clients, name="client_home"),
+    path("orders/", views.orders_by_client, name="orders_by_client"),
+    path("orders/client/<int:client_id>/", views.client_orders, name="client_orders"),
+    path("export/<str:kind>/", views.export_data, name="export_data"),
+    path("performance/", views.performance, name="performance"),
 ]
@@ -1,48 +1,191 @@
+from decimal import Decimal
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Sum
-from django.http import HttpResponseForbidden
-from django.shortcuts import render
-from core.models import PurchaseOrder, ProductVariant, Client
+from django.db.models import Count, DecimalField, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from core import perf
+from core.catalog import card_cache_stats
+from core.conditional import conditional_page, table_stamp
+from core.exports import EXPORT_FORMATS, EXPORTS, export_filename, parse_filters, stream_export
+from core.models import Client, KpiRollup, PurchaseOrder
+from core.pagination import keyset_page
+from core.rollups import dashboard_summary
+
+CLIENT_PAGE_SIZE = 50
+CLIENT_ORDERING = ('company_name', 'id')
+CLIENT_ORDERS_PAGE_SIZE = 20
+CLIENT_ORDERS_ORDERING = ('created_at', 'id')  # newest first
 
 
 def is_admin(user):
     return user.is_authenticated and user.role == "admin"
 
 
+def _admin_home_validator(request):
+    if not is_admin(request.user):
+        return None
+    # Every figure on the page is a rollup row
+    changed, rows = table_stamp(KpiRollup.objects.all())
+    return (changed, rows), changed
+
+
 @login_required
+@conditional_page(_admin_home_validator)
 def admin_home(request):
     if not is_admin(request.user):
         return HttpResponseForbidden("Acceso restringido a administradores.")
 
-    total_orders = PurchaseOrder.objects.count()
-    total_stock = ProductVariant.objects.aggregate(total=Sum("stock"))["total"] or 0
-    total_clients = Client.objects.count()
+    # Pre-aggregated counters maintained by core.rollups (one small query)
+    context = dashboard_summary()
+    return render(request, "dashboard/dashboard_home.html", context)
 
-    # Órdenes por estado
-    orders_by_status = PurchaseOrder.objects.values("status").annotate(count=Count("id"))
 
-    # Stock por categoría de productos
-    stock_by_category = (
-        ProductVariant.objects
-        .select_related("product")
-        .values("product__category")
-        .annotate(total_stock=Sum("stock"))
+@login_required
+def list_clients(request):
+    if not is_admin(request.user):
+        return HttpResponseForbidden("Acceso restringido a administradores.")
+
+    try:
+        clients, next_cursor = keyset_page(
+            Client.objects.select_related("user"), CLIENT_ORDERING,
+            cursor=request.GET.get("cursor"), limit=CLIENT_PAGE_SIZE,
+        )
+    except ValueError:
+        # Stale or tampered cursor: start over
+        return redirect(request.path)
+    return render(request, "dashboard/client/admin_clients.html", {
+        "clients": clients,
+        "next_cursor": next_cursor,
+        "is_first_page": not request.GET.get("cursor"),
+    })
+
+
+def _order_aggregate(aggregate, output_field, default):
+    """Correlated per-client subquery over that client's orders."""
+    orders = (
+        PurchaseOrder.objects.filter(client=OuterRef("pk"))
+        .order_by().values("client").annotate(value=aggregate).values("value")
     )
+    return Coalesce(Subquery(orders, output_field=output_field), Value(default, output_field=output_field))
 
-    context = {
-        "total_orders": total_orders,
-        "total_products": total_stock,
-        "total_clients": total_clients,
-        "orders_by_status": orders_by_status,
-        "stock_by_category": stock_by_category,
-    }
-    return render(request, "dashboard/dashboard_home.html", context)
+
+def clients_with_order_stats():
+    """
+    Clients annotated with their order count, total amount, last order date
+    and pending count.
+
+    Each figure is a correlated subquery on the client's own orders, so a page
+    of clients costs one query that only reads the orders of those clients,
+    however many orders exist overall.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    last_order = (
+        PurchaseOrder.objects.filter(client=OuterRef("pk"))
+        .order_by("-created_at").values("created_at")[:1]
+    )
+    return Client.objects.annotate(
+        order_count=_order_aggregate(Count("id"), IntegerField(), 0),
+        total_amount=_order_aggregate(Sum("total_amount"), money, Decimal("0")),
+        pending_count=_order_aggregate(Count("id", filter=Q(status="pendiente")), IntegerField(), 0),
+        last_order_at=Subquery(last_order),
+    )
 
 
 @login_required
-def list_clients(request):
+def orders_by_client(request):
     if not is_admin(request.user):
         return HttpResponseForbidden("Acceso restringido a administradores.")
 
-    clients = Client.objects.select_related("user").all()
-    return render(request, "dashboard/client/admin_clients.html", {"clients": clients})
+    try:
+        clients, next_cursor = keyset_page(
+            clients_with_order_stats(), CLIENT_ORDERING,
+            cursor=request.GET.get("cursor"), limit=CLIENT_PAGE_SIZE,
+        )
+    except ValueError:
+        # Stale or tampered cursor: start over
+        return redirect(request.path)
+    return render(request, "dashboard/orders/orders_by_client.html", {
+        "clients": clients,
+        "next_cursor": next_cursor,
+        "is_first_page": not request.GET.get("cursor"),
+    })
+
+
+@login_required
+def client_orders(request, client_id):
+    """JSON page of one client's orders, newest first (``?cursor=`` for more)."""
+    if not is_admin(request.user):
+        return JsonResponse({"success": False, "error": "Acceso restringido a administradores."}, status=403)
+
+    client = get_object_or_404(Client, pk=client_id)
+    try:
+        orders, next_cursor = keyset_page(
+            PurchaseOrder.objects.filter(client=client).only("id", "created_at", "status", "total_amount"),
+            CLIENT_ORDERS_ORDERING, cursor=request.GET.get("cursor"),
+            limit=CLIENT_ORDERS_PAGE_SIZE, descending=True,
+        )
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Cursor inválido"}, status=400)
+    return JsonResponse({
+        "success": True,
+        "orders": [
+            {
+                "id": order.id,
+                "created_at": order.created_at.isoformat(),
+                "status": order.status,
+                "total_amount": str(order.total_amount),
+            }
+            for order in orders
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+def export_data(request, kind):
+    """
+    Stream every order (or order line) matching ``?date_from=&date_to=&status=``
+    as ``?format=csv`` (default) or ``xlsx``.
+    """
+    if not is_admin(request.user):
+        return HttpResponseForbidden("Acceso restringido a administradores.")
+    if kind not in EXPORTS:
+        return HttpResponseBadRequest("Exportación desconocida.")
+
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Formato no soportado.")
+    try:
+        filters = parse_filters(
+            request.GET.get("date_from"), request.GET.get("date_to"), request.GET.get("status"),
+        )
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    chunks, content_type = stream_export(kind, export_format, **filters)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{export_filename(kind, export_format, **filters)}"'
+    # Keep buffering proxies from holding the stream back
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@login_required
+def performance(request):
+    """Per-view latency histograms, query counts and N+1 samples recorded by core.perf."""
+    if not is_admin(request.user):
+        return HttpResponseForbidden("Acceso restringido a administradores.")
+
+    perf.flush()
+    context = {
+        "enabled": getattr(settings, "PERF_INSTRUMENTATION", False),
+        "views": perf.view_stats(),
+        "card_cache": card_cache_stats(),
+        "window_minutes": settings.PERF_WINDOW_SECONDS * settings.PERF_WINDOWS // 60,
+        "slow_ms": settings.PERF_SLOW_REQUEST_MS,
+        "repeated_threshold": settings.PERF_REPEATED_QUERY_THRESHOLD,
+    }
+    return render(request, "dashboard/performance.html", context)
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'widget_tweaks',
     'core',
     'landing',
@@ -66,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'landing.context_processors.cart_summary',
             ],
         },
     },
@@ -76,7 +80,7 @@ WSGI_APPLICATION = 'inserf.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-# PostgreSQL-only configuration (SQLite removed)
+# PostgreSQL-only configuration (SQLite removed; inserf.test_settings runs the tests on SQLite)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -88,6 +92,142 @@ DATABASES = {
     }
 }
 
+# Connection management (DB_CONNECTION_MODE):
+#   persistent - each worker thread keeps its connection for DB_CONN_MAX_AGE seconds (WSGI)
+#   pool       - psycopg pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections per process (ASGI)
+#   pgbouncer  - persistent connections to pgbouncer in transaction pooling mode
+#   none       - a new connection per request
+DB_CONNECTION_MODE = os.getenv('DB_CONNECTION_MODE', 'persistent').lower()
+if DB_CONNECTION_MODE not in ('persistent', 'pool', 'pgbouncer', 'none'):
+    raise ImproperlyConfigured(
+        f"DB_CONNECTION_MODE must be persistent, pool, pgbouncer or none, not {DB_CONNECTION_MODE!r}"
+    )
+# Reused connections are pinged before each request; pooled ones when checked out
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() in ('1', 'true', 'yes')
+if DB_CONNECTION_MODE in ('persistent', 'pgbouncer'):
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+if DB_CONNECTION_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            # Seconds a request waits for a free connection before failing
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+if DB_CONNECTION_MODE == 'pgbouncer':
+    # Consecutive transactions may run on different server connections, so
+    # nothing may outlive a transaction: no named cursors, no prepared statements
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+    DATABASES['default']['OPTIONS'] = {'prepare_threshold': None}
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Local memory is per process; point REDIS_URL at a shared Redis in production
+# so cache invalidations reach every worker.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            # The default 300 entries cannot hold one rendered card per product
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('LOCMEM_CACHE_MAX_ENTRIES', '10000'))},
+        }
+    }
+
+# Session storage (SESSION_BACKEND). With cache or signed_cookies a logged-in page
+# no longer reads django_session:
+#   db             - django_session table (default)
+#   cache          - the default cache only; needs REDIS_URL with several workers,
+#                    and sessions are lost when the cache is flushed
+#   cached_db      - cache in front of the table
+#   signed_cookies - in the browser's cookie, signed but readable by the user
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db').lower()
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"SESSION_BACKEND must be db, cache, cached_db or signed_cookies, not {SESSION_BACKEND!r}"
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
+# Catalog snapshot (core/catalog.py). Bypass rebuilds it on every request.
+CATALOG_SNAPSHOT_BYPASS = os.getenv('CATALOG_SNAPSHOT_BYPASS', 'False').lower() in ('1', 'true', 'yes')
+CATALOG_SNAPSHOT_TIMEOUT = int(os.getenv('CATALOG_SNAPSHOT_TIMEOUT', '86400'))
+# Rendered product cards (landing/catalog_cards.py); keys change with the product, so this only bounds memory
+CATALOG_CARD_TIMEOUT = int(os.getenv('CATALOG_CARD_TIMEOUT', '86400'))
+
+# Resized product images (core/thumbnails.py): a disk LRU shared by every worker
+THUMBNAIL_CACHE_DIR = os.getenv('THUMBNAIL_CACHE_DIR', str(BASE_DIR / 'thumbnail_cache'))
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_MB', '512')) * 1024 * 1024
+# Dotted path of the callable class that downloads source images
+THUMBNAIL_FETCHER = os.getenv('THUMBNAIL_FETCHER', 'core.thumbnails.HttpFetcher')
+THUMBNAIL_FETCH_TIMEOUT = int(os.getenv('THUMBNAIL_FETCH_TIMEOUT', '10'))
+THUMBNAIL_MAX_SOURCE_BYTES = int(os.getenv('THUMBNAIL_MAX_SOURCE_MB', '20')) * 1024 * 1024
+
+# Part of every page ETag (core/conditional.py); set it to the release id so a deploy
+# with template changes makes browsers fetch the pages again
+PAGE_ETAG_SALT = os.getenv('PAGE_ETAG_SALT', '')
+
+# Email outbox (core/outbox.py): retries double from OUTBOX_RETRY_SECONDS up to
+# OUTBOX_RETRY_MAX_SECONDS; after OUTBOX_MAX_ATTEMPTS a message is marked dead
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETRY_SECONDS = int(os.getenv('OUTBOX_RETRY_SECONDS', '60'))
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('OUTBOX_RETRY_MAX_SECONDS', '3600'))
+# Seconds a send_outbox worker owns a claimed batch before another may retry it
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+
+# Minutes a cart line holds its stock (core/reservations.py)
+CART_RESERVATION_MINUTES = int(os.getenv('CART_RESERVATION_MINUTES', '30'))
+
+# VAT included in variant prices (core/pricing.py)
+VAT_RATE = os.getenv('VAT_RATE', '0.19')
+
+# Seconds the cached cart badge/summary may lag edits made outside the cart views
+CART_SUMMARY_TIMEOUT = int(os.getenv('CART_SUMMARY_TIMEOUT', '600'))
+# Seconds a user's client and cart id stay cached (core/identity.py); changes invalidate them
+CLIENT_IDENTITY_TIMEOUT = int(os.getenv('CLIENT_IDENTITY_TIMEOUT', '3600'))
+
+# Per-request timing, query and render instrumentation (core/perf.py)
+PERF_INSTRUMENTATION = os.getenv('PERF_INSTRUMENTATION', 'False').lower() in ('1', 'true', 'yes')
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', '500'))
+# Same SQL this many times in one request is logged as an N+1 signature
+PERF_REPEATED_QUERY_THRESHOLD = int(os.getenv('PERF_REPEATED_QUERY_THRESHOLD', '5'))
+# Histograms keep PERF_WINDOWS windows of PERF_WINDOW_SECONDS (one hour by default)
+PERF_WINDOW_SECONDS = int(os.getenv('PERF_WINDOW_SECONDS', '300'))
+PERF_WINDOWS = int(os.getenv('PERF_WINDOWS', '12'))
+PERF_FLUSH_SECONDS = int(os.getenv('PERF_FLUSH_SECONDS', '10'))
+
+if PERF_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'core.middleware.PerformanceMiddleware')
+    TEMPLATES[0]['BACKEND'] = 'core.perf.InstrumentedDjangoTemplates'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inserf.perf': {
+            'handlers': ['console'],
+            'level': os.getenv('PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,20 @@
+"""
+Settings for running the test suite without a PostgreSQL server:
+
+    python manage.py test --settings=inserf.test_settings
+
+The tests run against an in-memory SQLite database. PostgreSQL-only
+migrations are skipped (see core.operations.PostgreSQLOnly), and so are the
+tests that need PostgreSQL.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+# SQLite ignores the INCLUDE columns of the covering indexes
+SILENCED_SYSTEM_CHECKS = ['models.W040']
@@ -0,0 +1,57 @@
+"""
+Per-client cart summary (line count, units and total) kept in the cache.
+
+Pages read it through ``landing.context_processors.cart_summary`` instead of
+resolving the client and cart and counting items on every request. The cart
+endpoints refresh it right after they write, so it is never stale for the
+client's own actions; the timeout bounds staleness for edits made elsewhere
+(e.g. the Django admin).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+
+from core.models import CartItem
+
+CART_SUMMARY_KEY = 'cart-summary:user:{user_id}'
+
+EMPTY_SUMMARY = {'count': 0, 'units': 0, 'total': 0}
+
+
+def _key(user_id):
+    return CART_SUMMARY_KEY.format(user_id=user_id)
+
+
+def _summary_aggregates():
+    return {
+        'count': Count('id'),
+        'units': Sum('quantity'),
+        'total': Sum(F('quantity') * F('variant__unit_price')),
+    }
+
+
+def compute_cart_summary(user_id):
+    summary = CartItem.objects.filter(cart__client__user_id=user_id).aggregate(**_summary_aggregates())
+    return {key: value or 0 for key, value in summary.items()}
+
+
+def refresh_cart_summary(user_id):
+    """Recompute and cache the summary; call after writing to the user's cart."""
+    summary = compute_cart_summary(user_id)
+    cache.set(_key(user_id), summary, getattr(settings, 'CART_SUMMARY_TIMEOUT', 600))
+    return summary
+
+
+async def arefresh_cart_summary(user_id):
+    """Async ``refresh_cart_summary`` for the async cart endpoints."""
+    summary = await CartItem.objects.filter(cart__client__user_id=user_id).aaggregate(**_summary_aggregates())
+    summary = {key: value or 0 for key, value in summary.items()}
+    await cache.aset(_key(user_id), summary, getattr(settings, 'CART_SUMMARY_TIMEOUT', 600))
+    return summary
+
+
+def get_cart_summary(user_id):
+    summary = cache.get(_key(user_id))
+    if summary is None:
+        summary = refresh_cart_summary(user_id)
+    return summary
@@ -0,0 +1,72 @@
+"""
+Fragment cache for the catalog page's product cards.
+
+Rendering every variant row (``data-variant-text``, ``clp`` prices, stock
+states) is most of the catalog's cost. Each card is cached as HTML under the
+product's ``version`` from the catalog snapshot, so when one variant's stock
+changes only that product's card is rendered again. Stock shown net of other
+clients' holds joins the key only for products that have holds, so those
+cards are shared by every client who sees the same numbers. The key also
+holds a hash of the card template, so a deploy that changes the template
+never serves cards rendered by the old one.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from core.catalog import record_card_lookups
+
+CARD_TEMPLATE = 'landing/catalog_card.html'
+CATALOG_CARD_KEY = 'catalog:card:{template}:{product_id}:{version}{stock}'
+
+
+@functools.cache
+def card_template_version():
+    """Short hash of the card template's source, read once per process."""
+    source = get_template(CARD_TEMPLATE).template.source
+    return hashlib.sha1(source.encode()).hexdigest()[:12]
+
+
+def _key(product, held):
+    stock = ''
+    if any(variant['id'] in held for variant in product['variants']):
+        stock = ':' + ','.join(str(variant['stock']) for variant in product['variants'])
+    return CATALOG_CARD_KEY.format(
+        template=card_template_version(), product_id=product['id'], version=product['version'], stock=stock,
+    )
+
+
+def attach_product_cards(categories, held):
+    """
+    Set ``card_html`` on every product of a catalog structure, rendering only
+    the cards missing from the cache. ``held`` is what ``apply_to_catalog``
+    already subtracted from the variants' stock.
+
+    ``CATALOG_SNAPSHOT_BYPASS`` renders every card, like it rebuilds the snapshot.
+    """
+    products = [product for category_products in categories.values() for product in category_products]
+    if not products:
+        return categories
+    template = get_template(CARD_TEMPLATE)
+    if getattr(settings, 'CATALOG_SNAPSHOT_BYPASS', False):
+        for product in products:
+            product['card_html'] = mark_safe(template.render({'product': product}))
+        return categories
+
+    keys = {product['id']: _key(product, held) for product in products}
+    cached = cache.get_many(list(keys.values()))
+    rendered = {}
+    for product in products:
+        key = keys[product['id']]
+        html = cached.get(key)
+        if html is None:
+            html = rendered[key] = template.render({'product': product})
+        product['card_html'] = mark_safe(html)
+    if rendered:
+        cache.set_many(rendered, getattr(settings, 'CATALOG_CARD_TIMEOUT', 86400))
+    record_card_lookups(hits=len(products) - len(rendered), misses=len(rendered))
+    return categories
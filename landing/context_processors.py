@@ -0,0 +1,10 @@
+from .cart_summary import EMPTY_SUMMARY, get_cart_summary
+
+
+def cart_summary(request):
+    """Expose the cached cart summary and ``cart_count`` badge to every template."""
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated or user.role != 'client':
+        return {'cart_summary': EMPTY_SUMMARY, 'cart_count': 0}
+    summary = get_cart_summary(user.pk)
+    return {'cart_summary': summary, 'cart_count': summary['count']}
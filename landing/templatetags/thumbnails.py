@@ -0,0 +1,14 @@
+from django import template
+
+from core.thumbnails import thumbnail_url
+
+register = template.Library()
+
+
+@register.filter(name="thumbnail")
+def thumbnail(source_url, size):
+    """
+    URL of the resized, locally cached copy of an image URL.
+    Example: {{ product.image_url|thumbnail:"card" }}
+    """
+    return thumbnail_url(source_url, size)
@@ -1,9 +1,9 @@
 from django.urls import path
 from django.contrib.auth.views import LogoutView
 from .views import (
-    CustomLoginView, home, my_orders, catalog,
-    cart, add_to_cart, update_cart_item, remove_cart_item,
-    checkout, process_checkout, order_confirmation
+    CustomLoginView, home, my_orders, order_detail, catalog, catalog_api, catalog_search,
+    cart, add_to_cart, update_cart_item, remove_cart_item, cart_batch,
+    checkout, process_checkout, order_confirmation, thumbnail
 )
 
 app_name = "landing"
@@ -13,13 +13,18 @@ urlpatterns = [
     path("login/", CustomLoginView.as_view(), name="login"),
     path("logout/", LogoutView.as_view(), name="logout"),
     path("my-orders/", my_orders, name="my_orders"),
+    path("my-orders/<int:order_id>/", order_detail, name="order_detail"),
     path("catalog/", catalog, name="catalog"),
+    path("catalog/api/", catalog_api, name="catalog_api"),
+    path("catalog/search/", catalog_search, name="catalog_search"),
+    path("img/<str:size>/<str:token>/", thumbnail, name="thumbnail"),
     
     # Cart URLs
     path("cart/", cart, name="cart"),
     path("cart/add/", add_to_cart, name="add_to_cart"),
     path("cart/update/", update_cart_item, name="update_cart_item"),
     path("cart/remove/", remove_cart_item, name="remove_cart_item"),
+    path("cart/batch/", cart_batch, name="cart_batch"),
     
     # Checkout URLs
     path("checkout/", checkout, name="checkout"),
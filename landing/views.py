@@ -1,43 +1,67 @@
+from asgiref.sync import sync_to_async
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
-from django.http import JsonResponse
-from django.shortcuts import redirect, get_object_or_404
+from django.core.signing import BadSignature
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, redirect, get_object_or_404
 from django.shortcuts import render
+from django.templatetags.static import static
+from django.views.decorators.http import require_safe
 from django.db import transaction
+from django.db.models import Count, Prefetch
 import json
-from decimal import Decimal
+from collections import OrderedDict
+
+from core.catalog import catalog_stamp, get_catalog_snapshot
+from core.conditional import conditional_page, latest, table_stamp
+from core.identity import (
+    aget_or_create_cart, aresolve_cart_id, aresolve_identity, get_or_create_cart, request_cart, resolve_identity,
+)
+from core.models import Cart, PurchaseOrder, OrderItem, Product, ProductVariant, CartItem
+from core.orders import InsufficientStockError, place_order
+from core.outbox import aenqueue_mail
+from core.pagination import decode_cursor, encode_cursor, keyset_filter, keyset_page
+from core.pricing import annotate_cart_lines, cart_totals
+from core.reservations import (
+    aheld_quantities, aholds_changed, apply_to_catalog, held_quantities, hold, hold_many, holds_changed,
+    holds_state, lock_available_stock,
+)
+from core.search import SEARCH_RESULTS_LIMIT, matching_products
+from core.thumbnails import (
+    FORMATS, SIZES, ThumbnailError, negotiate_format, open_thumbnail, source_from_token, thumbnail_url,
+)
 
-from core.models import PurchaseOrder, Product, ProductVariant, Client, Cart, CartItem, OrderItem
 
-
-from django.core.mail import send_mail
 from django.conf import settings
+from .cart_summary import arefresh_cart_summary, refresh_cart_summary
+from .catalog_cards import attach_product_cards
+from .context_processors import cart_summary
 from .forms import ContactForm
 
-def home(request):
+
+async def home(request):
     contact_success = False
     form = ContactForm()
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            # Try to send an email to site contact (ignore bots via honeypot)
+            # Queue an email to the site contact (ignore bots via honeypot)
             if not form.cleaned_data.get('hpot'):
                 subject = "Nuevo contacto desde el sitio INSERF"
                 message = form.cleaned_summary()
                 from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None) or form.cleaned_data.get('email')
                 recipient_list = [getattr(settings, 'CONTACT_EMAIL', 'contacto@inserf.cl')]
-                try:
-                    send_mail(subject, message, from_email, recipient_list, fail_silently=True)
-                except Exception:
-                    # Silently ignore any email errors to avoid breaking UX
-                    pass
+                # manage.py send_outbox delivers it, so a slow mail server never delays the page
+                await aenqueue_mail(subject, message, from_email, recipient_list)
             contact_success = True
             form = ContactForm()  # reset form
     context = {
         'contact_form': form,
         'contact_success': contact_success,
     }
-    return render(request, "landing/home.html", context)
+    # Context processors read the session and user, which are sync ORM lookups
+    return await sync_to_async(render)(request, "landing/home.html", context)
 
 
 class CustomLoginView(LoginView):
@@ -53,99 +77,409 @@ class CustomLoginView(LoginView):
         return '/'
 
 
+MY_ORDERS_PAGE_SIZE = 10
+MY_ORDERS_ORDERING = ('created_at', 'id')  # newest first
+# (status, label, icon) for the my_orders tabs; '' lists every order
+ORDER_STATUS_TABS = [
+    ('', 'Todos', 'fas fa-list'),
+    ('pendiente', 'Pendientes', 'fas fa-clock'),
+    ('completado', 'Completados', 'fas fa-check-circle'),
+]
+
+
+def _client_or_404(request):
+    """``(client, cart_id)`` of the request (see core.identity); 404 for users without a Client."""
+    client, cart_id = resolve_identity(request)
+    if client is None:
+        raise Http404("No Client matches the given query.")
+    return client, cart_id
+
+
+async def _aclient_or_404(request):
+    client, cart_id = await aresolve_identity(request)
+    if client is None:
+        raise Http404("No Client matches the given query.")
+    return client, cart_id
+
+
+def _order_items_prefetch():
+    # Items with their variant and product in one extra query per page
+    return Prefetch('items', queryset=OrderItem.objects.select_related('variant__product').order_by('id'))
+
+
+def _page_parts(request):
+    # The navbar's cart badge
+    return cart_summary(request)['cart_summary']
+
+
+def _my_orders_validator(request):
+    if request.user.role != 'client':
+        return None
+    # Served by the client's orders index, not a scan
+    orders = table_stamp(PurchaseOrder.objects.filter(client__user=request.user))
+    # Item rows show the product's name, brand and image
+    catalog_version, catalog_changed = catalog_stamp()
+    return (
+        (request.get_full_path(), orders, catalog_version, _page_parts(request)),
+        latest(orders[0], catalog_changed),
+    )
+
+
 @login_required
+@conditional_page(_my_orders_validator)
 def my_orders(request):
     if request.user.role != 'client':
         return redirect('/')
-    orders = PurchaseOrder.objects.filter(client__user=request.user)
-    return render(request, 'landing/my_orders.html', {'orders': orders})
+
+    client, _ = _client_or_404(request)
+    status = request.GET.get('status', '')
+    orders = PurchaseOrder.objects.filter(client=client)
+    if status:
+        # Served by the (client, status, created_at) index
+        orders = orders.filter(status=status)
+    try:
+        orders, next_cursor = keyset_page(
+            orders.prefetch_related(_order_items_prefetch()), MY_ORDERS_ORDERING,
+            cursor=request.GET.get('cursor'), limit=MY_ORDERS_PAGE_SIZE, descending=True,
+        )
+    except ValueError:
+        return redirect('landing:my_orders')
+
+    counts = dict(
+        PurchaseOrder.objects.filter(client=client).values_list('status').annotate(n=Count('id')).order_by()
+    )
+    tabs = [
+        {'status': value, 'label': label, 'icon': icon,
+         'count': counts.get(value, 0) if value else sum(counts.values())}
+        for value, label, icon in ORDER_STATUS_TABS
+    ]
+    return render(request, 'landing/my_orders.html', {
+        'orders': orders,
+        'tabs': tabs,
+        'status': status,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+    })
+
+
+def _order_detail_validator(request, order_id):
+    if request.user.role != 'client':
+        return None
+    order = (
+        PurchaseOrder.objects.filter(id=order_id, client__user=request.user)
+        .values_list('updated_at', 'client__company_name', 'client__tax_id', 'client__address',
+                     'client__phone', 'client__email')
+        .first()
+    )
+    if order is None:
+        # Let the view answer 404
+        return None
+    catalog_version, catalog_changed = catalog_stamp()
+    return (order, catalog_version, _page_parts(request)), latest(order[0], catalog_changed)
+
+
+@login_required
+@conditional_page(_order_detail_validator)
+def order_detail(request, order_id):
+    if request.user.role != 'client':
+        return redirect('/')
+
+    # Order with client, then items with variant and product: two queries
+    order = get_object_or_404(
+        PurchaseOrder.objects.select_related('client').prefetch_related(_order_items_prefetch()),
+        id=order_id, client__user=request.user,
+    )
+    return render(request, 'landing/order_detail.html', {'order': order})
+
+
+def _filter_snapshot(categories, product_ids):
+    """Restrict a catalog snapshot to ``product_ids``, keeping their order."""
+    by_id = {product['id']: product for products in categories.values() for product in products}
+    filtered = OrderedDict()
+    for product_id in product_ids:
+        product = by_id.get(product_id)
+        if product:
+            filtered.setdefault(product['category'], []).append(product)
+    return filtered
+
+
+def _catalog_holds(request):
+    """(client, units held by other clients' carts), computed once per request."""
+    if not hasattr(request, '_catalog_holds'):
+        client, _ = resolve_identity(request)
+        request._catalog_holds = (client, held_quantities(exclude_client=client))
+    return request._catalog_holds
+
+
+def _catalog_validator(request):
+    # Cache reads only: the tables are not touched until the page is rendered
+    catalog_version, catalog_changed = catalog_stamp()
+    # Available stock changes as other clients' holds come, go and lapse
+    return (
+        (request.get_full_path(), catalog_version, *holds_state(), _page_parts(request)),
+        catalog_changed,
+    )
 
 
 @login_required
+@conditional_page(_catalog_validator)
 def catalog(request):
-    # Get all active products with their variants
-    products = Product.objects.filter(is_active=True).prefetch_related('variants')
-
-    # Group products by category for better organization
-    from collections import OrderedDict
-    categories = {}
-    for product in products:
-        if product.category not in categories:
-            categories[product.category] = []
-
-        # Flags for template logic
-        has_standard_variant = product.variants.filter(has_variants=False).exists()
-        product.has_variants = product.variants.filter(has_variants=True).exists()
-        product.has_standard_variant = has_standard_variant
-
-        # Keep existing variants data (not strictly needed now that we render inline)
-        product.all_variants_data = list(product.variants.values(
-            'id', 'color', 'size', 'weight', 'is_luminous', 'unit_price', 'bulk_price', 'stock', 'has_variants', 'image_url'
-        ))
-
-        categories[product.category].append(product)
-
-    # Sort categories and products alphabetically
-    sorted_categories = OrderedDict()
-    for cat in sorted(categories.keys(), key=lambda x: (x or '').lower()):
-        sorted_categories[cat] = sorted(categories[cat], key=lambda p: (p.name or '').lower())
-
-    # Get cart count for the user
-    cart_count = 0
-    if hasattr(request.user, 'client'):
-        client = request.user.client
-        cart = Cart.objects.filter(client=client).first()
-        if cart:
-            cart_count = cart.items.count()
+    # Infinite-scroll mode renders an empty shell and pages in via catalog_api
+    scroll_mode = request.GET.get('scroll') == '1'
+
+    # Category-grouped, sorted products with their variants, served from cache
+    categories = {} if scroll_mode else get_catalog_snapshot()
 
+    # Server-side search keeps the snapshot layout, ordered by relevance
+    query = request.GET.get('q', '').strip()
+    if query and not scroll_mode:
+        categories = _filter_snapshot(categories, matching_products(query).values_list('id', flat=True))
+
+    # Show stock net of other clients' reservations (one aggregate query, shared with the validator)
+    held = _catalog_holds(request)[1]
+    categories = apply_to_catalog(categories, held)
+
+    # Product cards come rendered from the fragment cache; only changed ones render
+    categories = attach_product_cards(categories, held)
+
+    # cart_count comes from the cart_summary context processor
     context = {
-        'categories': sorted_categories,
-        'products': products,
-        'cart_count': cart_count,
+        'categories': categories,
+        'scroll_mode': scroll_mode,
+        'query': query,
     }
 
     return render(request, 'landing/catalog.html', context)
 
 
+CATALOG_PAGE_SIZE = 24
+CATALOG_MAX_PAGE_SIZE = 100
+CATALOG_ORDERING = ('category', 'name', 'id')
+
+
+def _serialize_catalog_product(product):
+    variants = [
+        {
+            'id': variant.id,
+            'color': variant.color,
+            'size': variant.size,
+            'weight': variant.weight,
+            'is_luminous': variant.is_luminous,
+            'unit_price': str(variant.unit_price),
+            'bulk_price': str(variant.bulk_price),
+            'stock': variant.stock,
+            'has_variants': variant.has_variants,
+            'image_url': variant.image_url,
+            'thumbnail_url': thumbnail_url(variant.image_url, 'variant'),
+            'card_image_url': thumbnail_url(variant.image_url, 'card'),
+        }
+        for variant in product.variants.all()
+    ]
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'brand': product.brand,
+        'category': product.category,
+        'image_url': product.image_url,
+        'card_image_url': thumbnail_url(product.image_url, 'card'),
+        'variant_count': len(variants),
+        'has_variants': any(v['has_variants'] for v in variants),
+        'has_standard_variant': any(not v['has_variants'] for v in variants),
+        'variants': variants,
+    }
+
+
+@login_required
+async def catalog_api(request):
+    """
+    Read-only JSON page of active products with their variants.
+
+    Pages are keyset-paginated on (category, name, id): the ``next_cursor`` of a
+    page is passed back as ``?cursor=`` to fetch the following one. Every page
+    costs two queries regardless of how deep the client has scrolled. With
+    ``?q=`` only the search page's matches are listed, in the same order; pass
+    it again with every cursor.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+
+    try:
+        limit = int(request.GET.get('limit', CATALOG_PAGE_SIZE))
+        cursor = request.GET.get('cursor')
+        after = decode_cursor(cursor, len(CATALOG_ORDERING)) if cursor else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
+    limit = max(1, min(limit, CATALOG_MAX_PAGE_SIZE))
+
+    products = Product.objects.filter(is_active=True).order_by(*CATALOG_ORDERING)
+    query = request.GET.get('q', '').strip()
+    if query:
+        # A subquery, so the page is still a single query
+        products = products.filter(id__in=matching_products(query).values('id'))
+    if after:
+        products = products.filter(keyset_filter(CATALOG_ORDERING, after))
+
+    # Fetch one extra row to know whether another page exists
+    page = [
+        product async for product in products.prefetch_related(
+            Prefetch('variants', queryset=ProductVariant.objects.order_by('id'))
+        )[:limit + 1]
+    ]
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    # Show stock net of other clients' reservations for this page's variants
+    client, _ = await aresolve_identity(request)
+    held = await aheld_quantities(
+        [variant.id for product in page for variant in product.variants.all()], exclude_client=client
+    )
+    for product in page:
+        for variant in product.variants.all():
+            variant.stock = max(0, variant.stock - held.get(variant.id, 0))
+
+    next_cursor = None
+    if has_more:
+        last = page[-1]
+        next_cursor = encode_cursor([last.category, last.name, last.id])
+
+    return JsonResponse({
+        'success': True,
+        'products': [_serialize_catalog_product(product) for product in page],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def catalog_search(request):
+    """
+    Ranked JSON search over products and their variant colors/sizes (``?q=``),
+    at most ``?limit=`` results. The catalog's search box uses it for its
+    suggestions.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', SEARCH_RESULTS_LIMIT)), SEARCH_RESULTS_LIMIT))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
+
+    products = matching_products(request.GET.get('q', '')).prefetch_related(
+        Prefetch('variants', queryset=ProductVariant.objects.order_by('id'))
+    )[:limit]
+    return JsonResponse({
+        'success': True,
+        'products': [_serialize_catalog_product(product) for product in products],
+    })
+
+
 @login_required
 def cart(request):
     if request.user.role != 'client':
         return redirect('/')
     
-    # Get client's cart
-    client = get_object_or_404(Client, user=request.user)
-    cart = Cart.objects.filter(client=client).first()
+    # Client and cart come from the session (core.identity)
+    client, _ = _client_or_404(request)
+    cart = request_cart(request)
     
     cart_items = []
-    total = 0
-    net_total = 0
-    vat_total = 0
+    totals = {}
     
     if cart:
-        # Get cart items with related objects
-        cart_items = cart.items.select_related('variant', 'variant__product').all()
+        # Get cart items with related objects and their line amounts
+        cart_items = annotate_cart_lines(
+            cart.items.select_related('variant', 'variant__product', 'reservation')
+        )
+        totals = cart_totals(cart.items.all())
         
-        # Calculate totals
+        # Units still available to this client (other clients' holds excluded)
+        held = held_quantities([item.variant_id for item in cart_items], exclude_client=client)
         for item in cart_items:
-            # Use the properties directly
-            total += item.subtotal
-            net_total += item.net_subtotal
-            vat_total += item.vat_subtotal
+            item.available = max(0, item.variant.stock - held.get(item.variant_id, 0))
     
     context = {
         'cart_items': cart_items,
-        'total': total,
-        'net_total': net_total,
-        'vat_total': vat_total,
-        'cart_count': len(cart_items)
+        'total': totals.get('total', 0),
+        'net_total': totals.get('net_total', 0),
+        'vat_total': totals.get('vat_total', 0),
     }
     
     return render(request, 'landing/cart.html', context)
 
 
+def _lock_cart(cart_id):
+    """
+    Lock the cart's row until the transaction ends.
+
+    Every change to a cart's lines takes this lock first (then the variants,
+    in id order), so concurrent requests on one cart run one after the other
+    and each reads the lines the previous one wrote.
+    """
+    Cart.objects.select_for_update().filter(pk=cart_id).values_list('pk').get()
+
+
+def _add_cart_line(cart, variant, quantity, client):
+    """
+    Add ``quantity`` units of ``variant`` to ``cart`` and hold them.
+
+    Returns ``(cart_item, available)``; ``cart_item`` is None when the stock
+    not held by other clients is short.
+    """
+    with transaction.atomic():
+        _lock_cart(cart.pk)
+        # Lock the variant so concurrent carts can't reserve the same units
+        available = lock_available_stock(variant.id, client)
+
+        # Check if item already exists in cart
+        cart_item = CartItem.objects.filter(cart=cart, variant=variant).first()
+        new_quantity = quantity + (cart_item.quantity if cart_item else 0)
+
+        # Check stock not held by other clients
+        if available < new_quantity:
+            return None, available
+
+        if cart_item:
+            # Update quantity if item exists
+            cart_item.quantity = new_quantity
+            # Update variant details in case they've changed
+            cart_item.variant_details = variant.get_variant_display()
+            cart_item.save()
+        else:
+            # Create new cart item
+            cart_item = CartItem.objects.create(
+                cart=cart,
+                variant=variant,
+                quantity=quantity,
+                variant_details=variant.get_variant_display()
+            )
+
+        # Hold the units for this cart
+        hold(cart_item, client)
+    return cart_item, available
+
+
+def _set_cart_line_quantity(cart_item, quantity, client):
+    """Set a cart line to ``quantity`` units if the stock allows; returns the units available."""
+    with transaction.atomic():
+        _lock_cart(cart_item.cart_id)
+        # Check stock not held by other clients, locking the variant
+        available = lock_available_stock(cart_item.variant_id, client)
+        if available >= quantity:
+            # Update quantity and its reservation
+            cart_item.quantity = quantity
+            cart_item.save()
+            hold(cart_item, client)
+    return available
+
+
+# The JSON cart endpoints are async: under ASGI a slow client costs no thread.
+# Row locks need a transaction, which the async ORM can't open, so the locked
+# section of each endpoint runs through sync_to_async.
+
 @login_required
-def add_to_cart(request):
-    if request.method != 'POST' or request.user.role != 'client':
+async def add_to_cart(request):
+    user = await request.auser()
+    if request.method != 'POST' or user.role != 'client':
         return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
     
     try:
@@ -159,39 +493,21 @@ def add_to_cart(request):
             return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
         
         # Get product variant
-        variant = get_object_or_404(ProductVariant, id=variant_id)
+        variant = await aget_object_or_404(ProductVariant, id=variant_id)
+        
+        # Get or create client's cart
+        client, _ = await _aclient_or_404(request)
+        cart = await aget_or_create_cart(request)
         
-        # Check stock
-        if variant.stock < quantity:
+        cart_item, available = await sync_to_async(_add_cart_line)(cart, variant, quantity, client)
+        if cart_item is None:
             return JsonResponse({
                 'success': False, 
-                'error': f'Stock insuficiente. Solo hay {variant.stock} unidades disponibles.'
+                'error': f'Stock insuficiente. Solo hay {available} unidades disponibles.'
             }, status=400)
         
-        # Get or create client's cart
-        client = get_object_or_404(Client, user=request.user)
-        cart, created = Cart.objects.get_or_create(client=client)
-        
-        # Check if item already exists in cart
-        cart_item = CartItem.objects.filter(cart=cart, variant=variant).first()
-        
-        if cart_item:
-            # Update quantity if item exists
-            cart_item.quantity += quantity
-            # Update variant details in case they've changed
-            cart_item.variant_details = variant.get_variant_display()
-            cart_item.save()
-        else:
-            # Create new cart item
-            CartItem.objects.create(
-                cart=cart,
-                variant=variant,
-                quantity=quantity,
-                variant_details=variant.get_variant_display()
-            )
-        
-        # Get updated cart count
-        cart_count = cart.items.count()
+        # Refresh the cached cart summary and badge count
+        cart_count = (await arefresh_cart_summary(user.pk))['count']
         
         # Prepare response message based on variant type
         message = 'Producto agregado al carrito'
@@ -209,8 +525,9 @@ def add_to_cart(request):
 
 
 @login_required
-def update_cart_item(request):
-    if request.method != 'POST' or request.user.role != 'client':
+async def update_cart_item(request):
+    user = await request.auser()
+    if request.method != 'POST' or user.role != 'client':
         return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
     
     try:
@@ -224,23 +541,18 @@ def update_cart_item(request):
             return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
         
         # Get cart item
-        client = get_object_or_404(Client, user=request.user)
-        cart = get_object_or_404(Cart, client=client)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+        client, _ = await _aclient_or_404(request)
+        cart_item = await aget_object_or_404(CartItem, id=item_id, cart_id=await aresolve_cart_id(request))
         
-        # Check stock
-        if cart_item.variant.stock < quantity:
+        available = await sync_to_async(_set_cart_line_quantity)(cart_item, quantity, client)
+        if available < quantity:
             return JsonResponse({
                 'success': False, 
-                'error': f'Stock insuficiente. Solo hay {cart_item.variant.stock} unidades disponibles.'
+                'error': f'Stock insuficiente. Solo hay {available} unidades disponibles.'
             }, status=400)
         
-        # Update quantity
-        cart_item.quantity = quantity
-        cart_item.save()
-        
-        # Get updated cart count
-        cart_count = cart.items.count()
+        # Refresh the cached cart summary and badge count
+        cart_count = (await arefresh_cart_summary(user.pk))['count']
         
         return JsonResponse({
             'success': True,
@@ -253,8 +565,9 @@ def update_cart_item(request):
 
 
 @login_required
-def remove_cart_item(request):
-    if request.method != 'POST' or request.user.role != 'client':
+async def remove_cart_item(request):
+    user = await request.auser()
+    if request.method != 'POST' or user.role != 'client':
         return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
     
     try:
@@ -267,15 +580,15 @@ def remove_cart_item(request):
             return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
         
         # Get cart item
-        client = get_object_or_404(Client, user=request.user)
-        cart = get_object_or_404(Cart, client=client)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+        await _aclient_or_404(request)
+        cart_item = await aget_object_or_404(CartItem, id=item_id, cart_id=await aresolve_cart_id(request))
         
         # Delete cart item
-        cart_item.delete()
+        await cart_item.adelete()
+        await aholds_changed()
         
-        # Get updated cart count
-        cart_count = cart.items.count()
+        # Refresh the cached cart summary and badge count
+        cart_count = (await arefresh_cart_summary(user.pk))['count']
         
         return JsonResponse({
             'success': True,
@@ -286,41 +599,173 @@ def remove_cart_item(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+CART_BATCH_MAX_OPERATIONS = 200
+CART_BATCH_OPS = ('add', 'update', 'remove')
+
+
+def _parse_cart_operation(raw):
+    """Normalize one batch operation; returns (operation, error message)."""
+    if not isinstance(raw, dict) or raw.get('op') not in CART_BATCH_OPS:
+        return None, 'Operación inválida'
+    try:
+        operation = {
+            'op': raw['op'],
+            'variant_id': int(raw['variant_id']) if raw.get('variant_id') else None,
+            'item_id': int(raw['item_id']) if raw.get('item_id') else None,
+            'quantity': int(raw.get('quantity', 1)),
+        }
+    except (TypeError, ValueError):
+        return None, 'Datos inválidos'
+    if not (operation['variant_id'] or operation['item_id']):
+        return None, 'Datos inválidos'
+    if operation['op'] != 'remove' and operation['quantity'] < 1:
+        return None, 'Datos inválidos'
+    return operation, None
+
+
+@login_required
+def cart_batch(request):
+    """
+    Apply a list of add/update/remove operations to the cart in one request.
+
+    Body: ``{"operations": [{"op": "add", "variant_id": 1, "quantity": 2}, ...]}``;
+    update/remove may name the line by ``item_id`` instead of ``variant_id``.
+    Variants and cart lines are each fetched in one query, stock is checked
+    for the whole batch, and valid changes are written with bulk operations
+    in one transaction. The lines are read under the cart's row lock, so
+    concurrent batches and adds on one cart never lose each other's changes.
+    Lines whose variant lacks stock are rejected; the response carries one
+    result per operation.
+    """
+    if request.method != 'POST' or request.user.role != 'client':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        raw_operations = data.get('operations')
+        if not isinstance(raw_operations, list) or not 0 < len(raw_operations) <= CART_BATCH_MAX_OPERATIONS:
+            return JsonResponse({'success': False, 'error': 'Datos inválidos'}, status=400)
+
+        results = []
+        operations = []
+        for index, raw in enumerate(raw_operations):
+            operation, error = _parse_cart_operation(raw)
+            results.append({'index': index, 'success': error is None, 'error': error})
+            if operation:
+                operation['index'] = index
+                operations.append(operation)
+
+        client, _ = _client_or_404(request)
+        cart = get_or_create_cart(request)
+
+        with transaction.atomic():
+            # All existing lines of the cart, in one query, read under the cart's lock
+            _lock_cart(cart.pk)
+            lines = {line.variant_id: line for line in cart.items.all()}
+            variant_by_item = {line.id: line.variant_id for line in lines.values()}
+
+            # Replay the operations on the current quantities
+            targets = {variant_id: line.quantity for variant_id, line in lines.items()}
+            ops_by_variant = {}
+            for operation in operations:
+                variant_id = operation['variant_id'] or variant_by_item.get(operation['item_id'])
+                if variant_id is None:
+                    results[operation['index']].update(success=False, error='Producto no encontrado en el carrito')
+                    continue
+                results[operation['index']]['variant_id'] = variant_id
+                ops_by_variant.setdefault(variant_id, []).append(operation['index'])
+                current = targets.get(variant_id, 0)
+                if operation['op'] == 'add':
+                    targets[variant_id] = current + operation['quantity']
+                elif operation['op'] == 'update':
+                    targets[variant_id] = operation['quantity']
+                else:
+                    targets[variant_id] = 0
+
+            # Lock every touched variant in id order, then check the whole batch
+            variants = {
+                variant.id: variant
+                for variant in ProductVariant.objects.select_for_update().filter(id__in=ops_by_variant).order_by('id')
+            }
+            held = held_quantities(list(variants), exclude_client=client)
+
+            to_create, to_update, to_delete = [], [], []
+            for variant_id, indexes in ops_by_variant.items():
+                variant = variants.get(variant_id)
+                quantity = targets[variant_id]
+                line = lines.get(variant_id)
+                available = max(0, variant.stock - held.get(variant_id, 0)) if variant else 0
+                error = None
+                if variant is None:
+                    error = 'Producto no encontrado'
+                elif quantity > 0 and available < quantity:
+                    error = f'Stock insuficiente. Solo hay {available} unidades disponibles.'
+                if error:
+                    for index in indexes:
+                        results[index].update(success=False, error=error)
+                    continue
+
+                if quantity == 0:
+                    if line:
+                        to_delete.append(line.id)
+                elif line is None:
+                    to_create.append(CartItem(
+                        cart=cart,
+                        variant=variant,
+                        quantity=quantity,
+                        variant_details=variant.get_variant_display()
+                    ))
+                elif line.quantity != quantity:
+                    line.quantity = quantity
+                    to_update.append(line)
+                for index in indexes:
+                    results[index]['quantity'] = quantity
+
+            if to_delete:
+                CartItem.objects.filter(id__in=to_delete).delete()
+                holds_changed()
+            if to_create:
+                CartItem.objects.bulk_create(to_create)
+            if to_update:
+                CartItem.objects.bulk_update(to_update, ['quantity'])
+            if to_create or to_update:
+                hold_many(to_create + to_update, client)
+
+        # Refresh the cached cart summary and badge count
+        cart_count = refresh_cart_summary(request.user.pk)['count']
+
+        return JsonResponse({
+            'success': all(result['success'] for result in results),
+            'results': results,
+            'cart_count': cart_count
+        })
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 
 @login_required
 def checkout(request):
     if request.user.role != 'client':
         return redirect('/')
     
-    # Get client's cart
-    client = get_object_or_404(Client, user=request.user)
-    cart = Cart.objects.filter(client=client).first()
+    # Client and cart come from the session (core.identity)
+    client, _ = _client_or_404(request)
+    cart = request_cart(request)
     
     # If cart is empty, redirect to cart page
-    if not cart or not cart.items.exists():
+    if not cart:
         return redirect('landing:cart')
     
-    # Get cart items with related objects
-    cart_items = cart.items.select_related('variant', 'variant__product').all()
-    
-    # Calculate totals
-    total = 0
-    net_total = 0
-    vat_total = 0
-    
-    for item in cart_items:
-        # Use the properties directly
-        total += item.subtotal
-        net_total += item.net_subtotal
-        vat_total += item.vat_subtotal
+    # Get cart items with related objects and their line amounts
+    cart_items = list(annotate_cart_lines(cart.items.select_related('variant', 'variant__product')))
+    if not cart_items:
+        return redirect('landing:cart')
     
     context = {
         'client': client,
         'cart_items': cart_items,
-        'total': total,
-        'net_total': net_total,
-        'vat_total': vat_total,
-        'cart_count': len(cart_items)
+        **cart_totals(cart.items.all()),
     }
     
     return render(request, 'landing/checkout.html', context)
@@ -331,9 +776,11 @@ def process_checkout(request):
     if request.method != 'POST' or request.user.role != 'client':
         return redirect('landing:cart')
     
-    # Get client's cart
-    client = get_object_or_404(Client, user=request.user)
-    cart = get_object_or_404(Cart, client=client)
+    # Client and cart come from the session (core.identity)
+    client, _ = _client_or_404(request)
+    cart = request_cart(request)
+    if cart is None:
+        raise Http404("No Cart matches the given query.")
     
     # If cart is empty, redirect to cart page
     if not cart.items.exists():
@@ -358,55 +805,18 @@ def process_checkout(request):
         client.email = email
         client.save()
     
-    # Calculate totals
-    cart_items = cart.items.select_related('variant').all()
-    total = 0
-    net_total = 0
-    vat_total = 0
-    
-    for item in cart_items:
-        # Use the properties directly
-        total += item.subtotal
-        net_total += item.net_subtotal
-        vat_total += item.vat_subtotal
-    
-    # Create order with transaction to ensure data integrity
-    with transaction.atomic():
-        # Create purchase order
-        order = PurchaseOrder.objects.create(
-            client=client,
-            status='pendiente',
-            total_amount=total,
-            net_total=net_total,
-            vat_total=vat_total,
-            notes=notes
-        )
-        
-        # Create order items
-        for cart_item in cart_items:
-            # Calculate prices
-            unit_price = cart_item.variant.unit_price
-            net_unit_price = unit_price / Decimal('1.19')  # Assuming 19% VAT
-            vat_amount = unit_price - net_unit_price
-            subtotal = unit_price * cart_item.quantity
-            net_subtotal = net_unit_price * cart_item.quantity
-            vat_subtotal = vat_amount * cart_item.quantity
-                
-            OrderItem.objects.create(
-                order=order,
-                variant=cart_item.variant,
-                quantity=cart_item.quantity,
-                unit_price=unit_price,
-                net_unit_price=net_unit_price,
-                vat_amount=vat_amount,
-                subtotal=subtotal,
-                net_subtotal=net_subtotal,
-                vat_subtotal=vat_subtotal,
-                variant_details=cart_item.variant_details or cart_item.variant.get_variant_display()
+    # Lock stock, write the order and its items, and clear the cart in one transaction
+    try:
+        order = place_order(client, cart, notes=notes)
+    except InsufficientStockError as exc:
+        for item, variant, available in exc.lines:
+            messages.error(
+                request,
+                f'Stock insuficiente para {variant or item.variant_details}. Solo hay {available} unidades disponibles.'
             )
-        
-        # Clear cart
-        cart.items.all().delete()
+        return redirect('landing:cart')
+    
+    refresh_cart_summary(request.user.pk)
     
     # Redirect to confirmation page
     return redirect('landing:order_confirmation', order_id=order.id)
@@ -417,11 +827,40 @@ def order_confirmation(request, order_id):
     if request.user.role != 'client':
         return redirect('/')
     
-    # Get order
-    order = get_object_or_404(PurchaseOrder, id=order_id, client__user=request.user)
+    # Get order with its client and items in two queries
+    order = get_object_or_404(
+        PurchaseOrder.objects.select_related('client').prefetch_related(_order_items_prefetch()),
+        id=order_id, client__user=request.user,
+    )
     
     context = {
         'order': order
     }
     
     return render(request, 'landing/order_confirmation.html', context)
+
+
+@require_safe
+def thumbnail(request, size, token):
+    """
+    Resized copy of a product or variant image, from the local thumbnail cache.
+
+    The URL never changes for a given source and size, so browsers and CDNs
+    may keep it for a year. Images that cannot be fetched fall back to the
+    placeholder banner, which is what the templates show without an image.
+    """
+    if size not in SIZES:
+        raise Http404
+    try:
+        source_url = source_from_token(token)
+    except BadSignature:
+        raise Http404
+    image_format = negotiate_format(request.headers.get('Accept'))
+    try:
+        thumbnail_file = open_thumbnail(source_url, size, image_format)
+    except ThumbnailError:
+        return redirect(static('images/banner1.jpg'))
+    response = FileResponse(thumbnail_file, content_type=FORMATS[image_format][0])
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response['Vary'] = 'Accept'
+    return response